@@ -0,0 +1,98 @@
+"""
+Fixed-size avatar variants of profile pictures.
+
+Uploads are cropped to a square and saved at every size of SIZES in every
+format of FORMATS, under names that contain the SHA-256 of the upload.
+A new picture gets new URLs, so the variants are served with immutable
+cache headers and pages never load the raw upload.
+"""
+import hashlib
+import re
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from dashboard.cache import get_cache, get_data_version
+
+SIZES = (32, 64, 256)
+# (extension, Pillow format, content type); the first is preferred
+FORMATS = (
+    ('webp', 'WEBP', 'image/webp'),
+    ('jpg', 'JPEG', 'image/jpeg'),
+)
+QUALITY = 80
+
+NAME_RE = re.compile(
+    r'^(?P<digest>[0-9a-f]{64})-(?P<size>%s)\.(?P<extension>%s)$'
+    % ('|'.join(str(size) for size in SIZES), '|'.join(extension for extension, _, _ in FORMATS))
+)
+
+
+def variant_name(digest, size, extension):
+    return f'{digest}-{size}.{extension}'
+
+
+def variant_path(name):
+    return f'avatars/{name[:2]}/{name}'
+
+
+def content_type_for(extension):
+    return next(content_type for ext, _, content_type in FORMATS if ext == extension)
+
+
+def generate_avatars(field_file):
+    """
+    Save every variant of the image in ``field_file`` (committed or not) and
+    return its digest. Variants that already exist are not written again.
+    """
+    field_file.open('rb')
+    field_file.seek(0)
+    data = field_file.read()
+    field_file.seek(0)
+    digest = hashlib.sha256(data).hexdigest()
+    
+    image = Image.open(BytesIO(data))
+    image.draft('RGB', (max(SIZES), max(SIZES)))
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    for size in SIZES:
+        variant = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        for extension, image_format, _ in FORMATS:
+            path = variant_path(variant_name(digest, size, extension))
+            if default_storage.exists(path):
+                continue
+            buffer = BytesIO()
+            variant.save(buffer, image_format, quality=QUALITY, optimize=True)
+            default_storage.save(path, ContentFile(buffer.getvalue()))
+    return digest
+
+
+# Seconds a digest stays cached; entries of older data versions are never
+# read again and expire
+DIGEST_TIMEOUT = 24 * 3600
+
+
+def _cache_key(user_id):
+    # Saving a profile bumps the user's data version (see dashboard.models),
+    # so every process reads the new digest after a change
+    return f'avatar:{user_id}:{get_data_version(user_id)}'
+
+
+def avatar_digest(user):
+    """
+    The avatar digest of ``user`` ('' without a picture). It is read on every
+    page, so it is kept in the cache instead of loading the profile.
+    """
+    key = _cache_key(user.pk)
+    digest = get_cache().get(key)
+    if digest is None:
+        from .models import UserProfile
+        
+        digest = UserProfile.objects.filter(user=user).values_list('avatar_digest', flat=True).first() or ''
+        get_cache().set(key, digest, DIGEST_TIMEOUT)
+    return digest
+
+
+def remember_avatar_digest(user_id, digest):
+    get_cache().set(_cache_key(user_id), digest, DIGEST_TIMEOUT)
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.6 on 2026-10-17 12:39
+
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+from PIL import Image, ImageOps
+
+# A copy of accounts.avatars.generate_avatars as of this migration, so later
+# changes to the variants do not change what it writes
+SIZES = (32, 64, 256)
+FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+QUALITY = 80
+
+
+def generate_avatars(field_file):
+    field_file.open('rb')
+    data = field_file.read()
+    field_file.close()
+    digest = hashlib.sha256(data).hexdigest()
+    
+    image = Image.open(BytesIO(data))
+    image.draft('RGB', (max(SIZES), max(SIZES)))
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    for size in SIZES:
+        variant = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        for extension, image_format in FORMATS:
+            name = f'{digest}-{size}.{extension}'
+            path = f'avatars/{name[:2]}/{name}'
+            if default_storage.exists(path):
+                continue
+            buffer = BytesIO()
+            variant.save(buffer, image_format, quality=QUALITY, optimize=True)
+            default_storage.save(path, ContentFile(buffer.getvalue()))
+    return digest
+
+
+def generate_existing_avatars(apps, schema_editor):
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    for profile in UserProfile.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True).iterator():
+        try:
+            profile.avatar_digest = generate_avatars(profile.profile_picture)
+        except OSError:
+            # Missing or unreadable files fall back to the initials
+            continue
+        profile.save(update_fields=['avatar_digest'])
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar_digest',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.RunPython(generate_existing_avatars, migrations.RunPython.noop),
+    ]
@@ -2,14 +2,28 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from .avatars import generate_avatars, remember_avatar_digest
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
+    # SHA-256 of the profile picture, which names its avatar variants
+    avatar_digest = models.CharField(max_length=64, blank=True, default='', editable=False)
     
     def __str__(self):
         return f"{self.user.username}'s Profile"
+    
+    def save(self, *args, **kwargs):
+        # Avatars are generated when a new picture is uploaded, not per request
+        if not self.profile_picture:
+            self.avatar_digest = ''
+        elif not self.profile_picture._committed:
+            self.avatar_digest = generate_avatars(self.profile_picture)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'avatar_digest'}
+        super().save(*args, **kwargs)
+        remember_avatar_digest(self.user_id, self.avatar_digest)
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -17,5 +31,8 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+def save_user_profile(sender, instance, update_fields=None, **kwargs):
+    # Logging in only updates last_login; the profile is unchanged
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
     instance.profile.save()
@@ -0,0 +1,42 @@
+from django import template
+from django.urls import reverse
+
+from accounts.avatars import FORMATS, SIZES, avatar_digest, content_type_for, variant_name
+
+register = template.Library()
+
+@register.inclusion_tag('accounts/avatar.html')
+def avatar(user, size=32, css_class=''):
+    """
+    Render the avatar of ``user`` at ``size`` CSS pixels as a <picture> with
+    WebP and JPEG sources, from the smallest variant that is large enough
+    and a twice as large one for high-density screens.
+    
+    Usage: {% avatar user 32 "me-2" %}
+    """
+    digest = avatar_digest(user) if user.is_authenticated else ''
+    if not digest:
+        return {'user': user, 'size': size, 'css_class': css_class}
+    
+    variant = min((candidate for candidate in SIZES if candidate >= size), default=SIZES[-1])
+    dense = next((candidate for candidate in SIZES if candidate >= size * 2), None)
+    
+    def srcset(extension):
+        urls = [reverse('avatar', args=[variant_name(digest, variant, extension)])]
+        if dense and dense != variant:
+            urls[0] += ' 1x'
+            urls.append(reverse('avatar', args=[variant_name(digest, dense, extension)]) + ' 2x')
+        return ', '.join(urls)
+    
+    fallback_extension = FORMATS[-1][0]
+    return {
+        'user': user,
+        'size': size,
+        'css_class': css_class,
+        'sources': [
+            {'type': content_type_for(extension), 'srcset': srcset(extension)}
+            for extension, _, _ in FORMATS[:-1]
+        ],
+        'src': reverse('avatar', args=[variant_name(digest, variant, fallback_extension)]),
+        'fallback_srcset': srcset(fallback_extension),
+    }
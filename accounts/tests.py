@@ -1,3 +1,90 @@
-from django.test import TestCase
+import re
+import shutil
+import tempfile
+from io import BytesIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from dashboard.cache import bump_data_version
+
+from .avatars import SIZES, avatar_digest, variant_name, variant_path
+from .models import UserProfile
+
+
+def picture(width=3000, height=2000, color='navy'):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'JPEG')
+    return SimpleUploadedFile('me.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+class AvatarTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        
+        self.user = User.objects.create_user('tara', password='secret', first_name='Tara', last_name='Lee')
+        self.client.force_login(self.user)
+    
+    def upload(self, **kwargs):
+        return self.client.post(reverse('profile'), {
+            'first_name': 'Tara', 'last_name': 'Lee', 'email': 'tara@example.com',
+            'profile_picture': picture(**kwargs),
+        })
+    
+    def test_upload_generates_square_variants_in_every_format(self):
+        self.upload()
+        digest = User.objects.get(pk=self.user.pk).profile.avatar_digest
+        self.assertRegex(digest, r'^[0-9a-f]{64}$')
+        for size in SIZES:
+            for extension in ('webp', 'jpg'):
+                with default_storage.open(variant_path(variant_name(digest, size, extension))) as file:
+                    self.assertEqual(Image.open(file).size, (size, size))
+    
+    def test_pages_reference_the_small_variant_only(self):
+        self.upload()
+        with CaptureQueriesContext(connection) as queries:
+            page = self.client.get(reverse('income_source_list')).content.decode()
+        # The digest comes from the cache, not the profile
+        self.assertFalse([query for query in queries if 'accounts_userprofile' in query['sql']])
+        
+        urls = re.findall(r'/accounts/avatars/[0-9a-f]{64}-(\d+)\.(\w+)', page)
+        self.assertEqual(sorted(set(urls)), [('32', 'jpg'), ('32', 'webp'), ('64', 'jpg'), ('64', 'webp')])
+        self.assertIn('<source type="image/webp"', page)
+    
+    def test_variants_are_served_with_immutable_cache_headers(self):
+        self.upload()
+        digest = User.objects.get(pk=self.user.pk).profile.avatar_digest
+        response = self.client.get(reverse('avatar', args=[variant_name(digest, 32, 'webp')]))
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        
+        self.assertEqual(self.client.get(reverse('avatar', args=[variant_name(digest, 48, 'webp')])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('avatar', args=[variant_name('0' * 64, 32, 'jpg')])).status_code, 404)
+    
+    def test_new_picture_gets_new_urls(self):
+        self.upload()
+        first = User.objects.get(pk=self.user.pk).profile.avatar_digest
+        self.upload(color='red')
+        self.assertNotEqual(User.objects.get(pk=self.user.pk).profile.avatar_digest, first)
+    
+    def test_digest_follows_the_data_version(self):
+        self.upload()
+        first = avatar_digest(self.user)
+        # Another process saving the profile bumps the version shared by all
+        UserProfile.objects.filter(user=self.user).update(avatar_digest='f' * 64)
+        self.assertEqual(avatar_digest(self.user), first)
+        bump_data_version(self.user.pk)
+        self.assertEqual(avatar_digest(self.user), 'f' * 64)
@@ -7,4 +7,5 @@ urlpatterns = [
     path('login/', views.CustomLoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('profile/', views.profile_view, name='profile'),
+    path('avatars/<str:name>', views.avatar, name='avatar'),
 ] 
\ No newline at end of file
@@ -5,6 +5,10 @@ from django.contrib import messages
 from django.urls import reverse_lazy, reverse
 from django.views.generic import CreateView
 from django.contrib.auth.views import LoginView
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from django.utils.cache import patch_cache_control
+from .avatars import NAME_RE, content_type_for, variant_path
 from .forms import CustomUserCreationForm, CustomAuthenticationForm, UserProfileForm, UserInfoForm
 
 # Create your views here.
@@ -45,3 +49,21 @@ def profile_view(request):
         'user_form': user_form,
         'profile_form': profile_form
     })
+
+@login_required
+def avatar(request, name):
+    """
+    Serve an avatar variant. Names contain the hash of the picture, so a
+    response never changes and browsers may keep it for a year.
+    """
+    match = NAME_RE.match(name)
+    if not match:
+        raise Http404('Unknown avatar.')
+    try:
+        file = default_storage.open(variant_path(name), 'rb')
+    except FileNotFoundError:
+        raise Http404('Unknown avatar.')
+    
+    response = FileResponse(file, content_type=content_type_for(match['extension']))
+    patch_cache_control(response, private=True, max_age=365 * 24 * 3600, immutable=True)
+    return response
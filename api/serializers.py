@@ -0,0 +1,137 @@
+from decimal import Decimal
+
+from django.urls import reverse
+from rest_framework import serializers
+
+from dashboard.models import BudgetGoal, SavingsGoal
+from transactions.models import ExpenseCategory, IncomeSource, Transaction
+
+
+class SparseFieldsetSerializer(serializers.ModelSerializer):
+    """
+    A read-only ModelSerializer that can be limited to a subset of its fields.
+    
+    ``Meta.sources`` maps output fields that do not match a model field to the
+    model fields (or ``relation__field`` paths) they read, so views can fetch
+    exactly those columns with only() and select_related().
+    """
+    
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+    
+    @classmethod
+    def model_paths(cls, fields):
+        sources = getattr(cls.Meta, 'sources', {})
+        paths = []
+        for name in fields:
+            paths.extend(sources.get(name, (name,)))
+        return paths
+
+
+class IncomeSourceSerializer(SparseFieldsetSerializer):
+    class Meta:
+        model = IncomeSource
+        fields = ['id', 'name', 'description']
+        read_only_fields = fields
+
+
+class ExpenseCategorySerializer(SparseFieldsetSerializer):
+    class Meta:
+        model = ExpenseCategory
+        fields = ['id', 'name', 'description', 'monthly_budget']
+        read_only_fields = fields
+
+
+class TransactionSerializer(SparseFieldsetSerializer):
+    category = serializers.CharField(source='expense_category.name', default=None)
+    source = serializers.CharField(source='income_source.name', default=None)
+    receipt = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Transaction
+        fields = [
+            'id', 'date', 'transaction_type', 'amount', 'description',
+            'expense_category', 'category', 'income_source', 'source', 'receipt',
+        ]
+        read_only_fields = fields
+        sources = {
+            'category': ('expense_category__name',),
+            'source': ('income_source__name',),
+        }
+    
+    def get_receipt(self, obj):
+        if not obj.receipt:
+            return None
+        url = reverse('transaction_receipt', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class BudgetGoalSerializer(SparseFieldsetSerializer):
+    category_name = serializers.CharField(source='category.name')
+    progress = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = BudgetGoal
+        fields = ['id', 'category', 'category_name', 'amount', 'period', 'start_date', 'end_date', 'progress']
+        read_only_fields = fields
+        sources = {
+            'category_name': ('category__name',),
+            # with_progress() joins the category with select_related, which
+            # fails on a deferred field
+            'progress': ('amount', 'period', 'category'),
+        }
+    
+    def get_progress(self, obj):
+        # Read from the annotations of BudgetGoal.objects.with_progress()
+        progress = obj.progress_for(today=self.context.get('today'))
+        return {
+            'spent': f"{Decimal(progress['spent']):.2f}",
+            'remaining': f"{Decimal(progress['remaining']):.2f}",
+            'percentage': round(float(progress['percentage']), 2),
+            'period_start': progress['period_start'],
+            'period_end': progress['period_end'],
+        }
+
+
+class SavingsGoalSerializer(SparseFieldsetSerializer):
+    progress_percentage = serializers.SerializerMethodField()
+    days_remaining = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = SavingsGoal
+        fields = [
+            'id', 'name', 'target_amount', 'current_amount', 'target_date', 'created_at',
+            'progress_percentage', 'days_remaining',
+        ]
+        read_only_fields = fields
+        sources = {
+            'progress_percentage': ('target_amount', 'current_amount'),
+            'days_remaining': ('target_date',),
+        }
+    
+    def get_progress_percentage(self, obj):
+        return round(float(obj.get_progress_percentage()), 2)
+
+
+class TransactionFilterSerializer(serializers.Serializer):
+    """Query parameters accepted by the transaction list."""
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    type = serializers.ChoiceField(choices=Transaction.TRANSACTION_TYPES, required=False)
+    category = serializers.IntegerField(required=False)
+    source = serializers.IntegerField(required=False)
+
+
+class SummaryRangeSerializer(serializers.Serializer):
+    """A range of whole months given as YYYY-MM."""
+    start = serializers.DateField(input_formats=['%Y-%m'], required=False)
+    end = serializers.DateField(input_formats=['%Y-%m'], required=False)
+    
+    def validate(self, data):
+        if 'start' in data and 'end' in data and data['start'] > data['end']:
+            raise serializers.ValidationError('start must not be after end.')
+        return data
@@ -0,0 +1,166 @@
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from dashboard.models import BudgetGoal, SavingsGoal
+from transactions.models import Transaction, ExpenseCategory, IncomeSource
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('erin', password='secret')
+        self.client.force_login(self.user)
+        self.food = ExpenseCategory.objects.create(user=self.user, name='Food', monthly_budget=300)
+        self.salary = IncomeSource.objects.create(user=self.user, name='Salary')
+        self.today = timezone.localdate()
+        for day in range(1, 6):
+            Transaction.objects.create(
+                user=self.user, amount=10 * day, date=self.today - datetime.timedelta(days=day),
+                transaction_type=Transaction.EXPENSE, expense_category=self.food, description=f'Lunch {day}'
+            )
+        Transaction.objects.create(
+            user=self.user, amount=1000, date=self.today, transaction_type=Transaction.INCOME, income_source=self.salary
+        )
+        
+        other = User.objects.create_user('frank', password='secret')
+        other_category = ExpenseCategory.objects.create(user=other, name='Other')
+        Transaction.objects.create(user=other, amount=1, transaction_type=Transaction.EXPENSE, expense_category=other_category)
+    
+    def test_requires_authentication(self):
+        self.client.logout()
+        response = self.client.get(reverse('api:transaction-list'))
+        self.assertIn(response.status_code, (401, 403))
+    
+    def test_token_authentication(self):
+        self.client.logout()
+        token = Token.objects.create(user=self.user)
+        response = self.client.get(reverse('api:category-list'), HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.json()['results']], ['Food'])
+    
+    def test_transactions_are_scoped_and_ordered(self):
+        response = self.client.get(reverse('api:transaction-list'))
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 6)
+        self.assertEqual(results[0]['source'], 'Salary')
+        self.assertIsNone(results[0]['category'])
+        self.assertEqual(results[1]['category'], 'Food')
+        self.assertEqual(results[1]['amount'], '10.00')
+        self.assertEqual([item['date'] for item in results], sorted((item['date'] for item in results), reverse=True))
+    
+    def test_cursor_pagination(self):
+        url = reverse('api:transaction-list')
+        seen = []
+        response = self.client.get(url, {'page_size': 4})
+        while True:
+            data = response.json()
+            seen.extend(item['id'] for item in data['results'])
+            if not data['next']:
+                break
+            response = self.client.get(data['next'])
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+        
+        self.assertEqual(self.client.get(url, {'cursor': 'not-a-cursor'}).status_code, 404)
+    
+    def test_filters(self):
+        url = reverse('api:transaction-list')
+        response = self.client.get(url, {'type': 'expense', 'date_from': self.today - datetime.timedelta(days=2)})
+        self.assertEqual(len(response.json()['results']), 2)
+        response = self.client.get(url, {'source': self.salary.id})
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertEqual(self.client.get(url, {'date_from': 'yesterday'}).status_code, 400)
+    
+    def test_sparse_fieldsets_select_only_needed_columns(self):
+        url = reverse('api:transaction-list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'id,amount'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'amount'})
+        sql = queries[-1]['sql']
+        self.assertNotIn('description', sql)
+        self.assertNotIn('JOIN', sql)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'id,category'})
+        self.assertIn('JOIN', queries[-1]['sql'])
+        
+        self.assertEqual(self.client.get(url, {'fields': 'id,secret'}).status_code, 400)
+    
+    def test_list_query_count_does_not_grow(self):
+        url = reverse('api:transaction-list')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        baseline = len(queries)
+        for day in range(10):
+            Transaction.objects.create(user=self.user, amount=1, date=self.today, transaction_type=Transaction.EXPENSE, expense_category=self.food)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len(queries), baseline)
+    
+    def test_goals(self):
+        BudgetGoal.objects.create(user=self.user, category=self.food, amount=1000, period=BudgetGoal.YEARLY)
+        SavingsGoal.objects.create(user=self.user, name='Car', target_amount=200, current_amount=50)
+        
+        goal = self.client.get(reverse('api:budget-goal-list')).json()['results'][0]
+        self.assertEqual(goal['category_name'], 'Food')
+        self.assertEqual(goal['progress']['spent'], f'{sum(Transaction.objects.filter(user=self.user, transaction_type=Transaction.EXPENSE, date__year=self.today.year).values_list("amount", flat=True)):.2f}')
+        
+        savings = self.client.get(reverse('api:savings-goal-list')).json()['results'][0]
+        self.assertEqual(savings['progress_percentage'], 25.0)
+        self.assertIsNone(savings['days_remaining'])
+    
+    def test_goal_progress_without_category(self):
+        BudgetGoal.objects.create(user=self.user, category=self.food, amount=1000, period=BudgetGoal.YEARLY)
+        spent = f'{sum(Transaction.objects.filter(user=self.user, transaction_type=Transaction.EXPENSE, date__year=self.today.year).values_list("amount", flat=True)):.2f}'
+        
+        for fields in ('progress', 'id,progress'):
+            response = self.client.get(reverse('api:budget-goal-list'), {'fields': fields})
+            self.assertEqual(response.status_code, 200)
+            goal = response.json()['results'][0]
+            self.assertEqual(set(goal), set(fields.split(',')))
+            self.assertEqual(goal['progress']['spent'], spent)
+            self.assertEqual(goal['progress']['remaining'], f'{1000 - Decimal(spent):.2f}')
+    
+    def test_summaries(self):
+        month = self.today.strftime('%Y-%m')
+        response = self.client.get(reverse('api:summary-breakdown'), {'start': month, 'end': month})
+        data = response.json()
+        self.assertEqual(data['income_total'], '1000.00')
+        self.assertEqual(data['income_by_source'], [{'name': 'Salary', 'total': '1000.00'}])
+        
+        start = (self.today - datetime.timedelta(days=5)).strftime('%Y-%m')
+        months = self.client.get(reverse('api:summary-monthly'), {'start': start, 'end': month}).json()['months']
+        self.assertEqual(sum(float(row['expense']) for row in months), 150)
+        
+        self.assertEqual(self.client.get(reverse('api:summary-monthly'), {'start': month, 'end': '2000-01'}).status_code, 400)
+    
+    def test_conditional_requests(self):
+        url = reverse('api:transaction-list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse([query for query in queries if 'transactions_transaction' in query['sql']])
+        
+        # Any change to the user's data gives a new ETag
+        Transaction.objects.create(user=self.user, amount=1, date=self.today, transaction_type=Transaction.EXPENSE, expense_category=self.food)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        
+        # Different parameters are different representations
+        self.assertNotEqual(self.client.get(url, {'fields': 'id'})['ETag'], response['ETag'])
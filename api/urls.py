@@ -0,0 +1,19 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+
+from . import views
+
+router = DefaultRouter()
+router.register('transactions', views.TransactionViewSet, basename='transaction')
+router.register('categories', views.ExpenseCategoryViewSet, basename='category')
+router.register('sources', views.IncomeSourceViewSet, basename='source')
+router.register('budget-goals', views.BudgetGoalViewSet, basename='budget-goal')
+router.register('savings-goals', views.SavingsGoalViewSet, basename='savings-goal')
+
+app_name = 'api'
+
+urlpatterns = [
+    path('summaries/monthly/', views.MonthlySummaryView.as_view(), name='summary-monthly'),
+    path('summaries/breakdown/', views.BreakdownSummaryView.as_view(), name='summary-breakdown'),
+    path('', include(router.urls)),
+]
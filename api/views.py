@@ -0,0 +1,214 @@
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from dashboard.conditional import etag_for, last_modified_for
+from dashboard.models import BudgetGoal, SavingsGoal
+from transactions.models import ExpenseCategory, IncomeSource, MonthlyRollup, Transaction
+
+from .serializers import (
+    BudgetGoalSerializer, ExpenseCategorySerializer, IncomeSourceSerializer, SavingsGoalSerializer,
+    SummaryRangeSerializer, TransactionFilterSerializer, TransactionSerializer,
+)
+
+
+class NotModified(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalMixin:
+    """
+    ETag and Last-Modified validators for GET requests.
+    
+    Both come from the user's data version (see dashboard.cache), which every
+    change to their transactions, categories, sources or goals bumps, so an
+    unchanged resource is answered with 304 before any query is run. The
+    current date is part of the ETag because goal progress depends on it.
+    """
+    
+    def get_validators(self, request):
+        return etag_for(request, request.get_full_path(), request.accepted_media_type), last_modified_for(request)
+    
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = self.last_modified = None
+        if request.method in ('GET', 'HEAD'):
+            self.etag, self.last_modified = self.get_validators(request)
+            response = get_conditional_response(
+                request, etag=self.etag, last_modified=int(self.last_modified.timestamp())
+            )
+            if response is not None:
+                raise NotModified(response)
+    
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'etag', None) and response.status_code in (200, 304):
+            response['ETag'] = self.etag
+            response['Last-Modified'] = http_date(self.last_modified.timestamp())
+            # Private data: clients may keep it but must revalidate every time
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Accept', 'Authorization', 'Cookie'))
+        return response
+
+
+class UserReadOnlyViewSet(ConditionalMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    List and retrieve the requesting user's objects.
+    
+    ``?fields=a,b`` limits the output to those fields, and the query then
+    only selects (and joins) the columns they need.
+    """
+    model = None
+    ordering = ('id',)
+    query_budget = 6
+    
+    def get_fields(self):
+        value = self.request.query_params.get('fields')
+        if not value:
+            return None
+        fields = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = set(fields) - set(self.serializer_class.Meta.fields)
+        if unknown:
+            raise ValidationError({'fields': f"Unknown field(s): {', '.join(sorted(unknown))}."})
+        return fields
+    
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_fields())
+        return super().get_serializer(*args, **kwargs)
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['today'] = timezone.localdate()
+        return context
+    
+    def get_base_queryset(self):
+        return self.model.objects.filter(user=self.request.user)
+    
+    def get_queryset(self):
+        fields = self.get_fields() or self.serializer_class.Meta.fields
+        paths = self.serializer_class.model_paths(fields)
+        # Cursors are built from the ordering fields, so they are always loaded
+        paths += [field.lstrip('-') for field in self.ordering]
+        related = {path.rsplit('__', 1)[0] for path in paths if '__' in path}
+        
+        queryset = self.get_base_queryset()
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*paths).order_by(*self.ordering)
+
+
+class TransactionViewSet(UserReadOnlyViewSet):
+    model = Transaction
+    serializer_class = TransactionSerializer
+    ordering = ('-date', '-id')
+    
+    def get_base_queryset(self):
+        queryset = super().get_base_queryset()
+        if self.action != 'list':
+            return queryset
+        
+        filters = TransactionFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+        if 'date_from' in params:
+            queryset = queryset.filter(date__gte=params['date_from'])
+        if 'date_to' in params:
+            queryset = queryset.filter(date__lte=params['date_to'])
+        if 'type' in params:
+            queryset = queryset.filter(transaction_type=params['type'])
+        if 'category' in params:
+            queryset = queryset.filter(expense_category_id=params['category'])
+        if 'source' in params:
+            queryset = queryset.filter(income_source_id=params['source'])
+        return queryset
+
+
+class ExpenseCategoryViewSet(UserReadOnlyViewSet):
+    model = ExpenseCategory
+    serializer_class = ExpenseCategorySerializer
+
+
+class IncomeSourceViewSet(UserReadOnlyViewSet):
+    model = IncomeSource
+    serializer_class = IncomeSourceSerializer
+
+
+class BudgetGoalViewSet(UserReadOnlyViewSet):
+    model = BudgetGoal
+    serializer_class = BudgetGoalSerializer
+    
+    def get_base_queryset(self):
+        queryset = super().get_base_queryset()
+        if 'progress' in (self.get_fields() or self.serializer_class.Meta.fields):
+            queryset = queryset.with_progress(timezone.localdate())
+        return queryset
+
+
+class SavingsGoalViewSet(UserReadOnlyViewSet):
+    model = SavingsGoal
+    serializer_class = SavingsGoalSerializer
+
+
+def _money(value):
+    return f'{value or 0:.2f}'
+
+
+def _summary_range(request):
+    params = SummaryRangeSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    today = timezone.localdate()
+    start = params.validated_data.get('start', today.replace(month=1, day=1))
+    end = params.validated_data.get('end', today.replace(day=1))
+    return start, end
+
+
+class MonthlySummaryView(ConditionalMixin, APIView):
+    """Income, expense and balance per month of ``?start=YYYY-MM&end=YYYY-MM``, from the rollups."""
+    query_budget = 6
+    
+    def get(self, request):
+        start, end = _summary_range(request)
+        rows = MonthlyRollup.objects.filter(user=request.user).between(start, end).by_month()
+        return Response({
+            'start': start,
+            'end': end,
+            'months': [{
+                'month': row['month'].strftime('%Y-%m'),
+                'income': _money(row['income']),
+                'expense': _money(row['expense']),
+                'balance': _money((row['income'] or 0) - (row['expense'] or 0)),
+            } for row in rows],
+        })
+
+
+class BreakdownSummaryView(ConditionalMixin, APIView):
+    """Totals of ``?start=YYYY-MM&end=YYYY-MM`` by income source and expense category, from the rollups."""
+    query_budget = 6
+    
+    def get(self, request):
+        start, end = _summary_range(request)
+        summary = MonthlyRollup.objects.filter(user=request.user).between(start, end).summary()
+        return Response({
+            'start': start,
+            'end': end,
+            'income_total': _money(summary.income_total),
+            'expense_total': _money(summary.expense_total),
+            'balance': _money(summary.balance),
+            'count': summary.count,
+            'income_by_source': [
+                {'name': item['name'], 'total': _money(item['total'])} for item in summary.income_by_source
+            ],
+            'expense_by_category': [
+                {'name': item['name'], 'total': _money(item['total'])} for item in summary.expense_by_category
+            ],
+        })
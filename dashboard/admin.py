@@ -1,15 +1,18 @@
 from django.contrib import admin
+from transactions.changelist import AutocompleteFilter, LargeTableAdmin
 from .models import BudgetGoal, SavingsGoal
 
 @admin.register(BudgetGoal)
-class BudgetGoalAdmin(admin.ModelAdmin):
+class BudgetGoalAdmin(LargeTableAdmin):
     list_display = ('category', 'amount', 'period', 'user', 'start_date', 'end_date')
-    list_filter = ('period', 'user', 'start_date')
+    list_select_related = ('category', 'user')
+    list_filter = ('period', ('user', AutocompleteFilter), 'start_date')
     search_fields = ('category__name', 'user__username')
     date_hierarchy = 'start_date'
 
 @admin.register(SavingsGoal)
-class SavingsGoalAdmin(admin.ModelAdmin):
+class SavingsGoalAdmin(LargeTableAdmin):
     list_display = ('name', 'target_amount', 'current_amount', 'target_date', 'user')
-    list_filter = ('target_date', 'user')
+    list_select_related = ('user',)
+    list_filter = ('target_date', ('user', AutocompleteFilter))
     search_fields = ('name', 'user__username')
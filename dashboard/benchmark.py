@@ -0,0 +1,100 @@
+import importlib
+import statistics
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from transactions.models import ExpenseCategory, IncomeSource, RecurringRule, Transaction
+from .models import BudgetGoal, SavingsGoal
+
+URLCONFS = ('dashboard.urls', 'transactions.urls')
+
+# The model whose primary key fills the <int:pk> of URLs with each name prefix
+PK_MODELS = {
+    'budget_goal': BudgetGoal,
+    'savings_goal': SavingsGoal,
+    'income_source': IncomeSource,
+    'expense_category': ExpenseCategory,
+    'transaction': Transaction,
+    'recurring_rule': RecurringRule,
+}
+
+
+def benchmark_urls(user):
+    """Yield ``(name, url)`` for every named URL of URLCONFS, filled in with objects of ``user``."""
+    for urlconf in URLCONFS:
+        for pattern in importlib.import_module(urlconf).urlpatterns:
+            kwargs = {}
+            if pattern.pattern.converters:
+                model = next(model for prefix, model in PK_MODELS.items() if pattern.name.startswith(prefix))
+                obj = model.objects.filter(user=user).order_by('pk').first()
+                if obj is None:
+                    continue
+                kwargs = {name: obj.pk for name in pattern.pattern.converters}
+            yield pattern.name, reverse(pattern.name, kwargs=kwargs)
+
+
+def measure(client, url, repeat=5, cold=True):
+    """
+    Request ``url`` ``repeat`` times and return its status, query count and
+    timings in milliseconds. Cold runs clear the cache before every request.
+    """
+    timings = []
+    for _ in range(repeat):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'status': response.status_code,
+        'queries': len(queries),
+        'median_ms': round(statistics.median(timings), 2),
+        'max_ms': round(timings[-1], 2),
+    }
+
+
+def run_benchmark(user, repeat=5):
+    """Measure every URL as ``user``, both with a cold and a warm cache."""
+    # Broken pages are reported with their status instead of aborting the run
+    client = Client(raise_request_exception=False)
+    client.force_login(user)
+    results = {}
+    for name, url in benchmark_urls(user):
+        results[name] = {
+            'url': url,
+            'cold': measure(client, url, repeat, cold=True),
+            'warm': measure(client, url, repeat, cold=False),
+        }
+    return results
+
+
+def compare(results, baseline, tolerance=0.25, slack_ms=2.0):
+    """
+    Return a message for every URL of ``results`` that runs more queries
+    than in ``baseline``, or whose median time grew by more than
+    ``tolerance`` (a fraction) plus ``slack_ms``. Both are benchmark JSON
+    documents; URLs and scales missing from the baseline are ignored.
+    """
+    regressions = []
+    for scale, urls in results['scales'].items():
+        for name, current in urls.items():
+            previous = baseline.get('scales', {}).get(scale, {}).get(name)
+            if previous is None:
+                continue
+            for mode in ('cold', 'warm'):
+                now, before = current[mode], previous[mode]
+                if now['queries'] > before['queries']:
+                    regressions.append(f"{scale} {name} ({mode}): {before['queries']} -> {now['queries']} queries")
+                if now['median_ms'] > before['median_ms'] * (1 + tolerance) + slack_ms:
+                    regressions.append(f"{scale} {name} ({mode}): {before['median_ms']} -> {now['median_ms']} ms")
+    return regressions
@@ -0,0 +1,151 @@
+import datetime
+import hashlib
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'KEY_PREFIX': 'finance',
+}
+
+STATS = ('hits', 'misses')
+
+
+def _setting(name):
+    return getattr(settings, 'FINANCE_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def get_cache():
+    return caches[_setting('ALIAS')]
+
+
+def cache_is_shared():
+    """Whether other processes, such as the precompute worker, can fill the cache."""
+    return not isinstance(get_cache(), (LocMemCache, DummyCache))
+
+
+def _key(*parts):
+    return ':'.join(str(part) for part in (_setting('KEY_PREFIX'),) + parts)
+
+
+def _incr(key, delta=1):
+    """
+    Increment a counter, creating it if needed. ``incr`` is atomic on Redis and
+    memcached; locmem and file caches do a read-modify-write, which is fine for
+    statistics and version numbers that only need to change.
+    """
+    cache = get_cache()
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, None)
+        return delta
+
+
+def get_data_version(user_id):
+    """
+    Return the current data version of ``user_id``. A missing version (new
+    user, evicted key, restarted locmem cache) is seeded with the current
+    time so it can never collide with a version used before.
+    """
+    cache = get_cache()
+    key = _key('version', user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_data_version(user_id):
+    """
+    Invalidate every cached context of ``user_id``.
+    
+    Versions are the nanosecond timestamp of the latest change (kept strictly
+    increasing), so they double as a Last-Modified time. Two concurrent bumps
+    may write the same value, which still invalidates everything older.
+    """
+    cache = get_cache()
+    key = _key('version', user_id)
+    current = cache.get(key) or 0
+    cache.set(key, max(current + 1, time.time_ns()), None)
+
+
+def data_last_modified(user_id):
+    """The time of the user's latest data change, or of the version seed."""
+    return datetime.datetime.fromtimestamp(get_data_version(user_id) / 1e9, tz=datetime.timezone.utc)
+
+
+def context_key(user_id, view_name, params):
+    digest = hashlib.md5(
+        json.dumps(params, sort_keys=True, default=str).encode(),
+        usedforsecurity=False
+    ).hexdigest()
+    return _key(view_name, user_id, get_data_version(user_id), digest)
+
+
+def get_or_build(user_id, view_name, params, builder):
+    """
+    Return the cached result of ``builder()`` for this user, view and
+    parameters, building and storing it on a miss. The result must be
+    picklable. Entries of older data versions are never read again and
+    expire through the cache's own TTL and eviction.
+    """
+    cache = get_cache()
+    key = context_key(user_id, view_name, params)
+    value = cache.get(key)
+    if value is not None:
+        _incr(_key('stats', 'hits'))
+        return value
+    
+    _incr(_key('stats', 'misses'))
+    value = builder()
+    cache.set(key, value, _setting('TIMEOUT'))
+    return value
+
+
+def precompute(user_id, view_name, params, builder, timeout=None):
+    """
+    Build and store the result of ``builder()`` ahead of a request, unless
+    it is already cached. The key is taken before building, so a change
+    made meanwhile leaves the result under the older version instead of
+    passing it off as current. Returns whether anything was built.
+    """
+    cache = get_cache()
+    key = context_key(user_id, view_name, params)
+    if cache.has_key(key):
+        return False
+    cache.set(key, builder(), timeout or _setting('TIMEOUT'))
+    return True
+
+
+async def aget_or_build(user_id, view_name, params, builder):
+    """get_or_build() for async views; ``builder`` is a coroutine function."""
+    cache = get_cache()
+    key = await sync_to_async(context_key)(user_id, view_name, params)
+    value = await cache.aget(key)
+    if value is not None:
+        await sync_to_async(_incr)(_key('stats', 'hits'))
+        return value
+    
+    await sync_to_async(_incr)(_key('stats', 'misses'))
+    value = await builder()
+    await cache.aset(key, value, _setting('TIMEOUT'))
+    return value
+
+
+def stats():
+    cache = get_cache()
+    values = cache.get_many([_key('stats', name) for name in STATS])
+    return {name: values.get(_key('stats', name), 0) for name in STATS}
+
+
+def reset_stats():
+    get_cache().delete_many([_key('stats', name) for name in STATS])
@@ -0,0 +1,95 @@
+import datetime
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib import messages
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .cache import data_last_modified, get_data_version
+
+
+def etag_for(request, *parts):
+    """
+    A strong ETag for what ``request`` shows of the user's data: it changes
+    whenever their data version does, at midnight, and with ``parts``.
+    """
+    digest = hashlib.md5(
+        '|'.join(str(part) for part in (
+            request.user.pk, get_data_version(request.user.pk), timezone.localdate(), *parts
+        )).encode(),
+        usedforsecurity=False
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def last_modified_for(request):
+    """
+    The user's latest data change, but no earlier than the start of today or
+    their last login (which starts a session with a new CSRF token).
+    """
+    start_of_today = timezone.make_aware(datetime.datetime.combine(timezone.localdate(), datetime.time.min))
+    return max(filter(None, (data_last_modified(request.user.pk), start_of_today, request.user.last_login)))
+
+
+def _is_conditional(request):
+    # Pending flash messages are rendered into the page, so it must be sent
+    return request.user.is_authenticated and not len(messages.get_messages(request))
+
+
+def page_etag(request, *args, **kwargs):
+    if not _is_conditional(request):
+        return None
+    # Every page renders a form with the CSRF token; make sure the secret
+    # exists now, as the template would create a new one after this point
+    get_token(request)
+    return etag_for(request, request.get_full_path(), request.META['CSRF_COOKIE'])
+
+
+def page_last_modified(request, *args, **kwargs):
+    if not _is_conditional(request):
+        return None
+    return last_modified_for(request)
+
+
+def _async_condition(view):
+    """
+    condition() for async views. The validators load the session and the
+    user, which cannot be done on the event loop.
+    """
+    def validators(request):
+        last_modified = page_last_modified(request)
+        return page_etag(request), int(last_modified.timestamp()) if last_modified else None
+    
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        etag, last_modified = await sync_to_async(validators)(request)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await view(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            if last_modified and not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(last_modified)
+            if etag:
+                response.headers.setdefault('ETag', etag)
+        return response
+    
+    return inner
+
+
+def data_condition(view):
+    """
+    Answer GET requests for a page that only depends on the user's data with
+    304 Not Modified when it has not changed, before the view runs. Browsers
+    are told to revalidate every time instead of guessing a freshness period.
+    """
+    if iscoroutinefunction(view):
+        view = _async_condition(view)
+    else:
+        view = condition(etag_func=page_etag, last_modified_func=page_last_modified)(view)
+    return cache_control(private=True, no_cache=True)(view)
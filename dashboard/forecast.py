@@ -0,0 +1,309 @@
+"""
+Cash-flow forecasts.
+
+Every user's monthly income and per-category expenses are read from the
+monthly rollups in one query and fitted with three vectorized models: a
+moving average, a seasonal monthly profile and a linear trend. For each
+series the model with the lowest error on the last HOLDOUT months is kept.
+All three share one parametric form, ``max(intercept + slope * t, 0) *
+seasonal[calendar month]``, so a fitted Forecast is a few small arrays.
+
+Fitting is done by the precompute worker (see dashboard.precompute); the
+result is cached under the user's data version, so any change to their
+transactions invalidates it. Pages only read it from the cache and show no
+forecast until the worker has fitted one, unless the worker is disabled or
+the cache is per-process (see dashboard.views.get_forecast).
+"""
+import datetime
+from calendar import monthrange
+from dataclasses import dataclass
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+
+from transactions.models import MonthlyRollup, Transaction
+from .cache import context_key, get_cache
+
+DEFAULTS = {
+    # Months of history fitted, ending with the last complete month
+    'HISTORY_MONTHS': 36,
+    # Months held out to pick each series' model
+    'HOLDOUT': 3,
+    # Months averaged by the moving average model
+    'WINDOW': 3,
+    # Months predicted ahead, which bounds the expected date of savings goals
+    'HORIZON': 60,
+}
+
+CENT = Decimal('0.01')
+MOVING_AVERAGE, SEASONAL, TREND = range(3)
+MODEL_NAMES = ('moving average', 'seasonal', 'trend')
+INCOME = ('income', None)
+
+
+def forecast_setting(name):
+    return getattr(settings, 'FINANCE_FORECAST', {}).get(name, DEFAULTS[name])
+
+
+def _month_index(date):
+    return date.year * 12 + date.month - 1
+
+
+def _month_start(index):
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def monthly_history(user_id, first_month, last_month):
+    """
+    Return ``(keys, values)``: the series keys (INCOME, then ``('expense',
+    category_id)``) and a (series, months) array of the monthly totals from
+    ``first_month`` to ``last_month``, zero-filled.
+    """
+    keys, values, _ = _monthly_history(user_id, first_month, last_month)
+    return keys, values
+
+
+def _monthly_history(user_id, first_month, last_month):
+    """monthly_history(), plus the column of the first month with rollups (None without any)."""
+    rows = MonthlyRollup.objects.filter(
+        user_id=user_id, month__gte=first_month, month__lte=last_month
+    ).values_list('month', 'transaction_type', 'expense_category_id', 'total')
+    
+    origin = _month_index(first_month)
+    keys = [INCOME]
+    index = {INCOME: 0}
+    cells = []
+    for month, transaction_type, category_id, total in rows:
+        key = INCOME if transaction_type == Transaction.INCOME else ('expense', category_id)
+        if key not in index:
+            index[key] = len(keys)
+            keys.append(key)
+        cells.append((index[key], _month_index(month) - origin, float(total)))
+    
+    values = np.zeros((len(keys), _month_index(last_month) - origin + 1))
+    if not cells:
+        return keys, values, None
+    rows, columns, totals = (np.array(column) for column in zip(*cells))
+    np.add.at(values, (rows.astype(int), columns.astype(int)), totals)
+    return keys, values, int(columns.min())
+
+
+def _moving_average(values, window):
+    intercept = values[:, -window:].mean(axis=1)
+    return intercept, np.zeros_like(intercept), np.ones((len(values), 12))
+
+
+def _seasonal(values, window, calendar_months):
+    """
+    A level times the mean share of each calendar month. Calendar months
+    without history, and series without two full years, get a factor of 1.
+    """
+    factors = np.ones((len(values), 12))
+    if values.shape[1] >= 24:
+        counts = np.bincount(calendar_months, minlength=12)
+        sums = np.zeros((len(values), 12))
+        np.add.at(sums.T, calendar_months, values.T)
+        means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        overall = values.mean(axis=1, keepdims=True)
+        factors = np.divide(means, overall, out=np.ones_like(means), where=(overall > 0) & (counts > 0))
+    recent = factors[:, calendar_months[-window:]]
+    level = np.divide(values[:, -window:], recent, out=values[:, -window:].copy(), where=recent > 0).mean(axis=1)
+    return level, np.zeros_like(level), factors
+
+
+def _trend(values):
+    """Least-squares lines through every series at once."""
+    t = np.arange(values.shape[1], dtype=float)
+    centered = t - t.mean()
+    denominator = (centered ** 2).sum()
+    slope = (values - values.mean(axis=1, keepdims=True)) @ centered / denominator if denominator else np.zeros(len(values))
+    intercept = values.mean(axis=1) - slope * t.mean()
+    return intercept, slope, np.ones((len(values), 12))
+
+
+def _candidates(values, origin):
+    """The parameters of every model fitted to ``values``, stacked on a first axis of models."""
+    window = min(forecast_setting('WINDOW'), values.shape[1])
+    calendar_months = (origin + np.arange(values.shape[1])) % 12
+    fits = (_moving_average(values, window), _seasonal(values, window, calendar_months), _trend(values))
+    return tuple(np.stack(parameters) for parameters in zip(*fits))
+
+
+def _predict(intercept, slope, seasonal, origin, steps):
+    """Predictions of the months ``steps`` (indexes from ``origin``) for the last axis of the parameters."""
+    steps = np.asarray(steps)
+    level = np.maximum(intercept[..., None] + slope[..., None] * steps, 0)
+    return level * seasonal[..., (origin + steps) % 12]
+
+
+@dataclass
+class Forecast:
+    """
+    Fitted parameters of a user's monthly series. ``origin`` is the month
+    index of the first month of history and ``start`` the first forecast
+    month; ``model`` holds the chosen model of each series.
+    """
+    keys: list
+    origin: int
+    start: datetime.date
+    intercept: np.ndarray
+    slope: np.ndarray
+    seasonal: np.ndarray
+    model: np.ndarray
+    
+    def model_name(self, key):
+        return MODEL_NAMES[self.model[self.keys.index(key)]] if key in self.keys else None
+    
+    def monthly(self, months):
+        """A (series, months) array of the predictions for the first ``months`` months from ``start``."""
+        steps = _month_index(self.start) - self.origin + np.arange(months)
+        return _predict(self.intercept, self.slope, self.seasonal, self.origin, steps)
+    
+    def _daily_between(self, rows, start, end):
+        """The predictions of ``rows`` summed over the days from ``start`` to ``end``, prorating partial months."""
+        first = max(_month_index(start), _month_index(self.start))
+        if end < start or _month_index(end) < first:
+            return np.zeros(len(rows))
+        months = np.arange(first, _month_index(end) + 1)
+        days = np.array([
+            (min(end, month.replace(day=monthrange(month.year, month.month)[1])) - max(start, month)).days + 1
+            for month in map(_month_start, months)
+        ])
+        lengths = np.array([_days_in(month) for month in months])
+        predictions = _predict(self.intercept[rows], self.slope[rows], self.seasonal[rows], self.origin, months - self.origin)
+        return predictions @ (days / lengths)
+    
+    def expected(self, key, start, end):
+        """The expected total of series ``key`` from ``start`` to ``end``, as Decimal."""
+        if key not in self.keys:
+            return Decimal('0.00')
+        return _decimal(self._daily_between([self.keys.index(key)], start, end)[0])
+    
+    def expected_savings(self, start, end):
+        """Expected income minus expected expenses from ``start`` to ``end``."""
+        totals = self._daily_between(list(range(len(self.keys))), start, end)
+        return _decimal(totals[0] - totals[1:].sum())
+    
+    def savings_date(self, amount, today):
+        """
+        The day after ``today`` by which expected savings reach ``amount``,
+        or None when that is beyond the horizon or savings are not positive.
+        """
+        if amount <= 0:
+            return today
+        horizon = forecast_setting('HORIZON')
+        predictions = self.monthly(horizon + 1)
+        savings = predictions[0] - predictions[1:].sum(axis=0)
+        first = _month_index(self.start)
+        lengths = np.array([_days_in(first + offset) for offset in range(horizon + 1)])
+        daily = savings / lengths
+        # Days left in the current month, then whole months
+        offset = _month_index(today) - first
+        if offset < 0 or offset > horizon:
+            return None
+        days = lengths.astype(float).copy()
+        days[:offset] = 0
+        days[offset] = lengths[offset] - today.day
+        cumulative = np.cumsum(daily * days)
+        reached = np.flatnonzero(cumulative >= float(amount))
+        if not len(reached):
+            return None
+        month = reached[0]
+        before = cumulative[month - 1] if month else 0
+        day = int(np.ceil((float(amount) - before) / daily[month]))
+        start = today if month == offset else _month_start(first + month) - datetime.timedelta(days=1)
+        return start + datetime.timedelta(days=day)
+
+
+def _days_in(month_index):
+    year, month = divmod(month_index, 12)
+    return monthrange(year, month + 1)[1]
+
+
+def _decimal(value):
+    return Decimal(str(round(float(value), 2))).quantize(CENT)
+
+
+def fit(user_id, today):
+    """
+    Fit the forecast of ``user_id`` on the complete months before ``today``
+    (at most HISTORY_MONTHS, from the first month with data), or return None
+    without any history. The history is read in one query.
+    """
+    start = today.replace(day=1)
+    last_month = (start - datetime.timedelta(days=1)).replace(day=1)
+    first_month = _month_start(_month_index(start) - forecast_setting('HISTORY_MONTHS'))
+    keys, values, first_column = _monthly_history(user_id, first_month, last_month)
+    if first_column is None:
+        return None
+    values = values[:, first_column:]
+    origin = _month_index(first_month) + first_column
+    
+    holdout = forecast_setting('HOLDOUT')
+    model = np.full(len(keys), MOVING_AVERAGE)
+    if values.shape[1] > holdout + 1:
+        # Score every model on the last months of history, fitted without them
+        training = values[:, :-holdout]
+        steps = np.arange(training.shape[1], values.shape[1])
+        predictions = _predict(*_candidates(training, origin), origin, steps)
+        errors = np.abs(predictions - values[:, -holdout:]).mean(axis=2)
+        model = errors.argmin(axis=0)
+    
+    intercept, slope, seasonal = _candidates(values, origin)
+    series = np.arange(len(keys))
+    return Forecast(
+        keys=keys, origin=origin, start=start,
+        intercept=intercept[model, series], slope=slope[model, series], seasonal=seasonal[model, series],
+        model=model,
+    )
+
+
+def forecast_params(today):
+    return {'month': today.replace(day=1)}
+
+
+def fit_for_cache(user_id, today):
+    """fit(), with False instead of None without history, as a cached None cannot be told from a miss."""
+    return fit(user_id, today) or False
+
+
+def cached_forecast(user_id, today):
+    """
+    The forecast fitted by the worker for the current data of ``user_id``,
+    or None when it has not been fitted yet or there is no history.
+    """
+    return get_cache().get(context_key(user_id, 'forecast', forecast_params(today))) or None
+
+
+def budget_outlook(goal, progress, forecast, today):
+    """
+    Whether ``goal`` (a BudgetGoal) will be overrun: the amount spent so far
+    in its period (``progress`` from BudgetGoal.progress_for()) plus the
+    expected spending of its category for the rest of the period.
+    """
+    projected = progress['spent'] + forecast.expected(
+        ('expense', goal.category_id), today + datetime.timedelta(days=1), progress['period_end']
+    )
+    return {
+        'projected': projected,
+        'overrun': projected > goal.amount,
+        'overrun_by': max(projected - goal.amount, Decimal('0.00')),
+        'model': forecast.model_name(('expense', goal.category_id)),
+    }
+
+
+def savings_outlook(goal, forecast, today):
+    """
+    Whether ``goal`` (a SavingsGoal) will reach its target by its target
+    date if the expected net savings from tomorrow on go towards it.
+    """
+    remaining = goal.target_amount - goal.current_amount
+    expected_date = forecast.savings_date(remaining, today)
+    outlook = {'expected_date': expected_date, 'on_track': None, 'projected': None}
+    if goal.target_date:
+        outlook['projected'] = goal.current_amount + max(
+            forecast.expected_savings(today + datetime.timedelta(days=1), goal.target_date), Decimal('0.00')
+        )
+        outlook['on_track'] = expected_date is not None and expected_date <= goal.target_date
+    return outlook
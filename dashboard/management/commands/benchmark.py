@@ -0,0 +1,79 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from dashboard.benchmark import compare, run_benchmark
+from dashboard.synthetic import generate_users
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every dashboard and transactions URL and count its queries at several data scales, '
+        'in a throwaway test database. Results are written as JSON and can be compared with a baseline.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='100,1000,10000', help='Comma-separated transactions per user.')
+        parser.add_argument('--users', type=int, default=1, help='Users created at each scale; the first one is measured.')
+        parser.add_argument('--repeat', type=int, default=5, help='Requests per URL and cache state.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout.')
+        parser.add_argument('--baseline', help='A previous JSON result to compare against.')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative slowdown of the median time.')
+    
+    def handle(self, *args, **options):
+        try:
+            scales = [int(scale) for scale in options['scales'].split(',')]
+        except ValueError:
+            raise CommandError('--scales must be a comma-separated list of integers.')
+        
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as error:
+                raise CommandError(f'Cannot read baseline: {error}')
+        
+        results = {
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'scales': {},
+        }
+        
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            for scale in scales:
+                # Users of earlier scales stay in the database, like other tenants would
+                users = generate_users(users=options['users'], transactions_per_user=scale, seed=options['seed'], prefix=f'bench{scale}')
+                results['scales'][str(scale)] = run_benchmark(users[0], options['repeat'])
+                for name, result in results['scales'][str(scale)].items():
+                    self.stderr.write(
+                        f"{scale:>8} {name:<28} {result['cold']['status']} cold {result['cold']['queries']:>3}q {result['cold']['median_ms']:>9.2f}ms"
+                        f"   warm {result['warm']['queries']:>3}q {result['warm']['median_ms']:>9.2f}ms"
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        
+        document = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(document + '\n')
+        else:
+            sys.stdout.write(document + '\n')
+        
+        if baseline is not None:
+            regressions = compare(results, baseline, options['tolerance'])
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}.')
+            self.stderr.write(self.style.SUCCESS('No regressions against the baseline.'))
@@ -0,0 +1,47 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.synthetic import generate_users
+
+
+class Command(BaseCommand):
+    help = 'Create synthetic users with categories, sources, goals and transactions, using bulk_create.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1)
+        parser.add_argument('--transactions', type=int, default=1000, help='Transactions per user.')
+        parser.add_argument('--categories', type=int, default=8, help='Expense categories per user.')
+        parser.add_argument('--sources', type=int, default=2, help='Income sources per user.')
+        parser.add_argument('--days', type=int, default=365, help='Number of days the transactions span.')
+        parser.add_argument('--end-date', type=datetime.date.fromisoformat, help='Last day of the span (YYYY-MM-DD); today by default.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='synthetic', help='Usernames are <prefix>-<number>.')
+        parser.add_argument('--password', default='synthetic')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert.')
+    
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['days'] < 1 or options['transactions'] < 0:
+            raise CommandError('--users and --days must be positive and --transactions not negative.')
+        if options['categories'] < 1 and options['sources'] < 1:
+            raise CommandError('Users need at least one category or source.')
+        
+        started = time.perf_counter()
+        users = generate_users(
+            users=options['users'],
+            transactions_per_user=options['transactions'],
+            categories=options['categories'],
+            sources=options['sources'],
+            days=options['days'],
+            end_date=options['end_date'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            password=options['password'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} user(s) with {options["transactions"]} transaction(s) each '
+            f'in {time.perf_counter() - started:.1f}s: {", ".join(user.username for user in users[:5])}'
+            f'{", ..." if len(users) > 5 else ""}'
+        ))
@@ -0,0 +1,74 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from dashboard.cache import cache_is_shared
+from dashboard.models import PrecomputeJob
+from dashboard.precompute import claim_jobs, precompute_dates, precompute_setting, run_jobs, setup_worker
+from transactions.rollups import active_user_ids
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute users' dashboards and reports into the cache after their data changes, and every "
+        "active user's pages for the next day shortly before midnight. Runs until interrupted; "
+        "the cache must be shared with the web processes (not locmem)."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=precompute_setting('PROCESSES'),
+            help='Worker processes; 0 precomputes in this process.'
+        )
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due instead of waiting for more.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between polls of an empty queue.')
+        parser.add_argument('--batch', type=int, default=100, help='Jobs claimed at a time.')
+        parser.add_argument('--all', action='store_true', help='Queue every active user first.')
+    
+    def handle(self, *args, **options):
+        if not cache_is_shared():
+            self.stderr.write(self.style.WARNING(
+                'The cache is per-process (locmem); precomputed pages will not reach the web processes.'
+            ))
+        
+        if options['all']:
+            PrecomputeJob.objects.enqueue(active_user_ids(), delay=0)
+        
+        executor = None
+        if options['processes'] > 0:
+            # Connections must not be shared with the workers
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                options['processes'], mp_context=multiprocessing.get_context('spawn'), initializer=setup_worker
+            )
+        
+        rolled_over = None
+        try:
+            while True:
+                dates = precompute_dates()
+                # Build tomorrow's pages for everyone before the first request of the day
+                if len(dates) > 1 and rolled_over != dates[-1]:
+                    PrecomputeJob.objects.enqueue(active_user_ids(), delay=0)
+                    rolled_over = dates[-1]
+                
+                jobs = claim_jobs(options['batch'])
+                if jobs:
+                    started = time.monotonic()
+                    built = run_jobs(jobs, dates, executor)
+                    self.stdout.write(
+                        f'{timezone.now():%Y-%m-%d %H:%M:%S} precomputed {built} page(s) for {len(jobs)} user(s) '
+                        f'in {time.monotonic() - started:.2f}s'
+                    )
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULTS = {
+    'HOST': '127.0.0.1',
+    'PORT': 8000,
+    'WORKERS': 1,
+    'LOG_LEVEL': 'info',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve the project over ASGI with uvicorn, so the async dashboard and report views run '
+        'on an event loop. Static files are not served; put a web server or WhiteNoise in front.'
+    )
+    
+    def add_arguments(self, parser):
+        profile = {**DEFAULTS, **getattr(settings, 'FINANCE_ASGI', {})}
+        parser.add_argument('--host', default=profile['HOST'])
+        parser.add_argument('--port', type=int, default=profile['PORT'])
+        parser.add_argument('--workers', type=int, default=profile['WORKERS'], help='Worker processes.')
+        parser.add_argument('--log-level', default=profile['LOG_LEVEL'])
+        parser.add_argument('--reload', action='store_true', help='Restart on code changes (development only).')
+    
+    def handle(self, *args, **options):
+        try:
+            import uvicorn
+        except ImportError:
+            raise CommandError('uvicorn is not installed; see requirements.txt.')
+        
+        if options['reload'] and options['workers'] > 1:
+            raise CommandError('--reload cannot be combined with more than one worker.')
+        
+        uvicorn.run(
+            'finance_tracker.asgi:application',
+            host=options['host'],
+            port=options['port'],
+            workers=options['workers'],
+            reload=options['reload'],
+            log_level=options['log_level'],
+            # Django does not implement the lifespan protocol
+            lifespan='off',
+        )
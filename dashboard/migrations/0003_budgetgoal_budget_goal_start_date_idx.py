@@ -0,0 +1,20 @@
+# Generated by Django 5.1.6 on 2026-10-17 13:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_precomputejob'),
+        ('transactions', '0008_transaction_txn_date_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='budgetgoal',
+            index=models.Index(fields=['start_date'], name='budget_goal_start_date_idx'),
+        ),
+    ]
@@ -1,9 +1,69 @@
 from django.db import models
+from django.db import transaction as db_transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
-from transactions.models import ExpenseCategory
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete
+from accounts.models import UserProfile
+from transactions.models import ExpenseCategory, IncomeSource, RecurringRule, Transaction
+from transactions.signals import transactions_bulk_changed, transactions_cache_stale
+from .cache import bump_data_version
 import datetime
 
+def get_period_bounds(period, today):
+    """Return the (start, end) dates of the budget period containing ``today``."""
+    if period == BudgetGoal.WEEKLY:
+        # Get the start of the current week (Monday)
+        start_of_period = today - datetime.timedelta(days=today.weekday())
+        end_of_period = start_of_period + datetime.timedelta(days=6)
+    elif period == BudgetGoal.MONTHLY:
+        # Get the start of the current month
+        start_of_period = today.replace(day=1)
+        # Get the end of the current month
+        if today.month == 12:
+            end_of_period = today.replace(day=31)
+        else:
+            next_month = today.replace(month=today.month + 1, day=1)
+            end_of_period = next_month - datetime.timedelta(days=1)
+    else:  # YEARLY
+        start_of_period = today.replace(month=1, day=1)
+        end_of_period = today.replace(month=12, day=31)
+    
+    return start_of_period, end_of_period
+
+class BudgetGoalQuerySet(models.QuerySet):
+    def with_progress(self, today=None):
+        """
+        Annotate every goal with ``weekly_spent``, ``monthly_spent`` and
+        ``yearly_spent`` for the periods containing ``today`` in one query.
+        Use BudgetGoal.progress_for() to turn them into a progress dict.
+        """
+        today = today or timezone.now().date()
+        bounds = {period: get_period_bounds(period, today) for period, _ in BudgetGoal.PERIOD_CHOICES}
+        earliest = min(start for start, _ in bounds.values())
+        latest = max(end for _, end in bounds.values())
+        
+        annotations = {}
+        for period, (start, end) in bounds.items():
+            annotations[f'{period}_spent'] = Coalesce(
+                models.Sum('period_expenses__amount', filter=models.Q(
+                    period_expenses__user=models.F('user'),
+                    period_expenses__date__gte=start,
+                    period_expenses__date__lte=end
+                )),
+                models.Value(0),
+                output_field=models.DecimalField(max_digits=14, decimal_places=2)
+            )
+        
+        return self.select_related('category').annotate(
+            period_expenses=models.FilteredRelation('category__expenses', condition=models.Q(
+                category__expenses__transaction_type=Transaction.EXPENSE,
+                category__expenses__date__gte=earliest,
+                category__expenses__date__lte=latest
+            )),
+            **annotations
+        )
+
 class BudgetGoal(models.Model):
     WEEKLY = 'weekly'
     MONTHLY = 'monthly'
@@ -22,40 +82,43 @@ class BudgetGoal(models.Model):
     start_date = models.DateField(default=timezone.now)
     end_date = models.DateField(null=True, blank=True)
     
+    objects = BudgetGoalQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # The first and last dates of the admin's date hierarchy
+            models.Index(fields=['start_date'], name='budget_goal_start_date_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.category.name} - {self.amount} ({self.get_period_display()})"
     
     def get_progress(self):
-        from transactions.models import Transaction
-        
         # Determine date range based on period
         today = timezone.now().date()
-        if self.period == self.WEEKLY:
-            # Get the start of the current week (Monday)
-            start_of_period = today - datetime.timedelta(days=today.weekday())
-            end_of_period = start_of_period + datetime.timedelta(days=6)
-        elif self.period == self.MONTHLY:
-            # Get the start of the current month
-            start_of_period = today.replace(day=1)
-            # Get the end of the current month
-            if today.month == 12:
-                end_of_period = today.replace(day=31)
-            else:
-                next_month = today.replace(month=today.month + 1, day=1)
-                end_of_period = next_month - datetime.timedelta(days=1)
-        else:  # YEARLY
-            start_of_period = today.replace(month=1, day=1)
-            end_of_period = today.replace(month=12, day=31)
+        start_of_period, end_of_period = get_period_bounds(self.period, today)
         
         # Calculate expenses for the period
         expenses = Transaction.objects.filter(
-            user=self.user,
-            expense_category=self.category,
+            user_id=self.user_id,
+            expense_category_id=self.category_id,
             transaction_type='expense',
             date__gte=start_of_period,
             date__lte=end_of_period
         ).aggregate(total=models.Sum('amount'))['total'] or 0
         
+        return self.progress_for(expenses, today)
+    
+    def progress_for(self, expenses=None, today=None):
+        """
+        Build the progress dict from ``expenses`` spent in the current period,
+        or from the annotation added by BudgetGoal.objects.with_progress().
+        """
+        today = today or timezone.now().date()
+        start_of_period, end_of_period = get_period_bounds(self.period, today)
+        if expenses is None:
+            expenses = getattr(self, f'{self.period}_spent')
+        
         return {
             'spent': expenses,
             'budget': self.amount,
@@ -88,3 +151,83 @@ class SavingsGoal(models.Model):
                 return 0
             return (self.target_date - today).days
         return None
+
+
+class PrecomputeJobQuerySet(models.QuerySet):
+    def enqueue(self, user_ids, delay=None):
+        """
+        Ask the precompute worker to rebuild the cached pages of ``user_ids``
+        after ``delay`` seconds (FINANCE_PRECOMPUTE['DELAY'] by default). A
+        user has at most one pending job, so bursts of changes coalesce.
+        """
+        from .precompute import precompute_setting
+        
+        if delay is None:
+            delay = precompute_setting('DELAY')
+        now = timezone.now()
+        run_after = now + datetime.timedelta(seconds=delay)
+        # Deleting a user deletes their data too, which queues them again
+        user_ids = User.objects.filter(pk__in=user_ids).values_list('pk', flat=True)
+        return self.bulk_create(
+            [PrecomputeJob(user_id=user_id, requested_at=now, run_after=run_after) for user_id in user_ids],
+            update_conflicts=True,
+            unique_fields=['user'],
+            # A new request starts over, even while an earlier one is leased
+            update_fields=['requested_at', 'run_after', 'attempts', 'last_error']
+        )
+    
+    def due(self, now=None):
+        return self.filter(run_after__lte=now or timezone.now()).order_by('run_after')
+
+class PrecomputeJob(models.Model):
+    """
+    A pending request to precompute a user's dashboard and reports; the
+    database-backed queue of the precompute_dashboards worker.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='precompute_job')
+    requested_at = models.DateTimeField(default=timezone.now)
+    run_after = models.DateTimeField(default=timezone.now, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    
+    objects = PrecomputeJobQuerySet.as_manager()
+    
+    def __str__(self):
+        return f"Precompute {self.user_id} after {self.run_after:%Y-%m-%d %H:%M:%S}"
+
+
+def _enqueue_precompute(user_ids):
+    from .precompute import precompute_setting
+    
+    if precompute_setting('ENABLED'):
+        db_transaction.on_commit(lambda: PrecomputeJob.objects.enqueue(user_ids))
+
+def bump_user_data_version(sender, instance, **kwargs):
+    bump_data_version(instance.user_id)
+    _enqueue_precompute([instance.user_id])
+
+# Any change to a user's financial data invalidates their cached dashboard and
+# reports, and schedules them to be precomputed again
+for model in (Transaction, IncomeSource, ExpenseCategory, RecurringRule, BudgetGoal, SavingsGoal):
+    for signal in (post_save, post_delete):
+        signal.connect(bump_user_data_version, sender=model, dispatch_uid=f'bump_data_version_{model.__name__}_{signal is post_save}')
+
+def bump_bulk_data_versions(sender, user_ids, **kwargs):
+    for user_id in user_ids:
+        bump_data_version(user_id)
+    _enqueue_precompute(user_ids)
+
+transactions_bulk_changed.connect(bump_bulk_data_versions, dispatch_uid='bump_data_version_bulk')
+transactions_cache_stale.connect(bump_bulk_data_versions, dispatch_uid='bump_data_version_cache_stale')
+
+# The username and profile are part of every rendered page. Logging in only
+# updates last_login, which conditional responses read directly.
+def bump_user_version(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        bump_data_version(instance.pk)
+
+def bump_profile_version(sender, instance, **kwargs):
+    bump_data_version(instance.user_id)
+
+post_save.connect(bump_user_version, sender=User, dispatch_uid='bump_data_version_User')
+post_save.connect(bump_profile_version, sender=UserProfile, dispatch_uid='bump_data_version_UserProfile')
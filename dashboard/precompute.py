@@ -0,0 +1,168 @@
+import datetime
+import logging
+from concurrent.futures import as_completed
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import precompute
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Seconds to wait after a change, so a burst of edits or an import is
+    # precomputed once
+    'DELAY': 5,
+    # Cache lifetime of precomputed pages; they are replaced on every change
+    # and at midnight, so this only bounds the memory of inactive users
+    'TIMEOUT': 2 * 24 * 3600,
+    # Seconds before midnight at which every active user's pages for the
+    # next day are built
+    'LEAD_TIME': 15 * 60,
+    'PROCESSES': 2,
+    'RETRY_DELAY': 60,
+    'MAX_ATTEMPTS': 5,
+    # Seconds a claimed job stays hidden from other workers; a job whose
+    # worker died before finishing it is taken up again after that
+    'LEASE': 10 * 60,
+}
+
+# The pages a user lands on without parameters
+REPORT_TYPES = ('monthly', 'yearly')
+
+
+def precompute_setting(name):
+    return getattr(settings, 'FINANCE_PRECOMPUTE', {}).get(name, DEFAULTS[name])
+
+
+def precompute_dates(now=None):
+    """Today, plus tomorrow once midnight is less than LEAD_TIME away."""
+    now = now or timezone.now()
+    today = now.date()
+    soon = (now + datetime.timedelta(seconds=precompute_setting('LEAD_TIME'))).date()
+    return [today] if soon == today else [today, soon]
+
+
+def setup_worker():
+    """Initializer of the worker processes, which start from a fresh interpreter."""
+    django.setup()
+
+
+def precompute_user(user_id, dates):
+    """
+    Fit the forecast and build the dashboard and the monthly and yearly
+    reports of ``user_id`` and cache them as they will be requested on each
+    of ``dates``. Runs in the
+    worker processes, so it must stay a picklable module-level function.
+    Returns the number of pages built.
+    """
+    # Imported here, as this module is loaded by the workers before setup
+    from django.contrib.auth.models import User
+    from .forecast import fit_for_cache, forecast_params
+    from .views import build_dashboard_context, build_report_context, report_params, report_period
+    
+    close_old_connections()
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return 0
+    
+    timeout = precompute_setting('TIMEOUT')
+    built = 0
+    for today in dates:
+        built += precompute(
+            user_id, 'forecast', forecast_params(today),
+            lambda: fit_for_cache(user_id, today), timeout
+        )
+        built += precompute(
+            user_id, 'dashboard', {'today': today},
+            lambda: build_dashboard_context(user, today), timeout
+        )
+        for report_type in REPORT_TYPES:
+            title, start_date, end_date = report_period(report_type, today)
+            built += precompute(
+                user_id, 'report', report_params(report_type, start_date, end_date),
+                lambda: build_report_context(user, title, start_date, end_date), timeout
+            )
+    return built
+
+
+def claim_jobs(limit, now=None):
+    """
+    Lease up to ``limit`` due jobs: each is pushed back by LEASE seconds
+    and counts an attempt, and is only deleted once it has run (see
+    finish_job). Rows locked by another worker are skipped where the
+    database supports it, so several workers can share the queue.
+    """
+    from .models import PrecomputeJob
+    
+    now = now or timezone.now()
+    with db_transaction.atomic():
+        jobs = PrecomputeJob.objects.due(now)
+        if connection.features.has_select_for_update_skip_locked:
+            jobs = jobs.select_for_update(skip_locked=True)
+        jobs = list(jobs[:limit])
+        PrecomputeJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            run_after=now + datetime.timedelta(seconds=precompute_setting('LEASE')),
+            attempts=F('attempts') + 1,
+        )
+    for job in jobs:
+        job.attempts += 1
+    return jobs
+
+
+def _unchanged(job):
+    """The queued row of ``job``, unless the user was queued again since it was claimed."""
+    from .models import PrecomputeJob
+    
+    return PrecomputeJob.objects.filter(pk=job.pk, requested_at=job.requested_at)
+
+
+def finish_job(job):
+    """Remove a job that ran; a job requested again meanwhile stays queued for the newer data."""
+    _unchanged(job).delete()
+
+
+def retry_job(job, error):
+    """Schedule a failed job again with exponential backoff, unless it ran out of attempts or was requested again."""
+    if job.attempts >= precompute_setting('MAX_ATTEMPTS'):
+        logger.error("Giving up precomputing user %s after %s attempts: %s", job.user_id, job.attempts, error)
+        finish_job(job)
+        return
+    
+    delay = precompute_setting('RETRY_DELAY') * 2 ** (job.attempts - 1)
+    _unchanged(job).update(run_after=timezone.now() + datetime.timedelta(seconds=delay), last_error=str(error))
+
+
+def run_jobs(jobs, dates, executor=None):
+    """
+    Precompute the users of ``jobs``, in the processes of ``executor`` or
+    inline without one. Returns the number of pages built.
+    """
+    built = 0
+    if executor is None:
+        for job in jobs:
+            try:
+                built += precompute_user(job.user_id, dates)
+            except Exception as exc:
+                logger.exception("Precomputing user %s failed", job.user_id)
+                retry_job(job, exc)
+            else:
+                finish_job(job)
+        return built
+    
+    futures = {executor.submit(precompute_user, job.user_id, dates): job for job in jobs}
+    for future in as_completed(futures):
+        job = futures[future]
+        try:
+            built += future.result()
+        except Exception as exc:
+            logger.error("Precomputing user %s failed: %s", job.user_id, exc)
+            retry_job(job, exc)
+        else:
+            finish_job(job)
+    return built
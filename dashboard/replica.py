@@ -0,0 +1,43 @@
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+
+from finance_tracker import routers
+from .cache import get_data_version
+
+
+def replica_is_current(user_id):
+    """
+    Whether the read replica can be trusted with the data of ``user_id``:
+    their latest change (the data version is its time) is older than
+    FINANCE_REPLICA_LAG seconds. Pages are cached under that version, so
+    building one from a replica that is behind would keep it stale until
+    the next change.
+    """
+    return time.time_ns() - get_data_version(user_id) > settings.FINANCE_REPLICA_LAG * 10 ** 9
+
+
+def read_from_replica(view):
+    """
+    Run the read-only ``view`` with its queries sent to the read replica,
+    when one is configured and the user's data has not changed too recently
+    for it (see finance_tracker.routers).
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            enabled = False
+            if routers.replica_configured():
+                user = await request.auser()
+                enabled = await sync_to_async(replica_is_current)(user.pk)
+            with routers.replica_reads(enabled):
+                return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            enabled = routers.replica_configured() and replica_is_current(request.user.pk)
+            with routers.replica_reads(enabled):
+                return view(request, *args, **kwargs)
+    return inner
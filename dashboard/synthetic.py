@@ -0,0 +1,128 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction as db_transaction
+
+from accounts.models import UserProfile
+from transactions.dedupe import keys_for
+from transactions.models import ExpenseCategory, IncomeSource, Transaction
+from transactions.signals import transactions_bulk_changed
+from .models import BudgetGoal, SavingsGoal
+
+# (name, typical amount, share of expenses); categories beyond this list get generic names
+CATEGORIES = [
+    ('Groceries', 60, 24), ('Dining Out', 35, 14), ('Transport', 25, 12), ('Utilities', 90, 5),
+    ('Rent', 1200, 1), ('Entertainment', 40, 8), ('Shopping', 75, 10), ('Health', 55, 4),
+    ('Travel', 400, 2), ('Subscriptions', 15, 6), ('Gifts', 50, 3), ('Education', 120, 2),
+]
+
+SOURCES = [('Salary', 3500), ('Freelance', 600), ('Interest', 20), ('Dividends', 150), ('Refunds', 40)]
+
+MERCHANTS = [
+    'Corner Market', 'SuperSave', 'City Transit', 'Fuel Stop', 'Power & Light', 'Cafe Roma',
+    'Noodle House', 'Cinema 8', 'Online Store', 'Pharmacy Plus', 'Book Nook', 'Streamly',
+    'Air Lines', 'Hotel Central', 'Gym Club', 'Hardware Depot',
+]
+
+
+def _amount(rng, typical):
+    # Log-normal around the typical amount, like real spending
+    return Decimal(str(round(max(0.5, rng.lognormvariate(0, 0.6) * typical), 2)))
+
+
+def generate_users(users=1, transactions_per_user=1000, categories=8, sources=2, days=365,
+                   end_date=None, seed=0, prefix='synthetic', password='synthetic', batch_size=5000):
+    """
+    Create ``users`` users with categories, sources, goals and
+    ``transactions_per_user`` transactions spread over the ``days`` before
+    ``end_date``, all with bulk_create. Income comes mostly from the first
+    source (Salary); expenses follow per-category frequencies and log-normal
+    amounts. The same seed always produces the same data.
+    
+    Returns the created users.
+    """
+    rng = random.Random(seed)
+    end_date = end_date or datetime.date.today()
+    start_date = end_date - datetime.timedelta(days=days - 1)
+    password = make_password(password)
+    
+    with db_transaction.atomic():
+        taken = set(User.objects.filter(username__startswith=f'{prefix}-').values_list('username', flat=True))
+        names = []
+        number = 0
+        while len(names) < users:
+            if f'{prefix}-{number}' not in taken:
+                names.append(f'{prefix}-{number}')
+            number += 1
+        User.objects.bulk_create([User(username=name, password=password, email=f'{name}@example.com') for name in names])
+        # bulk_create skips the signal that creates profiles
+        created = list(User.objects.filter(username__in=names).order_by('id'))
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in created])
+        
+        category_specs = [
+            CATEGORIES[number] if number < len(CATEGORIES) else (f'Category {number + 1}', 50, 2)
+            for number in range(categories)
+        ]
+        source_specs = [
+            SOURCES[number] if number < len(SOURCES) else (f'Source {number + 1}', 200)
+            for number in range(sources)
+        ]
+        ExpenseCategory.objects.bulk_create([
+            ExpenseCategory(user=user, name=name, monthly_budget=Decimal(typical * 4))
+            for user in created for name, typical, _ in category_specs
+        ])
+        IncomeSource.objects.bulk_create([
+            IncomeSource(user=user, name=name) for user in created for name, _ in source_specs
+        ])
+        
+        for user in created:
+            user_categories = list(ExpenseCategory.objects.filter(user=user).order_by('id'))
+            user_sources = list(IncomeSource.objects.filter(user=user).order_by('id'))
+            
+            rows = []
+            for number in range(transactions_per_user):
+                date = start_date + datetime.timedelta(days=rng.randrange(days))
+                if user_sources and rng.random() < 0.08:
+                    index = 0 if rng.random() < 0.6 else rng.randrange(len(user_sources))
+                    rows.append(Transaction(
+                        user=user, date=date, transaction_type=Transaction.INCOME,
+                        amount=_amount(rng, source_specs[index][1]), income_source=user_sources[index],
+                        description=f'{source_specs[index][0]} payment',
+                    ))
+                elif user_categories:
+                    index = rng.choices(range(len(category_specs)), weights=[spec[2] for spec in category_specs])[0]
+                    rows.append(Transaction(
+                        user=user, date=date, transaction_type=Transaction.EXPENSE,
+                        amount=_amount(rng, category_specs[index][1]), expense_category=user_categories[index],
+                        description=f'{rng.choice(MERCHANTS)} #{rng.randrange(1000, 9999)}',
+                    ))
+                
+                if len(rows) >= batch_size:
+                    _insert(rows, batch_size)
+                    rows = []
+            _insert(rows, batch_size)
+            
+            BudgetGoal.objects.bulk_create([
+                BudgetGoal(user=user, category=category, amount=Decimal(spec[1] * 5), period=period, start_date=start_date)
+                for category, spec, period in zip(
+                    user_categories, category_specs, [BudgetGoal.MONTHLY, BudgetGoal.WEEKLY, BudgetGoal.YEARLY]
+                )
+            ])
+            SavingsGoal.objects.bulk_create([
+                SavingsGoal(user=user, name='Emergency fund', target_amount=Decimal('10000'), current_amount=Decimal(rng.randrange(0, 8000))),
+                SavingsGoal(user=user, name='Holiday', target_amount=Decimal('2500'), current_amount=Decimal(rng.randrange(0, 2500)),
+                            target_date=end_date + datetime.timedelta(days=rng.randrange(30, 365))),
+            ])
+        
+        transactions_bulk_changed.send(sender=Transaction, user_ids=[user.id for user in created])
+    
+    return created
+
+
+def _insert(rows, batch_size):
+    for row in rows:
+        row.fingerprint, row.match_key = keys_for(row)
+    Transaction.objects.bulk_create(rows, batch_size=batch_size)
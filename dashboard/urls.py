@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
+    path('async/', views.dashboard_async, name='dashboard_async'),
     
     # Budget Goals
     path('budget-goals/', views.budget_goal_list, name='budget_goal_list'),
@@ -18,4 +19,5 @@ urlpatterns = [
     
     # Reports
     path('reports/', views.generate_report, name='generate_report'),
+    path('reports/async/', views.generate_report_async, name='generate_report_async'),
 ] 
\ No newline at end of file
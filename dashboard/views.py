@@ -6,88 +6,96 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 from calendar import monthrange
 from django.http import JsonResponse
+from asgiref.sync import sync_to_async
 import json
 
-from transactions.models import Transaction, IncomeSource, ExpenseCategory
+from transactions.models import Transaction, IncomeSource, ExpenseCategory, MonthlyRollup, RecurringRule
+from transactions.recurring import project
+from transactions.aggregates import period_totals, comparison_series
+from transactions.analytics import analyze
+from monitoring.instrumentation import query_budget
 from .models import BudgetGoal, SavingsGoal
+from .cache import cache_is_shared, get_or_build, aget_or_build
+from .forecast import budget_outlook, cached_forecast, fit_for_cache, forecast_params, savings_outlook
+from .precompute import precompute_setting
+from .concurrency import run_queries, gather_queries
+from .conditional import data_condition
+from .replica import read_from_replica
 from .forms import BudgetGoalForm, SavingsGoalForm
 
-@login_required
-def dashboard(request):
-    today = timezone.now().date()
+def dashboard_queries(user, today):
+    """
+    The dashboard's independent query groups, as callables keyed by name.
+    Each one returns evaluated results, so the groups can run in any order
+    or concurrently.
+    """
     start_of_month = today.replace(day=1)
     _, last_day = monthrange(today.year, today.month)
     end_of_month = today.replace(day=last_day)
     
-    # Monthly overview
-    income_transactions = Transaction.objects.filter(
-        user=request.user,
-        transaction_type=Transaction.INCOME,
-        date__gte=start_of_month,
-        date__lte=end_of_month
-    )
-    
-    expense_transactions = Transaction.objects.filter(
-        user=request.user,
-        transaction_type=Transaction.EXPENSE,
-        date__gte=start_of_month,
-        date__lte=end_of_month
-    )
-    
-    monthly_income = income_transactions.aggregate(total=Sum('amount'))['total'] or 0
-    monthly_expenses = expense_transactions.aggregate(total=Sum('amount'))['total'] or 0
-    monthly_savings = monthly_income - monthly_expenses
-    
-    # Income breakdown by source
-    income_by_source = list(income_transactions.values('income_source__name').annotate(
-        total=Sum('amount'),
-        name=F('income_source__name')
-    ).order_by('-total'))
-    
-    # Expense breakdown by category
-    expense_by_category = list(expense_transactions.values('expense_category__name').annotate(
-        total=Sum('amount'),
-        name=F('expense_category__name')
-    ).order_by('-total'))
-    
-    # Budget status
-    budget_statuses = []
-    expense_categories = ExpenseCategory.objects.filter(user=request.user)
-    
-    for category in expense_categories:
-        budget_status = category.get_budget_status(today.year, today.month)
-        budget_status['category'] = category.name
-        budget_statuses.append(budget_status)
-    
-    # Recent transactions
-    recent_transactions = Transaction.objects.filter(user=request.user).order_by('-date')[:5]
+    def budget_statuses():
+        statuses = []
+        for category in ExpenseCategory.objects.filter(user=user).with_budget_status(today.year, today.month):
+            budget_status = category.budget_status_for(category.monthly_spent)
+            budget_status['category'] = category.name
+            statuses.append(budget_status)
+        return statuses
+    
+    def upcoming():
+        # Recurring occurrences of the next 30 days, projected without rows
+        horizon = max(today + timedelta(days=30), end_of_month)
+        rules = RecurringRule.objects.filter(user=user, active=True, next_date__lte=horizon).select_related(
+            'income_source', 'expense_category'
+        )
+        projected = project(rules, today, horizon)
+        this_month = [transaction for transaction in projected if transaction.date <= end_of_month]
+        return {
+            'transactions': [transaction for transaction in projected if transaction.date <= today + timedelta(days=30)],
+            'month_income': sum(transaction.amount for transaction in this_month if transaction.transaction_type == Transaction.INCOME),
+            'month_expense': sum(transaction.amount for transaction in this_month if transaction.transaction_type == Transaction.EXPENSE),
+        }
     
-    # Savings goals
-    savings_goals = SavingsGoal.objects.filter(user=request.user)
+    return {
+        # Daily, weekly and monthly buckets from a single grouped query
+        'month_totals': lambda: period_totals(Transaction.objects.filter(user=user), start_of_month, end_of_month),
+        # Income and expense breakdowns from the monthly rollups
+        'month_summary': lambda: MonthlyRollup.objects.filter(user=user, month=start_of_month).summary(),
+        'budget_statuses': budget_statuses,
+        'recent_transactions': lambda: list(Transaction.objects.filter(user=user).select_related(
+            'income_source', 'expense_category', 'receipt_image'
+        ).order_by('-date')[:5]),
+        'savings_goals': lambda: list(SavingsGoal.objects.filter(user=user)),
+        'upcoming': upcoming,
+    }
+
+def dashboard_context(results):
+    """Build the dashboard context from the results of dashboard_queries()."""
+    month_totals = results['month_totals']
+    income_by_source = results['month_summary'].income_by_source
+    expense_by_category = results['month_summary'].expense_by_category
     
     # Prepare data for charts
-    current_month_dates = [start_of_month + timedelta(days=x) for x in range((end_of_month - start_of_month).days + 1)]
-    
-    daily_expense_data = []
-    for date in current_month_dates:
-        daily_total = expense_transactions.filter(date=date).aggregate(total=Sum('amount'))['total'] or 0
-        daily_expense_data.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'amount': float(daily_total)
-        })
+    daily_expense_data = [{
+        'date': bucket['date'].strftime('%Y-%m-%d'),
+        'amount': float(bucket['expense'])
+    } for bucket in month_totals.daily]
     
     category_data = [{'name': item['name'], 'value': float(item['total'])} for item in expense_by_category]
     income_data = [{'name': item['name'], 'value': float(item['total'])} for item in income_by_source]
     
     context = {
-        'monthly_income': monthly_income,
-        'monthly_expenses': monthly_expenses,
-        'monthly_savings': monthly_savings,
+        'monthly_income': month_totals.income,
+        'monthly_expenses': month_totals.expense,
+        'monthly_savings': month_totals.balance,
         'income_by_source': income_by_source,
         'expense_by_category': expense_by_category,
-        'budget_statuses': budget_statuses,
-        'recent_transactions': recent_transactions,
-        'savings_goals': savings_goals,
+        'budget_statuses': results['budget_statuses'],
+        'recent_transactions': results['recent_transactions'],
+        'savings_goals': results['savings_goals'],
+        'upcoming_transactions': results['upcoming']['transactions'][:8],
+        'projected_month_savings': (
+            month_totals.balance + results['upcoming']['month_income'] - results['upcoming']['month_expense']
+        ),
         'charts_data': {
             'daily_expenses': json.dumps(daily_expense_data),
             'category_expenses': json.dumps(category_data),
@@ -95,14 +103,73 @@ def dashboard(request):
         }
     }
     
+    return context
+
+def build_dashboard_context(user, today):
+    """Compute the dashboard context of ``user``; the result is picklable so it can be cached."""
+    return dashboard_context(run_queries(dashboard_queries(user, today)))
+
+def get_forecast(user_id, today):
+    """
+    The cash-flow forecast of ``user_id``, or None. Every change queues the
+    user for the precompute worker, which fits it; requests only fit it
+    themselves when the worker is disabled or cannot reach their cache.
+    """
+    if precompute_setting('ENABLED') and cache_is_shared():
+        return cached_forecast(user_id, today)
+    return get_or_build(user_id, 'forecast', forecast_params(today), lambda: fit_for_cache(user_id, today)) or None
+
+def with_savings_outlooks(savings_goals, forecast, today):
+    """Set ``outlook`` on every goal of ``savings_goals`` (see forecast.savings_outlook)."""
+    for goal in savings_goals:
+        goal.outlook = savings_outlook(goal, forecast, today) if forecast else None
+    return savings_goals
+
+@login_required
+@data_condition
+@query_budget(10)
+@read_from_replica
+def dashboard(request):
+    today = timezone.now().date()
+    context = get_or_build(
+        request.user.id, 'dashboard', {'today': today},
+        lambda: build_dashboard_context(request.user, today)
+    )
+    with_savings_outlooks(context['savings_goals'], get_forecast(request.user.id, today), today)
+    
     return render(request, 'dashboard/dashboard.html', context)
 
+# One more than dashboard: request.auser() and the templates' request.user
+# each load the user
+@login_required
+@data_condition
+@query_budget(11)
+@read_from_replica
+async def dashboard_async(request):
+    """The dashboard with its query groups running concurrently (see gather_queries)."""
+    user = await request.auser()
+    today = timezone.now().date()
+    
+    async def build():
+        return dashboard_context(await gather_queries(dashboard_queries(user, today)))
+    
+    context = await aget_or_build(user.id, 'dashboard', {'today': today}, build)
+    forecast = await sync_to_async(get_forecast)(user.id, today)
+    with_savings_outlooks(context['savings_goals'], forecast, today)
+    return await sync_to_async(render)(request, 'dashboard/dashboard.html', context)
+
 @login_required
+@data_condition
+@query_budget(6)
+@read_from_replica
 def budget_goal_list(request):
-    budget_goals = BudgetGoal.objects.filter(user=request.user)
+    today = timezone.now().date()
+    budget_goals = BudgetGoal.objects.filter(user=request.user).with_progress(today)
+    forecast = get_forecast(request.user.id, today)
     
     for goal in budget_goals:
-        goal.progress = goal.get_progress()
+        goal.progress = goal.progress_for(today=today)
+        goal.outlook = budget_outlook(goal, goal.progress, forecast, today) if forecast else None
     
     return render(request, 'dashboard/budget_goal_list.html', {'budget_goals': budget_goals})
 
@@ -148,8 +215,14 @@ def budget_goal_delete(request, pk):
     return render(request, 'dashboard/budget_goal_confirm_delete.html', {'budget_goal': budget_goal})
 
 @login_required
+@data_condition
+@query_budget(6)
+@read_from_replica
 def savings_goal_list(request):
-    savings_goals = SavingsGoal.objects.filter(user=request.user)
+    today = timezone.now().date()
+    savings_goals = with_savings_outlooks(
+        list(SavingsGoal.objects.filter(user=request.user)), get_forecast(request.user.id, today), today
+    )
     return render(request, 'dashboard/savings_goal_list.html', {'savings_goals': savings_goals})
 
 @login_required
@@ -193,100 +266,45 @@ def savings_goal_delete(request, pk):
     
     return render(request, 'dashboard/savings_goal_confirm_delete.html', {'savings_goal': savings_goal})
 
-@login_required
-def generate_report(request):
-    report_type = request.GET.get('type', 'monthly')
-    year = int(request.GET.get('year', timezone.now().year))
-    month = int(request.GET.get('month', timezone.now().month))
-    
-    # Determine date range based on report type
-    if report_type == 'monthly':
-        start_date = datetime(year, month, 1).date()
-        _, last_day = monthrange(year, month)
-        end_date = datetime(year, month, last_day).date()
-        title = f"Monthly Report - {start_date.strftime('%B %Y')}"
-    elif report_type == 'yearly':
-        start_date = datetime(year, 1, 1).date()
-        end_date = datetime(year, 12, 31).date()
-        title = f"Yearly Report - {year}"
-    else:  # custom
-        start_date = datetime.strptime(request.GET.get('start_date'), '%Y-%m-%d').date()
-        end_date = datetime.strptime(request.GET.get('end_date'), '%Y-%m-%d').date()
-        title = f"Custom Report - {start_date.strftime('%d %b %Y')} to {end_date.strftime('%d %b %Y')}"
-    
-    # Get transactions for the period
-    transactions = Transaction.objects.filter(
-        user=request.user,
-        date__gte=start_date,
-        date__lte=end_date
-    )
-    
-    income_transactions = transactions.filter(transaction_type=Transaction.INCOME)
-    expense_transactions = transactions.filter(transaction_type=Transaction.EXPENSE)
-    
-    # Calculate summary
-    total_income = income_transactions.aggregate(total=Sum('amount'))['total'] or 0
-    total_expenses = expense_transactions.aggregate(total=Sum('amount'))['total'] or 0
+def report_queries(user, start_date, end_date):
+    """The report's independent query groups, as callables keyed by name."""
+    def summary():
+        # Whole-month periods can be answered from the monthly rollups
+        _, end_month_days = monthrange(end_date.year, end_date.month)
+        if start_date.day == 1 and end_date.day == end_month_days:
+            return MonthlyRollup.objects.filter(user=user).between(start_date, end_date).summary()
+        # Arbitrary ranges go through the configured analytics backend
+        transactions = Transaction.objects.filter(user=user, date__gte=start_date, date__lte=end_date)
+        return analyze(transactions, start_date, end_date)
+    
+    return {
+        'summary': summary,
+        # Income and expenses per day, week, month or quarter next to the same
+        # period a year earlier, from one grouped query
+        'comparison': lambda: comparison_series(Transaction.objects.filter(user=user), start_date, end_date),
+    }
+
+def report_context(results, title, start_date, end_date):
+    """Build the report context from the results of report_queries()."""
+    summary = results['summary']
+    total_income = summary.income_total
+    total_expenses = summary.expense_total
+    income_by_source = summary.income_by_source
+    expense_by_category = summary.expense_by_category
     net_savings = total_income - total_expenses
     
-    # Income breakdown by source
-    income_by_source = list(income_transactions.values('income_source__name').annotate(
-        total=Sum('amount'),
-        name=F('income_source__name')
-    ).order_by('-total'))
-    
-    # Expense breakdown by category
-    expense_by_category = list(expense_transactions.values('expense_category__name').annotate(
-        total=Sum('amount'),
-        name=F('expense_category__name')
-    ).order_by('-total'))
-    
     # Prepare chart data
     income_data = [{'name': item['name'], 'value': float(item['total'])} for item in income_by_source]
     expense_data = [{'name': item['name'], 'value': float(item['total'])} for item in expense_by_category]
     
-    # Generate monthly data for the comparison chart
-    monthly_data = []
-    current_year = timezone.now().year
-    
-    # Only generate monthly data if viewing yearly report or if in current year
-    if report_type == 'yearly' or (start_date.year == current_year):
-        # Get data for each month
-        for m in range(1, 13):
-            month_start = datetime(year, m, 1).date()
-            _, month_days = monthrange(year, m)
-            month_end = datetime(year, m, month_days).date()
-            
-            # Skip future months
-            if month_start > timezone.now().date():
-                monthly_data.append({
-                    'month': month_start.strftime('%b'),
-                    'income': 0,
-                    'expenses': 0
-                })
-                continue
-            
-            # Get monthly income
-            month_income = Transaction.objects.filter(
-                user=request.user,
-                transaction_type=Transaction.INCOME,
-                date__gte=month_start,
-                date__lte=month_end
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            # Get monthly expenses
-            month_expenses = Transaction.objects.filter(
-                user=request.user,
-                transaction_type=Transaction.EXPENSE,
-                date__gte=month_start,
-                date__lte=month_end
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            monthly_data.append({
-                'month': month_start.strftime('%b'),
-                'income': float(month_income),
-                'expenses': float(month_expenses)
-            })
+    granularity, buckets = results['comparison']
+    comparison_data = [{
+        'label': bucket['label'],
+        'income': float(bucket['income']),
+        'expenses': float(bucket['expense']),
+        'previous_income': float(bucket['previous_income']),
+        'previous_expenses': float(bucket['previous_expense'])
+    } for bucket in buckets]
     
     context = {
         'title': title,
@@ -297,11 +315,87 @@ def generate_report(request):
         'net_savings': net_savings,
         'income_by_source': income_by_source,
         'expense_by_category': expense_by_category,
-        'monthly_data': monthly_data,
+        'granularity': granularity,
         'charts_data': {
             'income': json.dumps(income_data),
-            'expenses': json.dumps(expense_data)
+            'expenses': json.dumps(expense_data),
+            'comparison': json.dumps(comparison_data)
         }
     }
     
+    return context
+
+def build_report_context(user, title, start_date, end_date):
+    """Compute the report context of ``user`` for the given period; the result is picklable."""
+    return report_context(run_queries(report_queries(user, start_date, end_date)), title, start_date, end_date)
+
+def report_period(report_type, today, year=None, month=None, start_date=None, end_date=None):
+    """Return the (title, start_date, end_date) of a report; year and month default to today's."""
+    year = year or today.year
+    month = month or today.month
+    
+    # Determine date range based on report type
+    if report_type == 'monthly':
+        start_date = datetime(year, month, 1).date()
+        _, last_day = monthrange(year, month)
+        end_date = datetime(year, month, last_day).date()
+        title = f"Monthly Report - {start_date.strftime('%B %Y')}"
+    elif report_type == 'yearly':
+        start_date = datetime(year, 1, 1).date()
+        end_date = datetime(year, 12, 31).date()
+        title = f"Yearly Report - {year}"
+    else:  # custom
+        title = f"Custom Report - {start_date.strftime('%d %b %Y')} to {end_date.strftime('%d %b %Y')}"
+    
+    return title, start_date, end_date
+
+def report_params(report_type, start_date, end_date):
+    """The cache parameters of a report, shared with the precompute worker."""
+    return {'type': report_type, 'start_date': start_date, 'end_date': end_date}
+
+def _report_period(request):
+    """Return the (report_type, title, start_date, end_date) requested by the report form."""
+    today = timezone.now().date()
+    report_type = request.GET.get('type', 'monthly')
+    start_date = end_date = None
+    if report_type not in ('monthly', 'yearly'):
+        start_date = datetime.strptime(request.GET.get('start_date'), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.GET.get('end_date'), '%Y-%m-%d').date()
+    
+    title, start_date, end_date = report_period(
+        report_type, today, int(request.GET.get('year', today.year)), int(request.GET.get('month', today.month)),
+        start_date, end_date
+    )
+    return report_type, title, start_date, end_date
+
+@login_required
+@data_condition
+@query_budget(8)
+@read_from_replica
+def generate_report(request):
+    report_type, title, start_date, end_date = _report_period(request)
+    
+    params = report_params(report_type, start_date, end_date)
+    context = get_or_build(
+        request.user.id, 'report', params,
+        lambda: build_report_context(request.user, title, start_date, end_date)
+    )
+    
     return render(request, 'dashboard/report.html', context)
+
+@login_required
+@data_condition
+@query_budget(8)
+@read_from_replica
+async def generate_report_async(request):
+    """The report with its query groups running concurrently (see gather_queries)."""
+    user = await request.auser()
+    report_type, title, start_date, end_date = _report_period(request)
+    
+    async def build():
+        results = await gather_queries(report_queries(user, start_date, end_date))
+        return report_context(results, title, start_date, end_date)
+    
+    params = report_params(report_type, start_date, end_date)
+    context = await aget_or_build(user.id, 'report', params, build)
+    return await sync_to_async(render)(request, 'dashboard/report.html', context)
@@ -0,0 +1,50 @@
+"""
+Read replica routing.
+
+When a 'replica' database is configured (DATABASE_REPLICA_URL), the reads
+of code run inside ``replica_reads()`` go to it; everything else, and every
+write, uses 'default'. The replica mirrors the primary, so objects read from
+either can be related, and migrations only run on the primary.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA = 'replica'
+
+# A context variable, so async views and the threads they start through
+# asgiref (see dashboard.concurrency) see it too
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Send the reads of the enclosed code to the replica when ``enabled``."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and replica_configured():
+            return REPLICA
+        return None
+    
+    def db_for_write(self, model, **hints):
+        # Not the database an instance was read from, which may be the replica
+        return DEFAULT_DB_ALIAS
+    
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+    
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
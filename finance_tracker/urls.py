@@ -25,9 +25,11 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
     path('transactions/', include('transactions.urls')),
     path('dashboard/', include('dashboard.urls')),
+    path('api/v1/', include('api.urls')),
+    path('metrics/', include('monitoring.urls')),
     path('', RedirectView.as_view(url='dashboard/', permanent=True)),
 ]
 
-# Serve media files in development
+# Serve media files in development (receipts go through transaction_receipt)
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
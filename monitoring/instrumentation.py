@@ -0,0 +1,67 @@
+import contextvars
+import logging
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RequestStats:
+    """SQL and template timings of one request, in seconds."""
+    queries: int = 0
+    sql_time: float = 0.0
+    template_time: float = 0.0
+    total_time: float = 0.0
+    
+    def record_query(self, execute, sql, params, many, context):
+        """A connection.execute_wrapper() that counts and times every query."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - started
+
+
+# The stats of the request being served; copied into sync_to_async threads
+current_stats = contextvars.ContextVar('current_stats', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries):
+    """
+    Declare the most SQL queries a view may run per request, counting the
+    session and user lookups. Requests over budget are logged, or raise
+    QueryBudgetExceeded when FINANCE_QUERY_BUDGET_STRICT is set (as it is
+    under the test runner). Class-based and DRF views can set a
+    ``query_budget`` class attribute instead.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def get_query_budget(view):
+    budget = getattr(view, 'query_budget', None)
+    if budget is None:
+        # as_view() functions of class-based views keep their class here
+        budget = getattr(getattr(view, 'view_class', None) or getattr(view, 'cls', None), 'query_budget', None)
+    return budget
+
+
+def check_query_budget(view_name, budget, stats):
+    """Return whether ``stats`` fits ``budget``, logging or raising when it does not."""
+    if budget is None or stats.queries <= budget:
+        return True
+    message = f'{view_name} ran {stats.queries} queries, over its budget of {budget}'
+    if getattr(settings, 'FINANCE_QUERY_BUDGET_STRICT', False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+    return False
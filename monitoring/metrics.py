@@ -0,0 +1,22 @@
+from prometheus_client import Counter, Histogram
+
+LABELS = ('view',)
+
+REQUEST_TIME = Histogram(
+    'finance_request_duration_seconds', 'Time spent serving a request.',
+    ('view', 'method', 'status')
+)
+SQL_QUERIES = Histogram(
+    'finance_request_sql_queries', 'SQL queries run by a request.',
+    LABELS, buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, float('inf'))
+)
+SQL_TIME = Histogram('finance_request_sql_seconds', 'Time spent in SQL queries by a request.', LABELS)
+TEMPLATE_TIME = Histogram('finance_request_template_seconds', 'Time spent rendering templates by a request.', LABELS)
+BUDGET_EXCEEDED = Counter('finance_query_budget_exceeded', 'Requests that ran more queries than their view allows.', LABELS)
+
+
+def observe(view_name, method, status, stats):
+    REQUEST_TIME.labels(view_name, method, status).observe(stats.total_time)
+    SQL_QUERIES.labels(view_name).observe(stats.queries)
+    SQL_TIME.labels(view_name).observe(stats.sql_time)
+    TEMPLATE_TIME.labels(view_name).observe(stats.template_time)
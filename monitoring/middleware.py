@@ -0,0 +1,76 @@
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+
+from . import metrics
+from .instrumentation import RequestStats, check_query_budget, current_stats, get_query_budget
+
+
+class InstrumentationMiddleware:
+    """
+    Record the SQL query count, SQL time, template render time and total
+    time of every request, labelled by the resolved view name, and enforce
+    the view's query budget. Install it first so the session and user
+    lookups are counted too.
+    
+    Queries run while a streaming response is consumed, or by worker threads
+    with their own connections (see dashboard.concurrency), are not counted.
+    """
+    
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.recording() as stats, self.wrap_connections(stats):
+            response = self.get_response(request)
+        return self.observe(request, response, stats)
+    
+    async def __acall__(self, request):
+        with self.recording() as stats:
+            # Connections belong to threads: wrap those of the thread that
+            # runs the request's sync views and ORM calls
+            wrappers = await sync_to_async(self.wrap_connections)(stats)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(wrappers.close)()
+        return self.observe(request, response, stats)
+    
+    @staticmethod
+    def wrap_connections(stats):
+        """Count the queries of this thread's connections until the returned stack is closed."""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(stats.record_query))
+        return stack
+    
+    @contextmanager
+    def recording(self):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            current_stats.reset(token)
+        stats.total_time = time.perf_counter() - started
+    
+    def observe(self, request, response, stats):
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '<unresolved>'
+        metrics.observe(view_name, request.method, response.status_code, stats)
+        if not check_query_budget(view_name, getattr(request, 'query_budget', None), stats):
+            metrics.BUDGET_EXCEEDED.labels(view_name).inc()
+        return response
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
@@ -0,0 +1,33 @@
+import time
+
+from django.template.backends.django import DjangoTemplates
+
+from .instrumentation import current_stats
+
+
+class InstrumentedTemplate:
+    def __init__(self, template):
+        self.template = template
+    
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+    
+    def render(self, context=None, request=None):
+        stats = current_stats.get()
+        if stats is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, adding render times to the current request's stats."""
+    
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+    
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
@@ -0,0 +1,15 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class InstrumentedTestRunner(DiscoverRunner):
+    """The default test runner, with query budget violations raising errors."""
+    
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.strict_budgets = override_settings(FINANCE_QUERY_BUDGET_STRICT=True)
+        self.strict_budgets.enable()
+    
+    def teardown_test_environment(self, **kwargs):
+        self.strict_budgets.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,101 @@
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import include, path, resolve, reverse
+from prometheus_client import REGISTRY
+
+from .middleware import InstrumentationMiddleware
+from .instrumentation import QueryBudgetExceeded, get_query_budget, query_budget
+
+
+@query_budget(2)
+def three_queries(request):
+    for _ in range(3):
+        User.objects.exists()
+    return HttpResponse('ok')
+
+
+urlpatterns = [
+    path('three/', three_queries, name='three_queries'),
+    path('', include('finance_tracker.urls')),
+]
+
+
+def sample(name, view):
+    return REGISTRY.get_sample_value(name, {'view': view}) or 0
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('jill', password='secret')
+        self.client.force_login(self.user)
+    
+    def test_records_queries_and_template_time_per_view(self):
+        before = sample('finance_request_sql_queries_count', 'dashboard')
+        queries = sample('finance_request_sql_queries_sum', 'dashboard')
+        templates = sample('finance_request_template_seconds_sum', 'dashboard')
+        
+        self.client.get(reverse('dashboard'))
+        
+        self.assertEqual(sample('finance_request_sql_queries_count', 'dashboard'), before + 1)
+        self.assertGreater(sample('finance_request_sql_queries_sum', 'dashboard'), queries)
+        self.assertGreater(sample('finance_request_template_seconds_sum', 'dashboard'), templates)
+    
+    @override_settings(ROOT_URLCONF='monitoring.tests')
+    def test_budget_raises_in_tests(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('three_queries'))
+    
+    @override_settings(ROOT_URLCONF='monitoring.tests', FINANCE_QUERY_BUDGET_STRICT=False)
+    def test_budget_is_logged_in_production(self):
+        before = sample('finance_query_budget_exceeded_total', 'three_queries')
+        with self.assertLogs('monitoring.instrumentation', 'WARNING') as logs:
+            response = self.client.get(reverse('three_queries'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('over its budget of 2', logs.output[0])
+        self.assertEqual(sample('finance_query_budget_exceeded_total', 'three_queries'), before + 1)
+    
+    def test_budgets_reach_decorated_and_class_based_views(self):
+        self.assertEqual(get_query_budget(resolve(reverse('dashboard')).func), 10)
+        self.assertEqual(get_query_budget(resolve(reverse('api:transaction-list')).func), 6)
+    
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('dashboard'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'finance_request_sql_queries_count{view="dashboard"}', response.content)
+        
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.1.2.3').status_code, 404)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.1.2.3').status_code, 200)
+    
+    @override_settings(FINANCE_METRICS_ALLOWED_IPS=[], FINANCE_METRICS_TOKEN='s3cret')
+    def test_metrics_bearer_token(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        self.assertEqual(self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer wrong'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer s3cret'}).status_code, 200)
+    
+    async def test_async_requests_are_recorded(self):
+        await self.async_client.aforce_login(self.user)
+        before = sample('finance_request_sql_queries_count', 'dashboard_async')
+        queries = sample('finance_request_sql_queries_sum', 'dashboard_async')
+        
+        response = await self.async_client.get(reverse('dashboard_async'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sample('finance_request_sql_queries_count', 'dashboard_async'), before + 1)
+        self.assertGreater(sample('finance_request_sql_queries_sum', 'dashboard_async'), queries)
+    
+    def test_middleware_follows_the_handler(self):
+        async def handler(request):
+            return HttpResponse()
+        
+        self.assertTrue(iscoroutinefunction(InstrumentationMiddleware(handler)))
+        self.assertFalse(iscoroutinefunction(InstrumentationMiddleware(lambda request: HttpResponse())))
@@ -0,0 +1,38 @@
+import os
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+
+
+def _registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # Several worker processes: merge the files they write
+        from prometheus_client import multiprocess
+        
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def _authorized(request):
+    if request.user.is_staff:
+        return True
+    token = getattr(settings, 'FINANCE_METRICS_TOKEN', '')
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    # Behind a proxy on the same host every request comes from localhost, so
+    # production allows no addresses by default
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'FINANCE_METRICS_ALLOWED_IPS', ())
+
+
+def metrics(request):
+    """
+    Prometheus metrics, for staff users, scrapers sending FINANCE_METRICS_TOKEN
+    as a bearer token and the addresses in FINANCE_METRICS_ALLOWED_IPS.
+    """
+    if not _authorized(request):
+        raise Http404
+    return HttpResponse(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
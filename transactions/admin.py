@@ -1,21 +1,97 @@
-from django.contrib import admin
-from .models import IncomeSource, ExpenseCategory, Transaction
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.template.response import TemplateResponse
+from .changelist import AutocompleteFilter, EstimatedCountPaginator, LargeTableAdmin
+from .models import IncomeSource, ExpenseCategory, Receipt, RecurringRule, Transaction
 
 @admin.register(IncomeSource)
-class IncomeSourceAdmin(admin.ModelAdmin):
+class IncomeSourceAdmin(LargeTableAdmin):
     list_display = ('name', 'user', 'description')
+    list_select_related = ('user',)
     search_fields = ('name', 'user__username')
-    list_filter = ('user',)
+    list_filter = (('user', AutocompleteFilter),)
 
 @admin.register(ExpenseCategory)
-class ExpenseCategoryAdmin(admin.ModelAdmin):
+class ExpenseCategoryAdmin(LargeTableAdmin):
     list_display = ('name', 'user', 'monthly_budget')
+    list_select_related = ('user',)
     search_fields = ('name', 'user__username')
-    list_filter = ('user',)
+    list_filter = (('user', AutocompleteFilter),)
+
+class TransactionActionForm(ActionForm):
+    # The target of the recategorize action
+    category = forms.ModelChoiceField(
+        ExpenseCategory.objects.all(),
+        required=False,
+        widget=AutocompleteSelect(Transaction._meta.get_field('expense_category'), admin.site),
+    )
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(LargeTableAdmin):
     list_display = ('description', 'amount', 'transaction_type', 'date', 'user')
-    list_filter = ('transaction_type', 'date', 'user')
-    search_fields = ('description', 'user__username')
+    list_select_related = ('user',)
+    list_filter = ('transaction_type', 'date', ('user', AutocompleteFilter))
+    search_fields = ('description',)
+    search_help_text = 'Words of the description, category or source'
     date_hierarchy = 'date'
+    action_form = TransactionActionForm
+    actions = ('recategorize', 'delete_selected')
+    
+    def get_search_results(self, request, queryset, search_term):
+        # The full-text index instead of a LIKE scan per search field
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
+    
+    @admin.action(description='Move selected expenses to the chosen category', permissions=['change'])
+    def recategorize(self, request, queryset):
+        try:
+            category = self.action_form.base_fields['category'].clean(request.POST.get('category'))
+        except ValidationError:
+            category = None
+        if category is None:
+            self.message_user(request, 'Choose the category to move the selected expenses to.', messages.WARNING)
+            return None
+        moved = queryset.recategorize(category)
+        self.message_user(request, f'Moved {moved} expense(s) of {category.user} to {category}.', messages.SUCCESS)
+        return None
+    
+    @admin.action(description='Delete selected transactions', permissions=['delete'])
+    def delete_selected(self, request, queryset):
+        """
+        Django's delete_selected loads and lists every selected object before
+        deleting them one by one; this confirms with the count only and
+        deletes with one statement (see TransactionQuerySet.bulk_delete).
+        """
+        if request.POST.get('post'):
+            deleted = queryset.bulk_delete()
+            self.message_user(request, f'Deleted {deleted} transaction(s).', messages.SUCCESS)
+            return None
+        
+        return TemplateResponse(request, 'admin/bulk_delete_confirmation.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Are you sure?',
+            'opts': self.model._meta,
+            'media': self.media,
+            'count': EstimatedCountPaginator(queryset, 1).count,
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across') == '1',
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
+
+@admin.register(Receipt)
+class ReceiptAdmin(admin.ModelAdmin):
+    list_display = ('file', 'content_type', 'size', 'created_at', 'processed_at', 'attempts')
+    list_filter = ('processed_at',)
+    readonly_fields = ('file', 'thumbnail', 'preview', 'size', 'content_type', 'created_at')
+
+@admin.register(RecurringRule)
+class RecurringRuleAdmin(admin.ModelAdmin):
+    list_display = ('description', 'amount', 'transaction_type', 'frequency', 'interval', 'next_date', 'active', 'user')
+    list_select_related = ('user',)
+    list_filter = ('transaction_type', 'frequency', 'active')
+    search_fields = ('description', 'user__username')
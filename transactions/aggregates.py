@@ -0,0 +1,291 @@
+import datetime
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Optional
+
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncQuarter, TruncWeek
+
+from .models import Transaction
+
+
+def week_start(day):
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    if day.month == 12:
+        return day.replace(year=day.year + 1, month=1, day=1)
+    return day.replace(month=day.month + 1, day=1)
+
+
+def quarter_start(day):
+    return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+
+
+def shift_years(day, years):
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:
+        # 29 February
+        return day.replace(year=day.year + years, day=28)
+
+
+class PeriodTotals:
+    """
+    Income and expense totals for a date range, bucketed by day, week and month.
+    
+    Every series is built from the same grouped (date, type) query; days, weeks
+    and months without transactions are zero-filled in Python.
+    """
+    
+    def __init__(self, rows, start_date=None, end_date=None):
+        self.by_day = {}
+        for row in rows:
+            bucket = self.by_day.setdefault(row['date'], {Transaction.INCOME: Decimal('0'), Transaction.EXPENSE: Decimal('0')})
+            bucket[row['transaction_type']] = row['total'] or Decimal('0')
+        
+        if self.by_day:
+            start_date = start_date or min(self.by_day)
+            end_date = end_date or max(self.by_day)
+        self.start_date = start_date
+        self.end_date = end_date
+    
+    @property
+    def income(self):
+        return sum((bucket[Transaction.INCOME] for bucket in self.by_day.values()), Decimal('0'))
+    
+    @property
+    def expense(self):
+        return sum((bucket[Transaction.EXPENSE] for bucket in self.by_day.values()), Decimal('0'))
+    
+    @property
+    def balance(self):
+        return self.income - self.expense
+    
+    def _series(self, bucket_start, step):
+        if self.start_date is None:
+            return []
+        
+        buckets = {}
+        current = bucket_start(self.start_date)
+        while current <= self.end_date:
+            buckets[current] = {'date': current, 'income': Decimal('0'), 'expense': Decimal('0')}
+            current = step(current)
+        
+        for day, totals in self.by_day.items():
+            bucket = buckets.get(bucket_start(day))
+            if bucket is not None:
+                bucket['income'] += totals[Transaction.INCOME]
+                bucket['expense'] += totals[Transaction.EXPENSE]
+        
+        return list(buckets.values())
+    
+    @property
+    def daily(self):
+        return self._series(lambda day: day, lambda day: day + datetime.timedelta(days=1))
+    
+    @property
+    def weekly(self):
+        return self._series(week_start, lambda day: day + datetime.timedelta(days=7))
+    
+    @property
+    def monthly(self):
+        return self._series(month_start, next_month)
+
+
+def period_totals(queryset, start_date=None, end_date=None):
+    """
+    Aggregate ``queryset`` into a PeriodTotals with a single grouped query.
+    
+    When no bounds are given the range is taken from the data itself.
+    """
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+    
+    rows = queryset.order_by().values('date', 'transaction_type').annotate(total=Sum('amount'))
+    return PeriodTotals(rows, start_date, end_date)
+
+
+@dataclass
+class TransactionSummary:
+    """
+    Totals of a set of transactions, optionally with per-source and
+    per-category breakdowns shaped like ``{'name': ..., 'total': ...}``
+    and sorted by descending total.
+    """
+    income_total: Decimal = Decimal('0')
+    expense_total: Decimal = Decimal('0')
+    count: int = 0
+    first_date: Optional[datetime.date] = None
+    last_date: Optional[datetime.date] = None
+    income_by_source: list = field(default_factory=list)
+    expense_by_category: list = field(default_factory=list)
+    
+    @property
+    def balance(self):
+        return self.income_total - self.expense_total
+
+
+INCOME_FILTER = Q(transaction_type=Transaction.INCOME)
+EXPENSE_FILTER = Q(transaction_type=Transaction.EXPENSE)
+
+
+def _breakdown(totals):
+    return sorted(
+        ({'name': name, 'total': total} for name, total in totals.items() if total is not None),
+        key=lambda item: item['total'],
+        reverse=True
+    )
+
+
+def summary_from_groups(rows):
+    """
+    Fold rows grouped by (income_source__name, expense_category__name) with
+    ``income``, ``expense``, ``count``, ``first_date`` and ``last_date``
+    into a TransactionSummary.
+    """
+    summary = TransactionSummary()
+    by_source = {}
+    by_category = {}
+    
+    for row in rows:
+        summary.count += row['count'] or 0
+        if row['income'] is not None:
+            summary.income_total += row['income']
+            name = row['income_source__name']
+            by_source[name] = by_source.get(name, Decimal('0')) + row['income']
+        if row['expense'] is not None:
+            summary.expense_total += row['expense']
+            name = row['expense_category__name']
+            by_category[name] = by_category.get(name, Decimal('0')) + row['expense']
+        if row.get('first_date') and (summary.first_date is None or row['first_date'] < summary.first_date):
+            summary.first_date = row['first_date']
+        if row.get('last_date') and (summary.last_date is None or row['last_date'] > summary.last_date):
+            summary.last_date = row['last_date']
+    
+    summary.income_by_source = _breakdown(by_source)
+    summary.expense_by_category = _breakdown(by_category)
+    return summary
+
+
+def _summary_aggregates():
+    return {
+        'income': Sum('amount', filter=INCOME_FILTER),
+        'expense': Sum('amount', filter=EXPENSE_FILTER),
+        'count': Count('id'),
+        'first_date': Min('date'),
+        'last_date': Max('date'),
+    }
+
+
+def breakdown_rows(queryset):
+    """Group ``queryset`` by source and category name with conditional sums."""
+    return queryset.order_by().values('income_source__name', 'expense_category__name').annotate(**_summary_aggregates())
+
+
+def summarize(queryset, breakdown=False):
+    """
+    Summarize ``queryset`` in one query using conditional aggregation.
+    
+    Without ``breakdown`` this is a single aggregate; with it the query is
+    grouped by source and category name and the totals are folded in Python.
+    """
+    if breakdown:
+        return summary_from_groups(breakdown_rows(queryset))
+    
+    totals = queryset.aggregate(**_summary_aggregates())
+    return TransactionSummary(
+        income_total=totals['income'] or Decimal('0'),
+        expense_total=totals['expense'] or Decimal('0'),
+        count=totals['count'],
+        first_date=totals['first_date'],
+        last_date=totals['last_date'],
+    )
+
+
+DAY, WEEK, MONTH, QUARTER = 'day', 'week', 'month', 'quarter'
+
+GRANULARITIES = {
+    # granularity: (truncation, bucket start, next bucket, a year earlier, label format)
+    DAY: (TruncDay, lambda day: day, lambda day: day + datetime.timedelta(days=1),
+          lambda day: shift_years(day, -1), '%d %b'),
+    WEEK: (TruncWeek, week_start, lambda day: day + datetime.timedelta(days=7),
+           lambda day: day - datetime.timedelta(weeks=52), '%d %b %Y'),
+    MONTH: (TruncMonth, month_start, next_month,
+            lambda day: shift_years(day, -1), '%b %Y'),
+    QUARTER: (TruncQuarter, quarter_start, lambda day: next_month(next_month(next_month(day))),
+              lambda day: shift_years(day, -1), None),
+}
+
+
+def choose_granularity(start_date, end_date):
+    """Pick a bucket size that keeps a chart of the range readable."""
+    days = (end_date - start_date).days + 1
+    if days <= 31:
+        return DAY
+    if days <= 183:
+        return WEEK
+    if days <= 3 * 366:
+        return MONTH
+    return QUARTER
+
+
+def bucket_label(day, granularity):
+    if granularity == QUARTER:
+        return f'Q{(day.month - 1) // 3 + 1} {day.year}'
+    return day.strftime(GRANULARITIES[granularity][4])
+
+
+def comparison_series(queryset, start_date, end_date, granularity=None):
+    """
+    Income and expense per bucket between ``start_date`` and ``end_date``
+    with the totals of the same bucket a year earlier, from one grouped query.
+    
+    Returns ``(granularity, buckets)``; each bucket is a dict with ``date``,
+    ``label``, ``income``, ``expense``, ``previous_income`` and
+    ``previous_expense``. Buckets at the edges may extend past the range but
+    only count transactions inside it, and the previous totals cover the
+    same range shifted back a year (52 weeks for weekly buckets).
+    """
+    granularity = granularity or choose_granularity(start_date, end_date)
+    trunc, bucket_start, step, year_earlier, _ = GRANULARITIES[granularity]
+    
+    in_range = Q(date__gte=start_date, date__lte=end_date)
+    in_previous_range = Q(date__gte=year_earlier(start_date), date__lte=year_earlier(end_date))
+    # An edge bucket can hold transactions of both ranges (July of a range
+    # starting mid-July is also the last July of the previous range), so each
+    # range is summed on its own; a transaction in both counts in both
+    rows = queryset.filter(in_range | in_previous_range).annotate(period=trunc('date')).order_by().values(
+        'period', 'transaction_type'
+    ).annotate(current=Sum('amount', filter=in_range), previous=Sum('amount', filter=in_previous_range))
+    
+    totals = {}
+    for row in rows:
+        totals[(row['period'], row['transaction_type'])] = row
+    
+    def total(period, transaction_type, window):
+        row = totals.get((period, transaction_type))
+        return (row and row[window]) or Decimal('0')
+    
+    buckets = []
+    current = bucket_start(start_date)
+    while current <= end_date:
+        previous = year_earlier(current)
+        buckets.append({
+            'date': current,
+            'label': bucket_label(current, granularity),
+            'income': total(current, Transaction.INCOME, 'current'),
+            'expense': total(current, Transaction.EXPENSE, 'current'),
+            'previous_income': total(previous, Transaction.INCOME, 'previous'),
+            'previous_expense': total(previous, Transaction.EXPENSE, 'previous'),
+        })
+        current = step(current)
+    
+    return granularity, buckets
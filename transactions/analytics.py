@@ -0,0 +1,225 @@
+import datetime
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count, Sum
+
+from .aggregates import period_totals, summarize
+from .models import Transaction, IncomeSource, ExpenseCategory
+
+CENT = Decimal('0.01')
+ROLLING_WINDOW = 7
+
+
+@dataclass
+class ReportAnalytics:
+    """
+    Series and breakdowns of a set of transactions over a date range.
+    
+    ``daily``, ``weekly`` and ``monthly`` are zero-filled lists of
+    ``{'date', 'income', 'expense'}``; breakdowns are lists of
+    ``{'name', 'total', 'share'}`` with ``share`` in percent;
+    ``running_balance`` and ``rolling_expense`` (a trailing
+    ROLLING_WINDOW-day mean) have one entry per day.
+    """
+    start_date: Optional[datetime.date] = None
+    end_date: Optional[datetime.date] = None
+    income_total: Decimal = Decimal('0')
+    expense_total: Decimal = Decimal('0')
+    count: int = 0
+    daily: list = field(default_factory=list)
+    weekly: list = field(default_factory=list)
+    monthly: list = field(default_factory=list)
+    income_by_source: list = field(default_factory=list)
+    expense_by_category: list = field(default_factory=list)
+    running_balance: list = field(default_factory=list)
+    rolling_expense: list = field(default_factory=list)
+    
+    @property
+    def balance(self):
+        return self.income_total - self.expense_total
+
+
+def _with_shares(totals, grand_total):
+    items = [
+        {
+            'name': name,
+            'total': total,
+            'share': (total * 100 / grand_total).quantize(CENT) if grand_total else Decimal('0'),
+        }
+        for name, total in totals.items()
+    ]
+    return sorted(items, key=lambda item: (-item['total'], item['name'] or ''))
+
+
+def _quantize(amount):
+    # SQLite sums decimals as floating point; amounts are always whole cents
+    return amount.quantize(CENT)
+
+
+def _orm_analytics(queryset, start_date, end_date):
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+    
+    totals = period_totals(queryset, start_date, end_date)
+    summary = summarize(queryset, breakdown=True)
+    daily, weekly, monthly = (
+        [{'date': bucket['date'], 'income': _quantize(bucket['income']), 'expense': _quantize(bucket['expense'])} for bucket in series]
+        for series in (totals.daily, totals.weekly, totals.monthly)
+    )
+    income_total = _quantize(summary.income_total)
+    expense_total = _quantize(summary.expense_total)
+    
+    running_balance = []
+    balance = Decimal('0')
+    for bucket in daily:
+        balance += bucket['income'] - bucket['expense']
+        running_balance.append({'date': bucket['date'], 'balance': balance})
+    
+    rolling_expense = []
+    for i, bucket in enumerate(daily):
+        window = [day['expense'] for day in daily[max(0, i - ROLLING_WINDOW + 1):i + 1]]
+        rolling_expense.append({'date': bucket['date'], 'average': (sum(window) / len(window)).quantize(CENT)})
+    
+    return ReportAnalytics(
+        start_date=totals.start_date,
+        end_date=totals.end_date,
+        income_total=income_total,
+        expense_total=expense_total,
+        count=summary.count,
+        daily=daily,
+        weekly=weekly,
+        monthly=monthly,
+        income_by_source=_with_shares(
+            {item['name']: _quantize(item['total']) for item in summary.income_by_source}, income_total
+        ),
+        expense_by_category=_with_shares(
+            {item['name']: _quantize(item['total']) for item in summary.expense_by_category}, expense_total
+        ),
+        running_balance=running_balance,
+        rolling_expense=rolling_expense,
+    )
+
+
+def _cents_to_decimal(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def _totals_by_name(amounts, ids, model):
+    """
+    Sum ``amounts`` (a Series of cents) per ``ids`` and key the result by
+    object name; id 0 stands for a missing source or category.
+    """
+    grouped = amounts.groupby(ids).sum()
+    names = dict(model.objects.filter(pk__in=[int(pk) for pk in grouped.index if pk]).values_list('pk', 'name'))
+    totals = {}
+    for pk, cents in grouped.items():
+        name = names.get(int(pk))
+        totals[name] = totals.get(name, Decimal('0')) + _cents_to_decimal(cents)
+    return totals
+
+
+def _pandas_analytics(queryset, start_date, end_date):
+    import numpy as np
+    import pandas as pd
+    
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+    
+    # Let the database collapse rows sharing a day, type, category and source;
+    # everything after this is vectorized over the resulting columns
+    columns = ['date', 'transaction_type', 'expense_category_id', 'income_source_id', 'amount', 'rows']
+    frame = pd.DataFrame.from_records(
+        queryset.order_by().values_list(*columns[:4]).annotate(amount=Sum('amount'), rows=Count('id')),
+        columns=columns
+    )
+    
+    if frame.empty and not (start_date and end_date):
+        return ReportAnalytics()
+    
+    # Work in integer cents so every sum is exact
+    cents = (frame['amount'].astype('float64') * 100).round().astype('int64')
+    is_income = (frame['transaction_type'] == Transaction.INCOME).to_numpy()
+    is_expense = (frame['transaction_type'] == Transaction.EXPENSE).to_numpy()
+    dates = pd.to_datetime(frame['date'])
+    source_ids = frame['income_source_id'].fillna(0).astype('int64')
+    category_ids = frame['expense_category_id'].fillna(0).astype('int64')
+    
+    start_date = start_date or dates.min().date()
+    end_date = end_date or dates.max().date()
+    days = pd.date_range(start_date, end_date, freq='D')
+    
+    daily = pd.DataFrame({
+        'income': np.where(is_income, cents, 0),
+        'expense': np.where(is_expense, cents, 0),
+    }, index=dates).groupby(level=0).sum().reindex(days, fill_value=0)
+    
+    weekly = daily.groupby(days - pd.to_timedelta(days.weekday, unit='D')).sum()
+    monthly = daily.groupby(days.to_period('M').to_timestamp()).sum()
+    balance = (daily['income'] - daily['expense']).cumsum()
+    window_sums = daily['expense'].rolling(ROLLING_WINDOW, min_periods=1).sum().round().astype('int64')
+    window_sizes = np.minimum(np.arange(1, len(days) + 1), ROLLING_WINDOW)
+    
+    def series(frame):
+        return [
+            {'date': day.date(), 'income': _cents_to_decimal(income), 'expense': _cents_to_decimal(expense)}
+            for day, income, expense in zip(frame.index, frame['income'], frame['expense'])
+        ]
+    
+    income_total = _cents_to_decimal(daily['income'].sum())
+    expense_total = _cents_to_decimal(daily['expense'].sum())
+    
+    return ReportAnalytics(
+        start_date=start_date,
+        end_date=end_date,
+        income_total=income_total,
+        expense_total=expense_total,
+        count=int(frame['rows'].sum()),
+        daily=series(daily),
+        weekly=series(weekly),
+        monthly=series(monthly),
+        income_by_source=_with_shares(
+            _totals_by_name(cents[is_income], source_ids[is_income], IncomeSource), income_total
+        ),
+        expense_by_category=_with_shares(
+            _totals_by_name(cents[is_expense], category_ids[is_expense], ExpenseCategory), expense_total
+        ),
+        running_balance=[
+            {'date': day.date(), 'balance': _cents_to_decimal(value)} for day, value in zip(days, balance)
+        ],
+        rolling_expense=[
+            {'date': day.date(), 'average': (Decimal(int(total)) / (100 * int(size))).quantize(CENT)}
+            for day, total, size in zip(days, window_sums, window_sizes)
+        ],
+    )
+
+
+BACKENDS = {
+    'orm': _orm_analytics,
+    'pandas': _pandas_analytics,
+}
+
+
+def analyze(queryset, start_date=None, end_date=None, backend=None):
+    """
+    Compute a ReportAnalytics for ``queryset`` between ``start_date`` and
+    ``end_date`` (inclusive; taken from the data when omitted).
+    
+    The ``orm`` backend aggregates in the database; the ``pandas`` backend
+    fetches the rows once as columns and does the rest with vectorized
+    operations, which scales better for long ranges. Both return identical
+    results. The default comes from ``settings.FINANCE_ANALYTICS_BACKEND``.
+    """
+    backend = backend or getattr(settings, 'FINANCE_ANALYTICS_BACKEND', 'orm')
+    try:
+        compute = BACKENDS[backend]
+    except KeyError:
+        raise ImproperlyConfigured(f"Unknown analytics backend '{backend}'; choose one of {', '.join(BACKENDS)}.")
+    return compute(queryset, start_date, end_date)
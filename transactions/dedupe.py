@@ -0,0 +1,179 @@
+import hashlib
+import re
+from decimal import Decimal
+
+from django.conf import settings
+
+from .models import Transaction
+
+NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_description(description):
+    """Lower-case, strip punctuation and collapse whitespace."""
+    return ' '.join(NON_WORD.sub(' ', (description or '').casefold()).split())
+
+
+def _digest(*parts):
+    return hashlib.blake2b('\x1f'.join(str(part) for part in parts).encode(), digest_size=16).hexdigest()
+
+
+def transaction_keys(user_id, date, amount, transaction_type, description, expense_category_id, income_source_id):
+    """
+    Return the ``(fingerprint, match_key)`` of a transaction's values.
+    
+    The fingerprint covers everything a user would call "the same
+    transaction"; the match key leaves out the description, category and
+    source so that near duplicates share it and only need a fuzzy comparison
+    of their descriptions.
+    """
+    amount = Decimal(str(amount)).quantize(Decimal('0.01'))
+    date = Transaction._meta.get_field('date').to_python(date).isoformat()
+    match_key = _digest(user_id, date, amount, transaction_type)
+    fingerprint = _digest(
+        user_id, date, amount, transaction_type, normalize_description(description),
+        expense_category_id or '', income_source_id or ''
+    )
+    return fingerprint, match_key
+
+
+def keys_for(transaction):
+    return transaction_keys(
+        transaction.user_id, transaction.date, transaction.amount, transaction.transaction_type,
+        transaction.description, transaction.expense_category_id, transaction.income_source_id
+    )
+
+
+def is_similar(description, other):
+    """Whether two descriptions are close enough to be the same transaction."""
+    from rapidfuzz import fuzz
+    
+    threshold = getattr(settings, 'FINANCE_DUPLICATE_SIMILARITY', 85)
+    first, second = normalize_description(description), normalize_description(other)
+    if not first or not second:
+        return first == second
+    return fuzz.token_sort_ratio(first, second) >= threshold
+
+
+def find_duplicates(transaction):
+    """
+    Return ``(exact, near)`` lists of the user's other transactions that
+    duplicate ``transaction``, which need not be saved. Both lookups are a
+    single seek on the (user, fingerprint) and (user, match_key) indexes.
+    """
+    fingerprint, match_key = keys_for(transaction)
+    candidates = Transaction.objects.filter(user_id=transaction.user_id, match_key=match_key)
+    if transaction.pk:
+        candidates = candidates.exclude(pk=transaction.pk)
+    
+    exact, near = [], []
+    for candidate in candidates:
+        if candidate.fingerprint == fingerprint:
+            exact.append(candidate)
+        elif is_similar(transaction.description, candidate.description):
+            near.append(candidate)
+    return exact, near
+
+
+class BatchDuplicateChecker:
+    """
+    Classify batches of new transactions of one user against the rows that
+    existed before the checker was created, with two indexed queries per
+    batch. Rows added through the checker itself never count as duplicates,
+    so repeated rows inside one statement are kept.
+    """
+    
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.added = set()
+    
+    def check(self, transactions):
+        """
+        Set the keys of ``transactions`` and return a list with, for each,
+        ``'exact'``, the id of a near duplicate, or None.
+        """
+        keys = [keys_for(transaction) for transaction in transactions]
+        for transaction, (fingerprint, match_key) in zip(transactions, keys):
+            transaction.fingerprint, transaction.match_key = fingerprint, match_key
+        
+        existing = set(Transaction.objects.filter(
+            user_id=self.user_id, fingerprint__in={fingerprint for fingerprint, _ in keys}
+        ).values_list('fingerprint', flat=True)) - self.added
+        
+        candidates = {}
+        for candidate in Transaction.objects.filter(
+            user_id=self.user_id, match_key__in={match_key for _, match_key in keys}
+        ).values('id', 'match_key', 'fingerprint', 'description'):
+            if candidate['fingerprint'] not in self.added:
+                candidates.setdefault(candidate['match_key'], []).append(candidate)
+        
+        results = []
+        for transaction, (fingerprint, match_key) in zip(transactions, keys):
+            if fingerprint in existing:
+                results.append('exact')
+                continue
+            near = next((
+                candidate['id'] for candidate in candidates.get(match_key, ())
+                if is_similar(transaction.description, candidate['description'])
+            ), None)
+            results.append(near)
+        return results
+    
+    def mark_added(self, transactions):
+        self.added.update(transaction.fingerprint for transaction in transactions)
+
+
+def refresh_keys(queryset, chunk_size=2000):
+    """Recompute stored fingerprints and match keys; returns the number changed."""
+    changed = 0
+    batch = []
+    for transaction in queryset.order_by('pk').only(
+        'user_id', 'date', 'amount', 'transaction_type', 'description',
+        'expense_category_id', 'income_source_id', 'fingerprint', 'match_key'
+    ).iterator(chunk_size=chunk_size):
+        keys = keys_for(transaction)
+        if keys != (transaction.fingerprint, transaction.match_key):
+            transaction.fingerprint, transaction.match_key = keys
+            batch.append(transaction)
+        if len(batch) >= chunk_size:
+            Transaction.objects.bulk_update(batch, ['fingerprint', 'match_key'])
+            changed += len(batch)
+            batch = []
+    if batch:
+        Transaction.objects.bulk_update(batch, ['fingerprint', 'match_key'])
+        changed += len(batch)
+    return changed
+
+
+def scan_duplicates(user_id, chunk_size=2000):
+    """
+    Walk a user's transactions grouped by match key, in index order and
+    ``chunk_size`` rows at a time, and yield ``(kind, original, duplicate)``
+    tuples of transaction ids where ``kind`` is 'exact' or 'near'. The
+    lowest id of each group is treated as the original.
+    """
+    group_key = None
+    group = []
+    rows = Transaction.objects.filter(user_id=user_id).order_by('match_key', 'id').values(
+        'id', 'match_key', 'fingerprint', 'description'
+    ).iterator(chunk_size=chunk_size)
+    
+    for row in rows:
+        if row['match_key'] != group_key:
+            yield from _group_duplicates(group)
+            group_key, group = row['match_key'], []
+        group.append(row)
+    yield from _group_duplicates(group)
+
+
+def _group_duplicates(group):
+    originals = []
+    for row in group:
+        original = next((other for other in originals if other['fingerprint'] == row['fingerprint']), None)
+        if original:
+            yield 'exact', original['id'], row['id']
+            continue
+        near = next((other for other in originals if is_similar(row['description'], other['description'])), None)
+        if near:
+            yield 'near', near['id'], row['id']
+        originals.append(row)
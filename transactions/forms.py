@@ -1,5 +1,7 @@
 from django import forms
-from .models import IncomeSource, ExpenseCategory, Transaction
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
+from .models import IncomeSource, ExpenseCategory, RecurringRule, Transaction
 
 class IncomeSourceForm(forms.ModelForm):
     class Meta:
@@ -21,6 +23,12 @@ class ExpenseCategoryForm(forms.ModelForm):
         }
 
 class TransactionForm(forms.ModelForm):
+    allow_duplicate = forms.BooleanField(
+        required=False,
+        label='Save anyway',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+    
     class Meta:
         model = Transaction
         fields = ['amount', 'date', 'description', 'transaction_type', 'income_source', 'expense_category', 'receipt']
@@ -37,6 +45,9 @@ class TransactionForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
+        self.user = user
+        self.near_duplicates = []
+        self.show_allow_duplicate = False
         
         if user:
             self.fields['income_source'].queryset = IncomeSource.objects.filter(user=user)
@@ -60,4 +71,116 @@ class TransactionForm(forms.ModelForm):
             if not expense_category:
                 self.add_error('expense_category', 'Expense transactions must have an expense category.')
         
-        return cleaned_data 
\ No newline at end of file
+        if self.user and not self.errors:
+            self.check_duplicates(cleaned_data)
+        
+        return cleaned_data
+    
+    def check_duplicates(self, cleaned_data):
+        from .dedupe import find_duplicates
+        
+        transaction = Transaction(
+            pk=self.instance.pk,
+            user=self.user,
+            amount=cleaned_data.get('amount'),
+            date=cleaned_data.get('date'),
+            description=cleaned_data.get('description'),
+            transaction_type=cleaned_data.get('transaction_type'),
+            income_source=cleaned_data.get('income_source'),
+            expense_category=cleaned_data.get('expense_category'),
+        )
+        exact, self.near_duplicates = find_duplicates(transaction)
+        if exact and not cleaned_data.get('allow_duplicate'):
+            self.show_allow_duplicate = True
+            self.add_error(None, f'An identical transaction already exists ({exact[0]}). Tick "Save anyway" to record it again.') 
+
+class RecurringRuleForm(forms.ModelForm):
+    class Meta:
+        model = RecurringRule
+        fields = [
+            'transaction_type', 'amount', 'description', 'income_source', 'expense_category',
+            'frequency', 'interval', 'day_of_month', 'start_date', 'end_date', 'active',
+        ]
+        widgets = {
+            'transaction_type': forms.Select(attrs={'class': 'form-control', 'id': 'transaction_type'}),
+            'amount': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
+            'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
+            'income_source': forms.Select(attrs={'class': 'form-control', 'id': 'income_source_field'}),
+            'expense_category': forms.Select(attrs={'class': 'form-control', 'id': 'expense_category_field'}),
+            'frequency': forms.Select(attrs={'class': 'form-control'}),
+            'interval': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+            'day_of_month': forms.NumberInput(attrs={'class': 'form-control', 'min': 1, 'max': 31}),
+            'start_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+            'end_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+            'active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        }
+        help_texts = {
+            'interval': 'Repeat every this many weeks, months or years.',
+            'day_of_month': 'Monthly and yearly rules only; defaults to the start date\'s day.',
+        }
+    
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+        if user:
+            self.fields['income_source'].queryset = IncomeSource.objects.filter(user=user)
+            self.fields['expense_category'].queryset = ExpenseCategory.objects.filter(user=user)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        transaction_type = cleaned_data.get('transaction_type')
+        
+        if transaction_type == Transaction.INCOME:
+            if cleaned_data.get('expense_category'):
+                self.add_error('expense_category', 'Income transactions cannot have an expense category.')
+            if not cleaned_data.get('income_source'):
+                self.add_error('income_source', 'Income transactions must have an income source.')
+        
+        if transaction_type == Transaction.EXPENSE:
+            if cleaned_data.get('income_source'):
+                self.add_error('income_source', 'Expense transactions cannot have an income source.')
+            if not cleaned_data.get('expense_category'):
+                self.add_error('expense_category', 'Expense transactions must have an expense category.')
+        
+        return cleaned_data
+
+class TransactionImportForm(forms.Form):
+    file = forms.FileField(
+        help_text='CSV, OFX/QFX or XLSX. CSV and XLSX files need a header row with at least Date and Amount columns.',
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv,.ofx,.qfx,.xlsx'})
+    )
+    date_format = forms.CharField(
+        initial='%Y-%m-%d',
+        help_text='strftime format of the date column, e.g. %d/%m/%Y.',
+        widget=forms.TextInput(attrs={'class': 'form-control'})
+    )
+    default_category = forms.CharField(
+        required=False,
+        initial='Uncategorized',
+        help_text='Expense category for rows without one.',
+        widget=forms.TextInput(attrs={'class': 'form-control'})
+    )
+    default_source = forms.CharField(
+        required=False,
+        initial='Other',
+        help_text='Income source for rows without one.',
+        widget=forms.TextInput(attrs={'class': 'form-control'})
+    )
+    
+    def clean_file(self):
+        from .importers import detect_format, ImportFormatError
+        
+        file = self.cleaned_data['file']
+        try:
+            self.cleaned_data['format'] = detect_format(file.name)
+        except ImportFormatError as error:
+            raise forms.ValidationError(str(error))
+        # Imports run within the request, so large statements go through the
+        # import_transactions management command instead
+        limit = settings.TRANSACTIONS_IMPORT_MAX_UPLOAD_SIZE
+        if limit and file.size > limit:
+            raise forms.ValidationError(
+                f'Files over {filesizeformat(limit)} are too large to import here; '
+                'ask an administrator to run the import_transactions command.'
+            )
+        return file
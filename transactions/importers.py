@@ -0,0 +1,409 @@
+import codecs
+import csv
+import datetime
+import io
+import os
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction as db_transaction
+
+from .dedupe import BatchDuplicateChecker
+from .models import Transaction, IncomeSource, ExpenseCategory
+from .signals import transactions_bulk_changed
+
+FORMATS = ('csv', 'ofx', 'xlsx')
+
+# Accepted header names for each field, compared case-insensitively
+COLUMN_ALIASES = {
+    'date': ('date', 'posted', 'transaction date', 'booking date'),
+    'amount': ('amount', 'value', 'sum'),
+    'transaction_type': ('type', 'transaction type', 'transaction_type'),
+    'category': ('category', 'expense category', 'expense_category'),
+    'source': ('source', 'income source', 'income_source'),
+    'description': ('description', 'memo', 'details', 'payee', 'name'),
+}
+
+TYPE_ALIASES = {
+    'income': Transaction.INCOME,
+    'credit': Transaction.INCOME,
+    'expense': Transaction.EXPENSE,
+    'debit': Transaction.EXPENSE,
+}
+
+# Errors kept in the result; further errors are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFormatError(Exception):
+    pass
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)
+    categories_created: list = field(default_factory=list)
+    sources_created: list = field(default_factory=list)
+    duplicates_skipped: int = 0
+    near_duplicate_count: int = 0
+    near_duplicates: list = field(default_factory=list)
+    
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+    
+    def add_near_duplicate(self, row_number, existing_id):
+        self.near_duplicate_count += 1
+        if len(self.near_duplicates) < MAX_REPORTED_ERRORS:
+            self.near_duplicates.append((row_number, existing_id))
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if extension == 'qfx':
+        return 'ofx'
+    if extension not in FORMATS:
+        raise ImportFormatError(f"Unsupported file type '{extension}'; use one of {', '.join(FORMATS)}.")
+    return extension
+
+
+# Encodings tried in turn for CSV files; bank exports that are not UTF-8 are
+# usually Windows-1252, which covers Latin-1 text as well
+CSV_ENCODINGS = ('utf-8-sig', 'cp1252')
+
+
+def csv_encoding(file, chunk_size=64 * 1024):
+    """
+    The first of CSV_ENCODINGS that decodes the whole of ``file``, which is
+    rewound after each attempt. Files that cannot be rewound are assumed to
+    be UTF-8.
+    """
+    if not file.seekable():
+        return CSV_ENCODINGS[0]
+    start = file.tell()
+    for encoding in CSV_ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            while chunk := file.read(chunk_size):
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            continue
+        finally:
+            file.seek(start)
+        return encoding
+    raise ImportFormatError('The file is not UTF-8 or Windows-1252 text.')
+
+
+def read_csv(file):
+    """Yield one dict per CSV record, keyed by the header row."""
+    text = io.TextIOWrapper(file, encoding=csv_encoding(file), newline='')
+    try:
+        yield from csv.DictReader(text)
+    except UnicodeDecodeError:
+        raise ImportFormatError('The file is not UTF-8 text.')
+    finally:
+        text.detach()
+
+
+def read_xlsx(file):
+    """Yield one dict per row of the first sheet, keyed by the header row."""
+    from openpyxl import load_workbook
+    
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+        for row in rows:
+            if any(cell is not None and cell != '' for cell in row):
+                yield dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+OFX_TAG = re.compile(r'<(\w+)>([^<\r\n]*)')
+OFX_START = re.compile(r'<STMTTRN>', re.IGNORECASE)
+OFX_END = re.compile(r'</STMTTRN>', re.IGNORECASE)
+OFX_XML_ENCODING = re.compile(r'<\?xml[^>]*encoding=["\']([\w.-]+)', re.IGNORECASE)
+OFX_SGML_HEADER = re.compile(r'^(ENCODING|CHARSET):\s*(\S+)', re.IGNORECASE | re.MULTILINE)
+# CHARSET values of OFX 1.x headers; USASCII files with other (or no)
+# charsets are read as Windows-1252, which bank exports use in practice
+OFX_CHARSETS = {'ISO-8859-1': 'latin-1', '8859-1': 'latin-1', '1252': 'cp1252', 'UTF-8': 'utf-8'}
+
+
+def ofx_encoding(head):
+    """
+    The encoding declared by the start ``head`` (bytes) of an OFX file: the
+    XML declaration of OFX 2, or the ENCODING and CHARSET header lines of
+    OFX 1. Files without either are taken to be UTF-8.
+    """
+    text = head.decode('ascii', errors='replace')
+    declared = OFX_XML_ENCODING.search(text)
+    if declared:
+        encoding = declared.group(1)
+    else:
+        header = {name.upper(): value.upper() for name, value in OFX_SGML_HEADER.findall(text)}
+        if not header:
+            encoding = 'utf-8'
+        elif header.get('ENCODING') == 'UTF-8':
+            encoding = 'utf-8'
+        else:
+            encoding = OFX_CHARSETS.get(header.get('CHARSET'), 'cp1252')
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return 'utf-8'
+
+
+def read_ofx(file, chunk_size=64 * 1024):
+    """
+    Yield one dict per <STMTTRN> of an OFX/QFX statement (SGML or XML).
+    
+    The file is scanned in chunks, so only the current transaction block is
+    held in memory; binary files are decoded as their header declares. The
+    sign of TRNAMT decides between income and expense.
+    """
+    decoder = None
+    buffer = ''
+    while True:
+        chunk = file.read(chunk_size)
+        done = not chunk
+        if isinstance(chunk, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(ofx_encoding(chunk))(errors='replace')
+            # Characters split between chunks are held back by the decoder
+            chunk = decoder.decode(chunk, final=done)
+        buffer += chunk
+        
+        position = 0
+        while True:
+            start = OFX_START.search(buffer, position)
+            end = start and OFX_END.search(buffer, start.end())
+            if not end:
+                break
+            tags = {name.upper(): value.strip() for name, value in OFX_TAG.findall(buffer, start.end(), end.start())}
+            position = end.end()
+            
+            description = ' - '.join(value for value in (tags.get('NAME'), tags.get('MEMO')) if value)
+            yield {
+                'date': tags.get('DTPOSTED', '')[:8],
+                'amount': tags.get('TRNAMT', ''),
+                'description': description,
+            }
+        
+        if done:
+            break
+        # Keep only what can still be the start of a transaction block
+        buffer = buffer[start.start():] if start else buffer[max(position, len(buffer) - len('<STMTTRN>')):]
+
+
+READERS = {
+    'csv': read_csv,
+    'ofx': read_ofx,
+    'xlsx': read_xlsx,
+}
+
+
+def map_columns(headers, columns=None):
+    """
+    Return ``{field: header}`` for the given file headers, using
+    COLUMN_ALIASES unless ``columns`` maps a field explicitly.
+    """
+    by_name = {str(header).strip().lower(): header for header in headers}
+    mapping = {}
+    for field_name, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in by_name:
+                mapping[field_name] = by_name[alias]
+                break
+    mapping.update(columns or {})
+    
+    missing = {'date', 'amount'} - set(mapping)
+    if missing:
+        raise ImportFormatError(f"Missing required column(s): {', '.join(sorted(missing))}.")
+    return mapping
+
+
+class NameMap:
+    """
+    Resolve category or source names to objects of one user, creating the
+    missing ones. Every existing name is loaded once up front.
+    """
+    
+    def __init__(self, model, user):
+        self.model = model
+        self.user = user
+        self.objects = {obj.name.strip().casefold(): obj for obj in model.objects.filter(user=user)}
+        self.created = []
+    
+    def resolve(self, name):
+        name = (name or '').strip()
+        if not name:
+            return None
+        key = name.casefold()
+        if key not in self.objects:
+            self.objects[key] = self.model.objects.create(user=self.user, name=name[:100])
+            self.created.append(name)
+        return self.objects[key]
+
+
+def _text(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def parse_date(value, date_format):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    value = _text(value)
+    if date_format == '%Y-%m-%d':
+        # Much faster than strptime for the default format
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            pass
+    for candidate in (date_format, '%Y%m%d'):
+        try:
+            return datetime.datetime.strptime(value, candidate).date()
+        except ValueError:
+            continue
+    raise ValidationError(f"Invalid date '{value}'.")
+
+
+def parse_amount(value):
+    if isinstance(value, (int, float, Decimal)):
+        value = str(value)
+    text = _text(value).replace(',', '').replace(' ', '')
+    if text.startswith('(') and text.endswith(')'):
+        text = '-' + text[1:-1]
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        amount = None
+    if amount is None or not amount.is_finite():
+        raise ValidationError(f"Invalid amount '{value}'.")
+    return amount
+
+
+def build_transaction(row, mapping, user, categories, sources, date_format='%Y-%m-%d',
+                      default_category=None, default_source=None):
+    """
+    Turn one mapped file row into an unsaved Transaction, validated with the
+    model's field validators and Transaction.clean(). Raises ValidationError.
+    """
+    amount = parse_amount(row.get(mapping['amount']))
+    date = parse_date(row.get(mapping['date']), date_format)
+    
+    type_value = _text(row.get(mapping['transaction_type'])).lower() if 'transaction_type' in mapping else ''
+    if type_value:
+        if type_value not in TYPE_ALIASES:
+            raise ValidationError(f"Unknown transaction type '{type_value}'.")
+        transaction_type = TYPE_ALIASES[type_value]
+    else:
+        transaction_type = Transaction.EXPENSE if amount < 0 else Transaction.INCOME
+    
+    transaction = Transaction(
+        user=user,
+        amount=abs(amount),
+        date=date,
+        description=_text(row.get(mapping['description'])) if 'description' in mapping else '',
+        transaction_type=transaction_type,
+    )
+    if transaction_type == Transaction.EXPENSE:
+        name = _text(row.get(mapping['category'])) if 'category' in mapping else ''
+        transaction.expense_category = categories.resolve(name or default_category)
+    else:
+        name = _text(row.get(mapping['source'])) if 'source' in mapping else ''
+        transaction.income_source = sources.resolve(name or default_source)
+    
+    transaction.clean_fields(exclude=['user', 'income_source', 'expense_category', 'receipt'])
+    transaction.clean()
+    return transaction
+
+
+def import_transactions(user, file, file_format, columns=None, date_format='%Y-%m-%d',
+                        default_category=None, default_source=None, batch_size=None,
+                        skip_duplicates=True):
+    """
+    Import every row of ``file`` as a transaction of ``user``.
+    
+    Rows are parsed as they are read and written with bulk_create in batches
+    of ``batch_size`` (TRANSACTIONS_IMPORT_BATCH_SIZE by default), all in one
+    database transaction. Invalid rows are reported in the result and skipped
+    without aborting the import. Rows that exactly duplicate a transaction
+    stored before the import are skipped unless ``skip_duplicates`` is False;
+    near duplicates are imported and reported. Rollups and caches are
+    refreshed once at the end through the transactions_bulk_changed signal.
+    ``file`` is a binary file object.
+    """
+    if file_format not in READERS:
+        raise ImportFormatError(f"Unsupported format '{file_format}'.")
+    batch_size = batch_size or getattr(settings, 'TRANSACTIONS_IMPORT_BATCH_SIZE', 5000)
+    
+    rows = READERS[file_format](file)
+    first = next(rows, None)
+    result = ImportResult()
+    if first is None:
+        return result
+    mapping = map_columns(first.keys(), columns)
+    
+    with db_transaction.atomic():
+        categories = NameMap(ExpenseCategory, user)
+        sources = NameMap(IncomeSource, user)
+        duplicates = BatchDuplicateChecker(user.id)
+        batch = []
+        
+        def write(batch):
+            new = []
+            for (row_number, transaction), duplicate in zip(batch, duplicates.check([item[1] for item in batch])):
+                if duplicate == 'exact' and skip_duplicates:
+                    result.duplicates_skipped += 1
+                    continue
+                if duplicate and duplicate != 'exact':
+                    result.add_near_duplicate(row_number, duplicate)
+                new.append(transaction)
+            
+            Transaction.objects.bulk_create(new, batch_size=batch_size)
+            duplicates.mark_added(new)
+            result.created += len(new)
+        
+        # Number rows like the file does: CSV and XLSX have a header line
+        row_number = 0 if file_format == 'ofx' else 1
+        for row in _prepend(first, rows):
+            row_number += 1
+            try:
+                batch.append((row_number, build_transaction(
+                    row, mapping, user, categories, sources, date_format, default_category, default_source
+                )))
+            except ValidationError as error:
+                result.add_error(row_number, ' '.join(error.messages))
+                continue
+            
+            if len(batch) >= batch_size:
+                write(batch)
+                batch = []
+        
+        if batch:
+            write(batch)
+        
+        result.categories_created = categories.created
+        result.sources_created = sources.created
+        
+        if result.created:
+            transactions_bulk_changed.send(sender=Transaction, user_ids=[user.id])
+    
+    return result
+
+
+def _prepend(first, rows):
+    yield first
+    yield from rows
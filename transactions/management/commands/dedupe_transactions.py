@@ -0,0 +1,50 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions import dedupe, rollups
+from transactions.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Find (and optionally delete) duplicate transactions, scanning each user in chunks.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', help='Only process this username (repeatable).')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per query.')
+        parser.add_argument('--refresh', action='store_true', help='Recompute stored fingerprints first.')
+        parser.add_argument('--delete', action='store_true', help='Delete exact duplicates, keeping the oldest row.')
+        parser.add_argument('--verbose-matches', action='store_true', help='Print every match found.')
+    
+    def handle(self, *args, **options):
+        if options['usernames']:
+            user_ids = list(User.objects.filter(username__in=options['usernames']).values_list('id', flat=True))
+            if len(user_ids) != len(set(options['usernames'])):
+                raise CommandError('One or more users do not exist.')
+        else:
+            user_ids = rollups.active_user_ids()
+        
+        chunk_size = options['chunk_size']
+        for user_id in user_ids:
+            if options['refresh']:
+                changed = dedupe.refresh_keys(Transaction.objects.filter(user_id=user_id), chunk_size)
+                self.stdout.write(f'user {user_id}: refreshed {changed} fingerprint(s)')
+            
+            exact, near = [], 0
+            for kind, original, duplicate in dedupe.scan_duplicates(user_id, chunk_size):
+                if kind == 'exact':
+                    exact.append(duplicate)
+                else:
+                    near += 1
+                if options['verbose_matches']:
+                    self.stdout.write(f'user {user_id}: {kind} duplicate {duplicate} of {original}')
+            
+            deleted = 0
+            if options['delete']:
+                for start in range(0, len(exact), chunk_size):
+                    # Per-row delete signals keep rollups and caches in step
+                    deleted += Transaction.objects.filter(pk__in=exact[start:start + chunk_size]).delete()[0]
+            
+            self.stdout.write(
+                f'user {user_id}: {len(exact)} exact duplicate(s){f", {deleted} deleted" if options["delete"] else ""}, '
+                f'{near} near duplicate(s)'
+            )
@@ -0,0 +1,54 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.importers import FORMATS, ImportFormatError, detect_format, import_transactions
+
+
+class Command(BaseCommand):
+    help = 'Import transactions for a user from a CSV, OFX/QFX or XLSX statement.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='File format; detected from the extension by default.')
+        parser.add_argument('--date-format', default='%Y-%m-%d', help='strftime format of the date column.')
+        parser.add_argument('--default-category', help='Expense category for rows without one.')
+        parser.add_argument('--default-source', help='Income source for rows without one.')
+        parser.add_argument('--batch-size', type=int, help='Rows per bulk insert.')
+        parser.add_argument('--keep-duplicates', action='store_true', help='Import rows that exactly match existing transactions.')
+    
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist.")
+        
+        started = time.perf_counter()
+        try:
+            file_format = options['format'] or detect_format(options['path'])
+            with open(options['path'], 'rb') as file:
+                result = import_transactions(
+                    user,
+                    file,
+                    file_format,
+                    date_format=options['date_format'],
+                    default_category=options['default_category'],
+                    default_source=options['default_source'],
+                    batch_size=options['batch_size'],
+                    skip_duplicates=not options['keep_duplicates'],
+                )
+        except (ImportFormatError, OSError) as error:
+            raise CommandError(str(error))
+        
+        for row_number, message in result.errors:
+            self.stderr.write(f'row {row_number}: {message}')
+        for row_number, existing_id in result.near_duplicates:
+            self.stderr.write(f'row {row_number}: looks like existing transaction {existing_id}')
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} transaction(s) in {time.perf_counter() - started:.1f}s; '
+            f'{result.error_count} row(s) skipped, {result.duplicates_skipped} duplicate(s) skipped, '
+            f'{result.near_duplicate_count} possible duplicate(s) imported.'
+        ))
@@ -0,0 +1,29 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.recurring import materialize_due
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the transactions of every recurring rule occurrence up to today (or --date) that has '
+        'not been created yet. Safe to re-run; schedule it daily.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Materialize up to this date (YYYY-MM-DD) instead of today.')
+        parser.add_argument('--chunk-size', type=int, help='Rules per chunk (default: RECURRING_CHUNK_SIZE).')
+    
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be formatted as YYYY-MM-DD.')
+        
+        result = materialize_due(today, options['chunk_size'])
+        self.stdout.write(
+            f'Materialized {result.occurrences} occurrence(s) of {result.rules} rule(s) for {len(result.users)} user(s).'
+        )
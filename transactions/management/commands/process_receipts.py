@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from transactions.receipts import process_pending
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate thumbnails and previews of uploaded receipts. Runs until interrupted; '
+        'start several to process in parallel.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once no receipt is pending instead of waiting for more.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls of an empty queue.')
+        parser.add_argument('--batch', type=int, default=50, help='Receipts processed between progress reports.')
+    
+    def handle(self, *args, **options):
+        try:
+            while True:
+                started = time.monotonic()
+                handled = process_pending(options['batch'])
+                if handled:
+                    self.stdout.write(
+                        f'{timezone.now():%Y-%m-%d %H:%M:%S} processed {handled} receipt(s) '
+                        f'in {time.monotonic() - started:.2f}s'
+                    )
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly transaction rollups from raw transactions and verify them.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', help='Only process this username (repeatable).')
+        parser.add_argument('--verify-only', action='store_true', help='Report mismatches without rebuilding.')
+    
+    def handle(self, *args, **options):
+        if options['usernames']:
+            user_ids = list(User.objects.filter(username__in=options['usernames']).values_list('id', flat=True))
+            if len(user_ids) != len(set(options['usernames'])):
+                raise CommandError('One or more users do not exist.')
+        else:
+            user_ids = rollups.active_user_ids()
+        
+        if not options['verify_only']:
+            rollups.rebuild(user_ids)
+            self.stdout.write(f'Rebuilt rollups for {len(user_ids)} user(s).')
+        
+        mismatches = rollups.verify(user_ids)
+        for user_id, key, expected, stored in mismatches:
+            self.stderr.write(f'user {user_id} {key}: expected {expected}, stored {stored}')
+        
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} rollup row(s) do not match the raw transactions.')
+        self.stdout.write(self.style.SUCCESS('Rollups match raw transactions.'))
@@ -0,0 +1,72 @@
+# Generated by Django 5.1.6 on 2026-10-17 12:12
+
+import hashlib
+import re
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+
+# A copy of transactions.dedupe.transaction_keys as of this migration, so
+# later changes to the keys do not change what it stores
+NON_WORD = re.compile(r'[\W_]+')
+
+
+def _digest(*parts):
+    return hashlib.blake2b('\x1f'.join(str(part) for part in parts).encode(), digest_size=16).hexdigest()
+
+
+def transaction_keys(user_id, date, amount, transaction_type, description, expense_category_id, income_source_id):
+    amount = Decimal(str(amount)).quantize(Decimal('0.01'))
+    date = date.isoformat()
+    description = ' '.join(NON_WORD.sub(' ', (description or '').casefold()).split())
+    match_key = _digest(user_id, date, amount, transaction_type)
+    fingerprint = _digest(
+        user_id, date, amount, transaction_type, description, expense_category_id or '', income_source_id or ''
+    )
+    return fingerprint, match_key
+
+
+def populate_keys(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    batch = []
+    for transaction in Transaction.objects.order_by('pk').iterator(chunk_size=2000):
+        transaction.fingerprint, transaction.match_key = transaction_keys(
+            transaction.user_id, transaction.date, transaction.amount, transaction.transaction_type,
+            transaction.description, transaction.expense_category_id, transaction.income_source_id
+        )
+        batch.append(transaction)
+        if len(batch) == 2000:
+            Transaction.objects.bulk_update(batch, ['fingerprint', 'match_key'])
+            batch = []
+    Transaction.objects.bulk_update(batch, ['fingerprint', 'match_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0003_transaction_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='match_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'fingerprint'], name='txn_user_fingerprint_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'match_key'], name='txn_user_match_key_idx'),
+        ),
+        migrations.RunPython(populate_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.6 on 2026-10-17 12:36
+
+import django.db.models.deletion
+import transactions.receipts
+import mimetypes
+
+from django.db import migrations, models
+
+
+def link_receipts(apps, schema_editor):
+    """Give receipts uploaded before content addressing a Receipt; their files keep their names."""
+    Transaction = apps.get_model('transactions', 'Transaction')
+    Receipt = apps.get_model('transactions', 'Receipt')
+    storage = transactions.receipts.receipt_storage
+    names = Transaction.objects.exclude(receipt='').exclude(receipt__isnull=True).values_list('receipt', flat=True).distinct()
+    for name in names.iterator():
+        receipt, _ = Receipt.objects.get_or_create(file=name, defaults={
+            'size': storage.size(name) if storage.exists(name) else 0,
+            'content_type': mimetypes.guess_type(name)[0] or '',
+        })
+        Transaction.objects.filter(receipt=name).update(receipt_image=receipt)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_transaction_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='receipt',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=transactions.receipts.ContentAddressedStorage(), upload_to='receipts/'),
+        ),
+        migrations.CreateModel(
+            name='Receipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(max_length=255, storage=transactions.receipts.ContentAddressedStorage(), unique=True, upload_to='')),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('thumbnail', models.FileField(blank=True, max_length=255, storage=transactions.receipts.ContentAddressedStorage(), upload_to='')),
+                ('preview', models.FileField(blank=True, max_length=255, storage=transactions.receipts.ContentAddressedStorage(), upload_to='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['created_at'], name='receipt_pending_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='receipt_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='transactions.receipt'),
+        ),
+        migrations.RunPython(link_receipts, migrations.RunPython.noop),
+    ]
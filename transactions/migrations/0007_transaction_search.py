@@ -0,0 +1,129 @@
+# Generated by Django 5.1.6 on 2026-10-17 12:53
+
+import django.db.models.deletion
+import transactions.search
+from django.db import migrations, models
+
+# A copy of the search table and triggers of transactions.search as of this
+# migration, so later changes to them do not change what it creates
+TABLE = 'transactions_transaction_fts'
+
+# The document of the transaction row ``{row}``
+_DOCUMENT = (
+    "coalesce({row}.description, '')"
+    " || ' ' || coalesce((SELECT name FROM transactions_expensecategory WHERE id = {row}.expense_category_id), '')"
+    " || ' ' || coalesce((SELECT name FROM transactions_incomesource WHERE id = {row}.income_source_id), '')"
+)
+
+SQLITE_INSTALL = [
+    # The rowid and transaction_id are both the transaction's id. Joins go
+    # through the UNINDEXED transaction_id, which FTS5 cannot look up, so
+    # SQLite always runs the full-text match first and fetches the matching
+    # transactions by primary key, instead of running the match once per row
+    # of a user with many transactions.
+    f"CREATE VIRTUAL TABLE {TABLE} USING fts5(document, transaction_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')",
+    f"INSERT INTO {TABLE} (rowid, transaction_id, document) SELECT id, id, {_DOCUMENT.format(row='transactions_transaction')} FROM transactions_transaction",
+    f"""CREATE TRIGGER {TABLE}_insert AFTER INSERT ON transactions_transaction BEGIN
+        INSERT INTO {TABLE} (rowid, transaction_id, document) VALUES (new.id, new.id, {_DOCUMENT.format(row='new')});
+    END""",
+    f"""CREATE TRIGGER {TABLE}_update AFTER UPDATE OF description, expense_category_id, income_source_id ON transactions_transaction BEGIN
+        DELETE FROM {TABLE} WHERE rowid = old.id;
+        INSERT INTO {TABLE} (rowid, transaction_id, document) VALUES (new.id, new.id, {_DOCUMENT.format(row='new')});
+    END""",
+    f"""CREATE TRIGGER {TABLE}_delete AFTER DELETE ON transactions_transaction BEGIN
+        DELETE FROM {TABLE} WHERE rowid = old.id;
+    END""",
+] + [
+    f"""CREATE TRIGGER {TABLE}_{column}_rename AFTER UPDATE OF name ON {table} BEGIN
+        DELETE FROM {TABLE} WHERE rowid IN (SELECT id FROM transactions_transaction WHERE {column} = new.id);
+        INSERT INTO {TABLE} (rowid, transaction_id, document)
+            SELECT id, id, {_DOCUMENT.format(row='transactions_transaction')} FROM transactions_transaction WHERE {column} = new.id;
+    END"""
+    for table, column in (
+        ('transactions_expensecategory', 'expense_category_id'),
+        ('transactions_incomesource', 'income_source_id'),
+    )
+]
+
+SQLITE_UNINSTALL = [f"DROP TABLE IF EXISTS {TABLE}"] + [
+    f"DROP TRIGGER IF EXISTS {TABLE}_{name}"
+    for name in ('insert', 'update', 'delete', 'expense_category_id_rename', 'income_source_id_rename')
+]
+
+POSTGRESQL_INSTALL = [
+    # No foreign key, so flushing and truncating transactions keep working;
+    # deletes go through the trigger
+    f"CREATE TABLE {TABLE} (transaction_id bigint PRIMARY KEY, document tsvector NOT NULL)",
+    f"CREATE INDEX {TABLE}_document ON {TABLE} USING gin (document)",
+    f"INSERT INTO {TABLE} (transaction_id, document) SELECT id, to_tsvector('simple', {_DOCUMENT.format(row='transactions_transaction')}) FROM transactions_transaction",
+    f"""CREATE FUNCTION {TABLE}_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            DELETE FROM {TABLE} WHERE transaction_id = OLD.id;
+        ELSE
+            INSERT INTO {TABLE} (transaction_id, document) VALUES (NEW.id, to_tsvector('simple', {_DOCUMENT.format(row='NEW')}))
+            ON CONFLICT (transaction_id) DO UPDATE SET document = EXCLUDED.document;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    f"""CREATE TRIGGER {TABLE}_sync AFTER INSERT OR DELETE OR UPDATE OF description, expense_category_id, income_source_id
+        ON transactions_transaction FOR EACH ROW EXECUTE FUNCTION {TABLE}_sync()""",
+    f"""CREATE FUNCTION {TABLE}_rename() RETURNS trigger AS $$
+    BEGIN
+        UPDATE {TABLE} SET document = to_tsvector('simple', {_DOCUMENT.format(row='t')})
+        FROM transactions_transaction t
+        WHERE {TABLE}.transaction_id = t.id AND (t.expense_category_id = NEW.id AND TG_TABLE_NAME = 'transactions_expensecategory'
+            OR t.income_source_id = NEW.id AND TG_TABLE_NAME = 'transactions_incomesource');
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+] + [
+    f"CREATE TRIGGER {TABLE}_rename AFTER UPDATE OF name ON {table} FOR EACH ROW EXECUTE FUNCTION {TABLE}_rename()"
+    for table in ('transactions_expensecategory', 'transactions_incomesource')
+]
+
+POSTGRESQL_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {TABLE}_sync ON transactions_transaction",
+    f"DROP TRIGGER IF EXISTS {TABLE}_rename ON transactions_expensecategory",
+    f"DROP TRIGGER IF EXISTS {TABLE}_rename ON transactions_incomesource",
+    f"DROP FUNCTION IF EXISTS {TABLE}_sync()",
+    f"DROP FUNCTION IF EXISTS {TABLE}_rename()",
+    f"DROP TABLE IF EXISTS {TABLE}",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement, params=None)
+
+
+def install(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRESQL_INSTALL})
+
+
+def uninstall(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRESQL_UNINSTALL})
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('transactions', '0006_recurringrule'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSearch',
+            fields=[
+                ('transaction', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='transactions.transaction')),
+                ('document', transactions.search.SearchDocumentField()),
+            ],
+            options={
+                'db_table': 'transactions_transaction_fts',
+                'managed': False,
+            },
+        ),
+        # The table itself depends on the database
+        migrations.RunPython(install, uninstall),
+    ]
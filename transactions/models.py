@@ -1,6 +1,16 @@
-from django.db import models
+from django.db import connections, models
+from django.db import transaction as db_transaction
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .signals import transactions_bulk_changed
+from .receipts import digest_of, receipt_setting, receipt_storage
+from .search import VENDORS as SEARCH_VENDORS, SearchDocumentField, SearchRank, match_expression, search_terms
+import mimetypes
+import datetime
 
 class IncomeSource(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='income_sources')
@@ -10,23 +20,44 @@ class IncomeSource(models.Model):
     def __str__(self):
         return self.name
 
+class ExpenseCategoryQuerySet(models.QuerySet):
+    def with_budget_status(self, year, month):
+        """
+        Annotate each category with ``monthly_spent`` for the given month,
+        read from the monthly rollups in the same query as the categories.
+        """
+        return self.annotate(
+            budget_rollups=models.FilteredRelation(
+                'monthly_rollups',
+                condition=models.Q(monthly_rollups__month=datetime.date(year, month, 1))
+            ),
+            monthly_spent=Coalesce(
+                models.Sum('budget_rollups__total'),
+                models.Value(0),
+                output_field=models.DecimalField(max_digits=14, decimal_places=2)
+            )
+        )
+
 class ExpenseCategory(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_categories')
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
     monthly_budget = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     
+    objects = ExpenseCategoryQuerySet.as_manager()
+    
     def __str__(self):
         return self.name
     
     def get_monthly_expenses(self, year, month):
-        return self.expenses.filter(
-            date__year=year,
-            date__month=month
-        ).aggregate(total=models.Sum('amount'))['total'] or 0
+        return self.monthly_rollups.filter(
+            month=datetime.date(year, month, 1)
+        ).aggregate(total=models.Sum('total'))['total'] or 0
     
     def get_budget_status(self, year, month):
-        spent = self.get_monthly_expenses(year, month)
+        return self.budget_status_for(self.get_monthly_expenses(year, month))
+    
+    def budget_status_for(self, spent):
         return {
             'spent': spent,
             'budget': self.monthly_budget,
@@ -34,6 +65,121 @@ class ExpenseCategory(models.Model):
             'percentage': (spent / self.monthly_budget * 100) if self.monthly_budget > 0 else 0
         }
 
+class ReceiptQuerySet(models.QuerySet):
+    def for_file(self, field_file):
+        """
+        Store an uploaded receipt (unless it is already stored) and return its
+        Receipt; identical uploads share one file and one Receipt.
+        """
+        if not field_file._committed:
+            field_file.save(field_file.name, field_file.file, save=False)
+        receipt, _ = self.get_or_create(file=field_file.name, defaults={
+            'size': field_file.size,
+            'content_type': mimetypes.guess_type(field_file.name)[0] or '',
+        })
+        return receipt
+    
+    def pending(self):
+        """Receipts whose thumbnail and preview still have to be generated."""
+        return self.filter(processed_at__isnull=True, attempts__lt=receipt_setting('MAX_ATTEMPTS')).order_by('created_at')
+
+class Receipt(models.Model):
+    """A stored receipt file with its generated thumbnail and preview; see transactions.receipts."""
+    file = models.FileField(storage=receipt_storage, max_length=255, unique=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    thumbnail = models.FileField(storage=receipt_storage, max_length=255, blank=True)
+    preview = models.FileField(storage=receipt_storage, max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    
+    objects = ReceiptQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # The processing queue
+            models.Index(fields=['created_at'], name='receipt_pending_idx', condition=models.Q(processed_at__isnull=True)),
+        ]
+    
+    def __str__(self):
+        return self.file.name
+    
+    @property
+    def digest(self):
+        """The content hash of the file; receipt URLs carry it so browsers can cache them."""
+        return digest_of(self.file.name)
+
+class TransactionQuerySet(models.QuerySet):
+    def search(self, query):
+        """
+        Transactions whose description, category or source name contain every
+        word of ``query`` (as a prefix), annotated with their ``rank``; see
+        transactions.search. Combine with any other filter and order by
+        ``-rank`` for the most relevant first.
+        """
+        terms = search_terms(query)
+        if not terms:
+            return self.annotate(rank=models.Value(0.0, output_field=models.FloatField())).none()
+        
+        vendor = connections[self.db].vendor
+        if vendor not in SEARCH_VENDORS:
+            condition = models.Q()
+            for term in terms:
+                condition &= (
+                    models.Q(description__icontains=term)
+                    | models.Q(expense_category__name__icontains=term)
+                    | models.Q(income_source__name__icontains=term)
+                )
+            return self.filter(condition).annotate(rank=models.Value(0.0, output_field=models.FloatField()))
+        
+        expression = match_expression(terms, vendor)
+        return self.filter(search_entry__document__match=expression).annotate(
+            rank=SearchRank('search_entry__document', expression)
+        )
+    
+    def bulk_delete(self):
+        """
+        Delete these transactions with one DELETE statement, without loading
+        them or sending per-row signals; rollups and caches are refreshed once
+        per user through transactions_bulk_changed. Returns the number deleted.
+        """
+        with db_transaction.atomic(using=self.db):
+            user_ids = list(self.order_by().values_list('user_id', flat=True).distinct())
+            # QuerySet.delete() only deletes in one statement when no receiver
+            # listens for the model's deletes, and the per-row rollup and
+            # cache receivers do; it would load every row and signal each one.
+            # _raw_delete() is the statement delete() runs in that fast path.
+            # Nothing cascades from a transaction (its search entry is removed
+            # by a database trigger), so skipping the collector is safe.
+            deleted = self._raw_delete(self.db)
+            transactions_bulk_changed.send(sender=self.model, user_ids=user_ids)
+        return deleted
+    
+    def recategorize(self, category, chunk_size=2000):
+        """
+        Move the expenses among these transactions that belong to the owner of
+        ``category`` to it with one UPDATE statement; income, other users'
+        transactions and those already in ``category`` are left alone.
+        Returns the number moved.
+        """
+        from .dedupe import refresh_keys
+        
+        moving = self.filter(user_id=category.user_id, transaction_type=Transaction.EXPENSE).exclude(
+            expense_category=category
+        )
+        with db_transaction.atomic(using=self.db):
+            # Locked, so the rows re-keyed below are the ones the UPDATE moves
+            pks = list(moving.select_for_update().order_by('pk').values_list('pk', flat=True))
+            moved = moving.update(expense_category=category)
+            if moved:
+                # The category is part of the duplicate fingerprint
+                for start in range(0, len(pks), chunk_size):
+                    refresh_keys(Transaction.objects.filter(pk__in=pks[start:start + chunk_size]))
+                transactions_bulk_changed.send(sender=self.model, user_ids=[category.user_id])
+        return moved
+
 class Transaction(models.Model):
     INCOME = 'income'
     EXPENSE = 'expense'
@@ -50,14 +196,66 @@ class Transaction(models.Model):
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
     income_source = models.ForeignKey(IncomeSource, on_delete=models.SET_NULL, null=True, blank=True, related_name='incomes')
     expense_category = models.ForeignKey(ExpenseCategory, on_delete=models.SET_NULL, null=True, blank=True, related_name='expenses')
-    receipt = models.FileField(upload_to='receipts/', blank=True, null=True)
+    receipt = models.FileField(upload_to='receipts/', storage=receipt_storage, max_length=255, blank=True, null=True)
+    # The stored file of the receipt, maintained by save()
+    receipt_image = models.ForeignKey(Receipt, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='transactions')
+    # Duplicate detection keys, maintained by save(); see transactions.dedupe
+    fingerprint = models.CharField(max_length=32, blank=True, default='', editable=False)
+    match_key = models.CharField(max_length=32, blank=True, default='', editable=False)
+    # The rule this transaction was materialized from; see transactions.recurring
+    recurring_rule = models.ForeignKey('RecurringRule', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='transactions')
+    
+    objects = TransactionQuerySet.as_manager()
     
     class Meta:
         ordering = ['-date']
+        constraints = [
+            # Materializing a rule twice for the same date is a no-op
+            models.UniqueConstraint(
+                fields=['recurring_rule', 'date'],
+                name='txn_rule_date_unique',
+                condition=models.Q(recurring_rule__isnull=False)
+            ),
+        ]
+        indexes = [
+            # Per-user listings ordered by date (transaction_list, recent transactions)
+            models.Index(fields=['user', '-date', '-id'], name='txn_user_date_idx'),
+            # Totals by type over a date range; amount is included so the sums
+            # can be answered from the index alone
+            models.Index(fields=['user', 'transaction_type', 'date', 'amount'], name='txn_user_type_date_idx'),
+            # Category / source filters; partial, as each only applies to one type
+            models.Index(
+                fields=['user', 'expense_category', 'date', 'amount'],
+                name='txn_user_category_date_idx',
+                condition=models.Q(expense_category__isnull=False)
+            ),
+            models.Index(
+                fields=['user', 'income_source', 'date', 'amount'],
+                name='txn_user_source_date_idx',
+                condition=models.Q(income_source__isnull=False)
+            ),
+            # Exact and near duplicate lookups
+            models.Index(fields=['user', 'fingerprint'], name='txn_user_fingerprint_idx'),
+            models.Index(fields=['user', 'match_key'], name='txn_user_match_key_idx'),
+            # The admin changelist across users, and its first and last dates
+            models.Index(fields=['-date', '-id'], name='txn_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_transaction_type_display()} - {self.amount} on {self.date}"
     
+    def save(self, *args, **kwargs):
+        from .dedupe import keys_for
+        
+        self.fingerprint, self.match_key = keys_for(self)
+        if not self.receipt:
+            self.receipt_image = None
+        elif not self.receipt._committed or self.receipt_image_id is None:
+            self.receipt_image = Receipt.objects.for_file(self.receipt)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'fingerprint', 'match_key', 'receipt_image'}
+        super().save(*args, **kwargs)
+    
     def clean(self):
         from django.core.exceptions import ValidationError
         
@@ -72,3 +270,169 @@ class Transaction(models.Model):
         
         if self.transaction_type == self.EXPENSE and not self.expense_category:
             raise ValidationError("Expense transactions must have an expense category.")
+
+
+class TransactionSearch(models.Model):
+    """
+    The full-text search document of a transaction. The table is created and
+    kept in sync by database triggers (see transactions.search), so the
+    model is read-only and only used to join it into queries.
+    """
+    transaction = models.OneToOneField(
+        Transaction, on_delete=models.DO_NOTHING, primary_key=True,
+        db_constraint=False, related_name='search_entry'
+    )
+    document = SearchDocumentField()
+    
+    class Meta:
+        managed = False
+        db_table = 'transactions_transaction_fts'
+    
+    def __str__(self):
+        return f"Search document of {self.transaction_id}"
+
+
+class RecurringRuleQuerySet(models.QuerySet):
+    def due(self, today):
+        """Active rules with an occurrence on or before ``today`` that is not materialized yet."""
+        return self.filter(active=True, next_date__lte=today)
+
+class RecurringRule(models.Model):
+    """
+    A transaction that repeats every ``interval`` weeks, months or years
+    from ``start_date`` until ``end_date``. Monthly and yearly rules fall on
+    ``day_of_month`` (the start date's day by default), or on the last day
+    of shorter months.
+    """
+    WEEKLY = 'weekly'
+    MONTHLY = 'monthly'
+    YEARLY = 'yearly'
+    
+    FREQUENCIES = [
+        (WEEKLY, 'Weekly'),
+        (MONTHLY, 'Monthly'),
+        (YEARLY, 'Yearly'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_rules')
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    description = models.TextField(blank=True, null=True)
+    income_source = models.ForeignKey(IncomeSource, on_delete=models.SET_NULL, null=True, blank=True, related_name='recurring_rules')
+    expense_category = models.ForeignKey(ExpenseCategory, on_delete=models.SET_NULL, null=True, blank=True, related_name='recurring_rules')
+    frequency = models.CharField(max_length=10, choices=FREQUENCIES, default=MONTHLY)
+    interval = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])
+    day_of_month = models.PositiveSmallIntegerField(null=True, blank=True, validators=[MinValueValidator(1), MaxValueValidator(31)])
+    start_date = models.DateField(default=timezone.now)
+    end_date = models.DateField(null=True, blank=True)
+    active = models.BooleanField(default=True)
+    # The first occurrence that has not been materialized; None once the rule has ended
+    next_date = models.DateField(null=True, blank=True, editable=False)
+    
+    objects = RecurringRuleQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['start_date', 'id']
+        indexes = [
+            # The materialization batch walks due rules in primary key order
+            models.Index(fields=['next_date', 'id'], name='rule_due_idx', condition=models.Q(active=True)),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_transaction_type_display()} of {self.amount} every {self.interval} {self.get_frequency_display().lower()}"
+    
+    def save(self, *args, **kwargs):
+        from .recurring import first_occurrence
+        
+        # Schedule changes apply from the first occurrence not materialized yet
+        after = self.start_date
+        if self.pk is not None:
+            latest = self.transactions.order_by('-date').values_list('date', flat=True).first()
+            if latest is not None:
+                after = max(after, latest + datetime.timedelta(days=1))
+        self.next_date = first_occurrence(self, after)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'next_date'}
+        super().save(*args, **kwargs)
+    
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        
+        if self.end_date and self.start_date and self.end_date < self.start_date:
+            raise ValidationError("The end date must not be before the start date.")
+
+
+class MonthlyRollupQuerySet(models.QuerySet):
+    def between(self, start_date, end_date):
+        return self.filter(month__gte=start_date.replace(day=1), month__lte=end_date)
+    
+    def summary(self):
+        """Fold the matching rollups into a TransactionSummary with one grouped query."""
+        from .aggregates import summary_from_groups
+        
+        return summary_from_groups(self.order_by().values('income_source__name', 'expense_category__name').annotate(
+            income=models.Sum('total', filter=models.Q(transaction_type=Transaction.INCOME)),
+            expense=models.Sum('total', filter=models.Q(transaction_type=Transaction.EXPENSE)),
+            count=models.Sum('count'),
+        ))
+    
+    def by_month(self):
+        return self.values('month').annotate(
+            income=models.Sum('total', filter=models.Q(transaction_type=Transaction.INCOME)),
+            expense=models.Sum('total', filter=models.Q(transaction_type=Transaction.EXPENSE)),
+        ).order_by('month')
+
+
+class MonthlyRollup(models.Model):
+    """
+    Running total and count of a user's transactions per month, type and
+    category/source, kept in step with Transaction by the signal handlers below.
+    
+    Several rows may share the same key (e.g. after a category is deleted and
+    its rows fall back to NULL), so readers always Sum() over matching rows.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_rollups')
+    month = models.DateField(help_text='First day of the month')
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    income_source = models.ForeignKey(IncomeSource, on_delete=models.SET_NULL, null=True, blank=True, related_name='monthly_rollups')
+    expense_category = models.ForeignKey(ExpenseCategory, on_delete=models.SET_NULL, null=True, blank=True, related_name='monthly_rollups')
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+    
+    objects = MonthlyRollupQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'month', 'transaction_type'], name='rollup_user_month_type_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m} {self.transaction_type}: {self.total} ({self.count})"
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_rollup_key(sender, instance, raw, **kwargs):
+    from .rollups import previous_state
+    
+    if not raw:
+        instance._rollup_previous = previous_state(instance)
+
+@receiver(post_save, sender=Transaction)
+def update_rollup_on_save(sender, instance, raw, **kwargs):
+    from .rollups import apply_change
+    
+    if not raw:
+        apply_change(getattr(instance, '_rollup_previous', None), instance)
+        instance._rollup_previous = None
+
+@receiver(post_delete, sender=Transaction)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    from .rollups import apply_change
+    
+    apply_change(instance, None)
+
+@receiver(transactions_bulk_changed)
+def rebuild_rollups_after_bulk_change(sender, user_ids, **kwargs):
+    from .rollups import rebuild
+    
+    rebuild(user_ids)
@@ -0,0 +1,101 @@
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+    
+    def __iter__(self):
+        return iter(self.object_list)
+    
+    def __len__(self):
+        return len(self.object_list)
+    
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by the values of its ordering fields instead of OFFSET,
+    so every page costs one index seek no matter how deep it is.
+    
+    Pages are addressed by an opaque cursor token that encodes the ordering
+    values of the last row of the previous page. The last ordering field must
+    be unique (normally the primary key) for the order to be stable.
+    """
+    
+    def __init__(self, queryset, page_size, ordering=('-date', '-id')):
+        self.queryset = queryset
+        self.page_size = page_size
+        self.ordering = ordering
+        self.fields = [field.lstrip('-') for field in ordering]
+    
+    def _to_python(self, field, value):
+        try:
+            return self.queryset.model._meta.get_field(field).to_python(value)
+        except FieldDoesNotExist:
+            # Annotations are kept as decoded
+            return value
+    
+    def encode_cursor(self, obj):
+        values = []
+        for field in self.fields:
+            value = getattr(obj, field)
+            if isinstance(value, (datetime.date, Decimal)):
+                value = str(value)
+            values.append(value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+    
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            return [self._to_python(field, value) for field, value in zip(self.fields, values)]
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            raise InvalidCursor('Invalid cursor')
+    
+    def _after(self, values):
+        """
+        Build the WHERE clause selecting rows strictly after ``values``:
+        (a < x) OR (a = x AND b < y) OR ..., with the comparison flipped for
+        ascending fields. The leading field is also bounded on its own so the
+        database can seek straight to the start of the page.
+        """
+        condition = Q()
+        equal = Q()
+        for order, field, value in zip(self.ordering, self.fields, values):
+            lookup = 'lt' if order.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        
+        leading = 'lte' if self.ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{self.fields[0]}__{leading}': values[0]}) & condition
+    
+    def page(self, cursor=None):
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+        
+        rows = list(queryset[:self.page_size + 1])
+        next_cursor = None
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            next_cursor = self.encode_cursor(rows[-1])
+        
+        return KeysetPage(rows, next_cursor)
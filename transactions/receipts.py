@@ -0,0 +1,236 @@
+"""
+Receipt storage and processing.
+
+Uploads are stored under the SHA-256 of their content in a sharded layout
+(``receipts/ab/cd/abcd....jpg``), so the same file uploaded twice is stored
+once and no directory grows too large. The ``process_receipts`` command
+generates a small thumbnail and a screen-sized preview of every new image
+off the request path; pages link to the thumbnails only. Files are served
+by an authenticated view, streamed with range support or handed to the
+web server with X-Accel-Redirect or X-Sendfile.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.db import transaction as db_transaction
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .signals import transactions_cache_stale
+
+DEFAULTS = {
+    # Directory of the receipt files; MEDIA_ROOT by default. In production it
+    # should not be served publicly, as every file goes through the view.
+    'ROOT': None,
+    'THUMBNAIL_SIZE': (160, 160),
+    'PREVIEW_SIZE': (1600, 1600),
+    'FORMAT': 'WEBP',
+    'QUALITY': 75,
+    'MAX_ATTEMPTS': 3,
+    # None streams files from Django; 'x-accel-redirect' (nginx) or
+    # 'x-sendfile' (Apache, lighttpd) let the web server send them
+    'SENDFILE': None,
+    # The nginx `internal` location mapped to ROOT
+    'ACCEL_PREFIX': '/protected/',
+    'CACHE_SECONDS': 24 * 3600,
+}
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def receipt_setting(name):
+    return getattr(settings, 'FINANCE_RECEIPTS', {}).get(name, DEFAULTS[name])
+
+
+def sharded_name(digest, suffix, prefix='receipts'):
+    return f'{prefix}/{digest[:2]}/{digest[2:4]}/{digest}{suffix}'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage that names files after the SHA-256 of their content.
+    Saving content that is already stored returns the existing name, and
+    files are never overwritten, so several records can share one file.
+    """
+    
+    def __init__(self, prefix='receipts', **kwargs):
+        self.prefix = prefix
+        super().__init__(**kwargs)
+    
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, receipt_setting('ROOT') or settings.MEDIA_ROOT)
+    
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        suffix = os.path.splitext(name or '')[1].lower()[:10]
+        name = sharded_name(digest.hexdigest(), suffix, self.prefix)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+receipt_storage = ContentAddressedStorage()
+
+
+def digest_of(name):
+    """The content hash in a stored file name (or the old name of files stored before hashing)."""
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def render_variants(file):
+    """
+    Return the thumbnail and preview of an image as ``{field: ContentFile}``.
+    The preview is left out when the image is already small enough; files
+    that are not images (PDF receipts) have no variants.
+    """
+    thumbnail_size = tuple(receipt_setting('THUMBNAIL_SIZE'))
+    preview_size = tuple(receipt_setting('PREVIEW_SIZE'))
+    image_format = receipt_setting('FORMAT')
+    extension = '.' + image_format.lower()
+    
+    try:
+        image = Image.open(file)
+        # Let the JPEG decoder downscale while decoding large phone photos
+        image.draft('RGB', preview_size)
+        # Phone photos are stored sideways with an orientation tag
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        return {}
+    
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    
+    variants = {}
+    for field, size in (('thumbnail', thumbnail_size), ('preview', preview_size)):
+        if field == 'preview' and image.width <= size[0] and image.height <= size[1]:
+            continue
+        variant = image.copy()
+        variant.thumbnail(size, Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        variant.save(buffer, image_format, quality=receipt_setting('QUALITY'), optimize=True)
+        variants[field] = ContentFile(buffer.getvalue(), name=f'{field}{extension}')
+    return variants
+
+
+def process_receipt(receipt):
+    """Generate the variants of ``receipt`` and mark it processed."""
+    with receipt.file.open('rb') as file:
+        variants = render_variants(file)
+    for field, content in variants.items():
+        getattr(receipt, field).save(content.name, content, save=False)
+    receipt.processed_at = timezone.now()
+    receipt.error = ''
+    receipt.save(update_fields=['thumbnail', 'preview', 'processed_at', 'error'])
+
+
+def process_pending(limit=100):
+    """
+    Process up to ``limit`` receipts that have no variants yet, one locked
+    row at a time so several workers can run. Pages showing the affected
+    transactions are invalidated. Returns the number of receipts handled.
+    """
+    from .models import Receipt, Transaction
+    
+    handled = 0
+    while handled < limit:
+        with db_transaction.atomic():
+            pending = Receipt.objects.pending()
+            if connection.features.has_select_for_update_skip_locked:
+                pending = pending.select_for_update(skip_locked=True)
+            receipt = pending.first()
+            if receipt is None:
+                break
+            try:
+                # A savepoint, so a failure can still be recorded
+                with db_transaction.atomic():
+                    process_receipt(receipt)
+            except Exception as exc:
+                receipt.attempts += 1
+                receipt.error = str(exc)
+                receipt.save(update_fields=['attempts', 'error'])
+            else:
+                user_ids = list(receipt.transactions.order_by().values_list('user_id', flat=True).distinct())
+                transactions_cache_stale.send(sender=Transaction, user_ids=user_ids)
+        handled += 1
+    return handled
+
+
+def _read(file, length):
+    with file:
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _stream(request, field_file, content_type, etag):
+    """A FileResponse, or a 206 StreamingHttpResponse for a single ``Range: bytes=`` request."""
+    size = field_file.size
+    file = field_file.storage.open(field_file.name, 'rb')
+    match = RANGE_RE.match(request.headers.get('Range', ''))
+    if_range = request.headers.get('If-Range')
+    if not match or not any(match.groups()) or (if_range and if_range != etag):
+        return FileResponse(file, content_type=content_type)
+    
+    if match[1]:
+        start = int(match[1])
+        end = min(int(match[2]), size - 1) if match[2] else size - 1
+    else:
+        start = max(size - int(match[2]), 0)
+        end = size - 1
+    if start > end:
+        file.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    
+    file.seek(start)
+    response = StreamingHttpResponse(_read(file, end - start + 1), status=206, content_type=content_type)
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+def serve_receipt(request, field_file, attachment=False):
+    """
+    Send a stored receipt file. Names change with the content, so the
+    name's hash is a strong ETag and private caches may keep the file.
+    """
+    etag = f'"{digest_of(field_file.name)}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        content_type = mimetypes.guess_type(field_file.name)[0] or 'application/octet-stream'
+        sendfile = receipt_setting('SENDFILE')
+        if sendfile == 'x-accel-redirect':
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = receipt_setting('ACCEL_PREFIX') + field_file.name
+        elif sendfile == 'x-sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = field_file.path
+        else:
+            response = _stream(request, field_file, content_type, etag)
+        response['Accept-Ranges'] = 'bytes'
+        if attachment:
+            response['Content-Disposition'] = f'attachment; filename="{os.path.basename(field_file.name)}"'
+    
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=receipt_setting('CACHE_SECONDS'))
+    return response
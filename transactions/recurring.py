@@ -0,0 +1,153 @@
+"""
+Recurring transactions.
+
+Rules are materialized into real transactions by ``materialize_due``, a
+batch job meant to run daily (``manage.py materialize_recurring``). It walks
+the due rules in primary key chunks, so memory stays bounded however many
+rules exist, and inserts with ``bulk_create(ignore_conflicts=True)`` against
+the unique (rule, date) constraint, so re-running it, or two runs
+overlapping, never duplicates a transaction. Future occurrences are
+projected from the rules without storing anything.
+"""
+import datetime
+from calendar import monthrange
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from . import rollups
+from .dedupe import keys_for
+from .models import RecurringRule, Transaction
+from .signals import transactions_cache_stale
+
+
+def _add_months(start, months, day):
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    return datetime.date(year, month, min(day, monthrange(year, month)[1]))
+
+
+def _nth(rule, n):
+    """The ``n``-th occurrence of ``rule`` (0 is the first), ignoring its end date."""
+    start = rule.start_date
+    if rule.frequency == RecurringRule.WEEKLY:
+        return start + datetime.timedelta(weeks=n * rule.interval)
+    months = n * rule.interval * (12 if rule.frequency == RecurringRule.YEARLY else 1)
+    return _add_months(start, months, rule.day_of_month or start.day)
+
+
+def _index_near(rule, date):
+    """An occurrence index whose date is at most one step before ``date``."""
+    start = rule.start_date
+    if date <= start:
+        return 0
+    if rule.frequency == RecurringRule.WEEKLY:
+        return max((date - start).days // (7 * rule.interval) - 1, 0)
+    months = (date.year - start.year) * 12 + date.month - start.month
+    step = rule.interval * (12 if rule.frequency == RecurringRule.YEARLY else 1)
+    return max(months // step - 1, 0)
+
+
+def occurrences(rule, start, end):
+    """Yield the dates of ``rule`` from ``start`` to ``end``, both included."""
+    if rule.end_date:
+        end = min(end, rule.end_date)
+    n = _index_near(rule, start)
+    while True:
+        date = _nth(rule, n)
+        if date > end:
+            return
+        # A day_of_month before the start day puts the first month's date
+        # before start_date
+        if date >= start and date >= rule.start_date:
+            yield date
+        n += 1
+
+
+def first_occurrence(rule, after):
+    """The first date of ``rule`` on or after ``after``, or None when it has ended."""
+    end = rule.end_date or after + datetime.timedelta(days=366 * max(rule.interval, 1) + 31)
+    return next(occurrences(rule, after, end), None)
+
+
+def _transaction(rule, date):
+    transaction = Transaction(
+        user_id=rule.user_id,
+        date=date,
+        amount=rule.amount,
+        description=rule.description,
+        transaction_type=rule.transaction_type,
+        income_source_id=rule.income_source_id,
+        expense_category_id=rule.expense_category_id,
+        recurring_rule=rule,
+    )
+    transaction.fingerprint, transaction.match_key = keys_for(transaction)
+    return transaction
+
+
+@dataclass
+class MaterializeResult:
+    rules: int = 0
+    occurrences: int = 0
+    users: set = field(default_factory=set)
+
+
+def materialize_due(today=None, chunk_size=None):
+    """
+    Create the transactions of every occurrence up to ``today`` that has not
+    been materialized, for all users. Each chunk of ``chunk_size`` rules
+    (RECURRING_CHUNK_SIZE by default) is committed on its own, with the
+    rollups of the months it wrote to and the caches of its users refreshed
+    once.
+    """
+    today = today or timezone.localdate()
+    chunk_size = chunk_size or settings.RECURRING_CHUNK_SIZE
+    result = MaterializeResult()
+    last_pk = 0
+    while True:
+        with db_transaction.atomic():
+            rules = list(
+                RecurringRule.objects.due(today).filter(pk__gt=last_pk).order_by('pk')[:chunk_size]
+            )
+            if not rules:
+                break
+            last_pk = rules[-1].pk
+            
+            rows = []
+            for rule in rules:
+                rows.extend(_transaction(rule, date) for date in occurrences(rule, rule.next_date, today))
+                rule.next_date = first_occurrence(rule, today + datetime.timedelta(days=1))
+            Transaction.objects.bulk_create(rows, ignore_conflicts=True)
+            RecurringRule.objects.bulk_update(rules, ['next_date'])
+            
+            # Rows skipped as already materialized are counted again, so the
+            # months are recomputed rather than incremented
+            rollups.rebuild_months({(row.user_id, row.date.replace(day=1)) for row in rows})
+            user_ids = sorted({rule.user_id for rule in rules})
+            transactions_cache_stale.send(sender=Transaction, user_ids=user_ids)
+        
+        result.rules += len(rules)
+        result.occurrences += len(rows)
+        result.users.update(user_ids)
+    return result
+
+
+def project(rules, start, end):
+    """
+    Unsaved transactions for the occurrences of ``rules`` from ``start`` to
+    ``end`` that are not materialized yet, ordered by date.
+    """
+    projected = []
+    for rule in rules:
+        if not rule.active or rule.next_date is None:
+            continue
+        for date in occurrences(rule, max(start, rule.next_date), end):
+            transaction = _transaction(rule, date)
+            # Keep the related objects loaded with the rule
+            transaction.income_source = rule.income_source
+            transaction.expense_category = rule.expense_category
+            projected.append(transaction)
+    projected.sort(key=lambda transaction: transaction.date)
+    return projected
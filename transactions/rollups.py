@@ -0,0 +1,152 @@
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import Count, F, Subquery, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import MonthlyRollup, Transaction
+
+STATE_FIELDS = ('user_id', 'date', 'transaction_type', 'income_source_id', 'expense_category_id', 'amount')
+KEY_FIELDS = ('user_id', 'month', 'transaction_type', 'income_source_id', 'expense_category_id')
+
+
+def _state(value):
+    if value is None or isinstance(value, dict):
+        return value
+    return {field: getattr(value, field) for field in STATE_FIELDS}
+
+
+def _key(state):
+    date = Transaction._meta.get_field('date').to_python(state['date'])
+    return (
+        state['user_id'],
+        date.replace(day=1),
+        state['transaction_type'],
+        state['income_source_id'],
+        state['expense_category_id'],
+    )
+
+
+def previous_state(instance):
+    """
+    Return the stored rollup-relevant fields of ``instance`` before it is saved,
+    or None for a new row.
+    """
+    if instance._state.adding or instance.pk is None:
+        return None
+    return Transaction.objects.filter(pk=instance.pk).values(*STATE_FIELDS).first()
+
+
+def _apply(key, amount, count):
+    rows = MonthlyRollup.objects.filter(**dict(zip(KEY_FIELDS, key)))
+    updated = MonthlyRollup.objects.filter(pk=Subquery(rows.values('pk')[:1])).update(
+        total=F('total') + amount,
+        count=F('count') + count
+    )
+    # Never create a row for a removal: the user or category may be in the
+    # middle of a cascading delete.
+    if not updated and count > 0:
+        MonthlyRollup.objects.create(total=amount, count=count, **dict(zip(KEY_FIELDS, key)))
+
+
+def apply_change(previous, current):
+    """
+    Move a transaction's contribution from its ``previous`` rollup row to its
+    ``current`` one. Either side may be None for a create or a delete.
+    """
+    deltas = {}
+    for state, sign in ((_state(previous), -1), (_state(current), 1)):
+        if state is None:
+            continue
+        amount, count = deltas.get(_key(state), (Decimal('0'), 0))
+        deltas[_key(state)] = (amount + sign * Decimal(str(state['amount'])), count + sign)
+    
+    with db_transaction.atomic():
+        for key, (amount, count) in deltas.items():
+            if amount or count:
+                _apply(key, amount, count)
+
+
+def _expected_rows(user_id):
+    return _aggregate(Transaction.objects.filter(user_id=user_id))
+
+
+def _aggregate(transactions):
+    return transactions.annotate(
+        month=TruncMonth('date')
+    ).order_by().values(*KEY_FIELDS).annotate(
+        total=Sum('amount'),
+        count=Count('id')
+    )
+
+
+def _stored_rows(user_id):
+    return MonthlyRollup.objects.filter(user_id=user_id).order_by().values(*KEY_FIELDS).annotate(
+        total=Sum('total'),
+        count=Sum('count')
+    )
+
+
+def _by_key(rows):
+    return {
+        tuple(row[field] for field in KEY_FIELDS): (row['total'], row['count'])
+        for row in rows
+        if row['total'] or row['count']
+    }
+
+
+def active_user_ids():
+    """Every user that has transactions or rollup rows."""
+    ids = set(Transaction.objects.order_by().values_list('user_id', flat=True).distinct())
+    ids.update(MonthlyRollup.objects.order_by().values_list('user_id', flat=True).distinct())
+    return sorted(ids)
+
+
+def rebuild(user_ids):
+    """Recompute the rollup rows of the given users from their raw transactions."""
+    for user_id in user_ids:
+        with db_transaction.atomic():
+            MonthlyRollup.objects.filter(user_id=user_id).delete()
+            MonthlyRollup.objects.bulk_create(
+                MonthlyRollup(**row) for row in _expected_rows(user_id)
+            )
+
+
+def rebuild_months(user_months):
+    """
+    Recompute the rollup rows of ``user_months``, (user_id, first day of
+    the month) pairs, from the raw transactions of those months only; one
+    aggregate per distinct month, however long the users' histories.
+    """
+    users_by_month = defaultdict(set)
+    for user_id, month in user_months:
+        users_by_month[month].add(user_id)
+    
+    with db_transaction.atomic():
+        for month, user_ids in sorted(users_by_month.items()):
+            next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+            MonthlyRollup.objects.filter(user_id__in=user_ids, month=month).delete()
+            MonthlyRollup.objects.bulk_create(
+                MonthlyRollup(**row) for row in _aggregate(Transaction.objects.filter(
+                    user_id__in=user_ids, date__gte=month, date__lt=next_month
+                ))
+            )
+
+
+def verify(user_ids):
+    """
+    Compare rollups with the raw transactions of the given users.
+    
+    Returns a list of (user_id, key, expected, stored) tuples for every
+    mismatching key; an empty list means the rollups are consistent.
+    """
+    mismatches = []
+    for user_id in user_ids:
+        expected = _by_key(_expected_rows(user_id))
+        stored = _by_key(_stored_rows(user_id))
+        for key in sorted(set(expected) | set(stored), key=str):
+            if expected.get(key) != stored.get(key):
+                mismatches.append((user_id, key, expected.get(key), stored.get(key)))
+    return mismatches
@@ -0,0 +1,180 @@
+"""
+Full-text search over transactions.
+
+Every transaction has a search document made of its description and the
+name of its expense category or income source, stored in
+``transactions_transaction_fts``: an FTS5 table on SQLite, or a table of
+``tsvector`` values with a GIN index on PostgreSQL. Database triggers keep
+it in sync with every insert, update and delete, bulk writes and category
+renames included, so no Python code has to remember to.
+
+Queries are split into words that are matched as prefixes, all of them
+required, and results are ranked by relevance (BM25 on SQLite, ts_rank on
+PostgreSQL; higher is better in both cases). Other databases fall back to
+``icontains`` filters without ranking.
+"""
+import re
+
+from django.db import NotSupportedError, models
+
+TABLE = 'transactions_transaction_fts'
+VENDORS = ('sqlite', 'postgresql')
+MAX_TERMS = 10
+TERM_RE = re.compile(r'\w+')
+
+# The document of the transaction row ``{row}``
+_DOCUMENT = (
+    "coalesce({row}.description, '')"
+    " || ' ' || coalesce((SELECT name FROM transactions_expensecategory WHERE id = {row}.expense_category_id), '')"
+    " || ' ' || coalesce((SELECT name FROM transactions_incomesource WHERE id = {row}.income_source_id), '')"
+)
+
+SQLITE_INSTALL = [
+    # The rowid and transaction_id are both the transaction's id. Joins go
+    # through the UNINDEXED transaction_id, which FTS5 cannot look up, so
+    # SQLite always runs the full-text match first and fetches the matching
+    # transactions by primary key, instead of running the match once per row
+    # of a user with many transactions.
+    f"CREATE VIRTUAL TABLE {TABLE} USING fts5(document, transaction_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')",
+    f"INSERT INTO {TABLE} (rowid, transaction_id, document) SELECT id, id, {_DOCUMENT.format(row='transactions_transaction')} FROM transactions_transaction",
+    f"""CREATE TRIGGER {TABLE}_insert AFTER INSERT ON transactions_transaction BEGIN
+        INSERT INTO {TABLE} (rowid, transaction_id, document) VALUES (new.id, new.id, {_DOCUMENT.format(row='new')});
+    END""",
+    f"""CREATE TRIGGER {TABLE}_update AFTER UPDATE OF description, expense_category_id, income_source_id ON transactions_transaction BEGIN
+        DELETE FROM {TABLE} WHERE rowid = old.id;
+        INSERT INTO {TABLE} (rowid, transaction_id, document) VALUES (new.id, new.id, {_DOCUMENT.format(row='new')});
+    END""",
+    f"""CREATE TRIGGER {TABLE}_delete AFTER DELETE ON transactions_transaction BEGIN
+        DELETE FROM {TABLE} WHERE rowid = old.id;
+    END""",
+] + [
+    f"""CREATE TRIGGER {TABLE}_{column}_rename AFTER UPDATE OF name ON {table} BEGIN
+        DELETE FROM {TABLE} WHERE rowid IN (SELECT id FROM transactions_transaction WHERE {column} = new.id);
+        INSERT INTO {TABLE} (rowid, transaction_id, document)
+            SELECT id, id, {_DOCUMENT.format(row='transactions_transaction')} FROM transactions_transaction WHERE {column} = new.id;
+    END"""
+    for table, column in (
+        ('transactions_expensecategory', 'expense_category_id'),
+        ('transactions_incomesource', 'income_source_id'),
+    )
+]
+
+SQLITE_UNINSTALL = [f"DROP TABLE IF EXISTS {TABLE}"] + [
+    f"DROP TRIGGER IF EXISTS {TABLE}_{name}"
+    for name in ('insert', 'update', 'delete', 'expense_category_id_rename', 'income_source_id_rename')
+]
+
+POSTGRESQL_INSTALL = [
+    # No foreign key, so flushing and truncating transactions keep working;
+    # deletes go through the trigger
+    f"CREATE TABLE {TABLE} (transaction_id bigint PRIMARY KEY, document tsvector NOT NULL)",
+    f"CREATE INDEX {TABLE}_document ON {TABLE} USING gin (document)",
+    f"INSERT INTO {TABLE} (transaction_id, document) SELECT id, to_tsvector('simple', {_DOCUMENT.format(row='transactions_transaction')}) FROM transactions_transaction",
+    f"""CREATE FUNCTION {TABLE}_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            DELETE FROM {TABLE} WHERE transaction_id = OLD.id;
+        ELSE
+            INSERT INTO {TABLE} (transaction_id, document) VALUES (NEW.id, to_tsvector('simple', {_DOCUMENT.format(row='NEW')}))
+            ON CONFLICT (transaction_id) DO UPDATE SET document = EXCLUDED.document;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    f"""CREATE TRIGGER {TABLE}_sync AFTER INSERT OR DELETE OR UPDATE OF description, expense_category_id, income_source_id
+        ON transactions_transaction FOR EACH ROW EXECUTE FUNCTION {TABLE}_sync()""",
+    f"""CREATE FUNCTION {TABLE}_rename() RETURNS trigger AS $$
+    BEGIN
+        UPDATE {TABLE} SET document = to_tsvector('simple', {_DOCUMENT.format(row='t')})
+        FROM transactions_transaction t
+        WHERE {TABLE}.transaction_id = t.id AND (t.expense_category_id = NEW.id AND TG_TABLE_NAME = 'transactions_expensecategory'
+            OR t.income_source_id = NEW.id AND TG_TABLE_NAME = 'transactions_incomesource');
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+] + [
+    f"CREATE TRIGGER {TABLE}_rename AFTER UPDATE OF name ON {table} FOR EACH ROW EXECUTE FUNCTION {TABLE}_rename()"
+    for table in ('transactions_expensecategory', 'transactions_incomesource')
+]
+
+POSTGRESQL_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {TABLE}_sync ON transactions_transaction",
+    f"DROP TRIGGER IF EXISTS {TABLE}_rename ON transactions_expensecategory",
+    f"DROP TRIGGER IF EXISTS {TABLE}_rename ON transactions_incomesource",
+    f"DROP FUNCTION IF EXISTS {TABLE}_sync()",
+    f"DROP FUNCTION IF EXISTS {TABLE}_rename()",
+    f"DROP TABLE IF EXISTS {TABLE}",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement, params=None)
+
+
+def install(apps, schema_editor):
+    """Create and fill the search table and its triggers (a RunPython migration step)."""
+    _run(schema_editor, {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRESQL_INSTALL})
+
+
+def uninstall(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRESQL_UNINSTALL})
+
+
+def search_terms(query):
+    """The lowercased words of ``query``, at most MAX_TERMS of them."""
+    return TERM_RE.findall((query or '').lower())[:MAX_TERMS]
+
+
+def match_expression(terms, vendor):
+    """The full-text query matching every term of ``terms`` as a prefix."""
+    if vendor == 'postgresql':
+        return ' & '.join(f'{term}:*' for term in terms)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+class SearchDocumentField(models.TextField):
+    """The search document column; only used through the ``match`` lookup and SearchRank."""
+    
+    def db_type(self, connection):
+        return 'tsvector' if connection.vendor == 'postgresql' else super().db_type(connection)
+
+
+@SearchDocumentField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+    
+    def as_sql(self, compiler, connection):
+        raise NotSupportedError(f'Full-text search is not supported on {connection.vendor}.')
+    
+    def as_sqlite(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+    
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} @@ to_tsquery('simple', {rhs})", lhs_params + rhs_params
+
+
+class SearchRank(models.Func):
+    """The relevance of the search document ``expression`` for ``query``; higher is better."""
+    output_field = models.FloatField()
+    
+    def __init__(self, expression, query):
+        super().__init__(expression, models.Value(query))
+    
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(f'Full-text search is not supported on {connection.vendor}.')
+    
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # bm25() takes the table's hidden column, named after the table, and
+        # is lower for better matches
+        document = self.get_source_expressions()[0]
+        quote = connection.ops.quote_name
+        return f'-bm25({quote(document.alias)}.{quote(TABLE)})', []
+    
+    def as_postgresql(self, compiler, connection, **extra_context):
+        document, query = (compiler.compile(expression) for expression in self.get_source_expressions())
+        return f"ts_rank({document[0]}, to_tsquery('simple', {query[0]}))", (*document[1], *query[1])
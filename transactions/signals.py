@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+# Sent with ``user_ids`` after transactions were written in bulk (imports,
+# bulk_create, queryset updates) without the per-row model signals firing.
+transactions_bulk_changed = Signal()
+
+# Sent with ``user_ids`` when cached pages of these users are stale but their
+# rollups are current: nothing they count changed (e.g. receipt thumbnails
+# were generated), or the writer updated them itself. Rollups are left alone.
+transactions_cache_stale = Signal()
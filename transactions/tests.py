@@ -1,3 +1,1159 @@
-from django.test import TestCase
+import csv
+import datetime
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import rollups
+from .aggregates import period_totals, summarize, breakdown_rows, choose_granularity, comparison_series
+from .analytics import analyze
+from .importers import import_transactions, read_ofx, ImportFormatError
+from .dedupe import find_duplicates
+from .models import Transaction, IncomeSource, ExpenseCategory, MonthlyRollup, Receipt, RecurringRule
+from .pagination import KeysetPaginator
+from .recurring import materialize_due, occurrences, project
+from .search import TABLE as SEARCH_TABLE
+
+
+class PeriodTotalsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        self.salary = IncomeSource.objects.create(user=self.user, name='Salary')
+        self.food = ExpenseCategory.objects.create(user=self.user, name='Food', monthly_budget=100)
+    
+    def add(self, date, amount, transaction_type=Transaction.EXPENSE):
+        return Transaction.objects.create(
+            user=self.user,
+            amount=Decimal(amount),
+            date=date,
+            transaction_type=transaction_type,
+            income_source=self.salary if transaction_type == Transaction.INCOME else None,
+            expense_category=self.food if transaction_type == Transaction.EXPENSE else None,
+        )
+    
+    def test_buckets_are_zero_filled(self):
+        self.add(datetime.date(2024, 1, 3), '10.00')
+        self.add(datetime.date(2024, 1, 3), '5.50')
+        self.add(datetime.date(2024, 2, 20), '100.00', Transaction.INCOME)
+        
+        totals = period_totals(Transaction.objects.filter(user=self.user), datetime.date(2024, 1, 1), datetime.date(2024, 2, 29))
+        
+        self.assertEqual(len(totals.daily), 60)
+        self.assertEqual(totals.daily[2], {'date': datetime.date(2024, 1, 3), 'income': Decimal('0'), 'expense': Decimal('15.50')})
+        self.assertEqual([bucket['date'] for bucket in totals.monthly], [datetime.date(2024, 1, 1), datetime.date(2024, 2, 1)])
+        self.assertEqual(totals.monthly[1]['income'], Decimal('100.00'))
+        self.assertEqual(totals.weekly[0]['date'], datetime.date(2024, 1, 1))
+        self.assertEqual(totals.balance, Decimal('84.50'))
+    
+    def test_single_query(self):
+        for day in range(1, 11):
+            self.add(datetime.date(2024, 3, day), '1.00')
+        
+        with self.assertNumQueries(1):
+            totals = period_totals(Transaction.objects.filter(user=self.user))
+            self.assertEqual(len(totals.daily), 10)
+            self.assertEqual(len(totals.monthly), 1)
+    
+    def test_granularity_follows_span(self):
+        start = datetime.date(2020, 1, 1)
+        self.assertEqual(choose_granularity(start, datetime.date(2020, 1, 31)), 'day')
+        self.assertEqual(choose_granularity(start, datetime.date(2020, 4, 30)), 'week')
+        self.assertEqual(choose_granularity(start, datetime.date(2020, 12, 31)), 'month')
+        self.assertEqual(choose_granularity(start, datetime.date(2024, 12, 31)), 'quarter')
+    
+    def test_comparison_series_includes_previous_year(self):
+        self.add(datetime.date(2019, 2, 10), '7.00')
+        self.add(datetime.date(2020, 2, 10), '10.00')
+        self.add(datetime.date(2023, 11, 5), '20.00', Transaction.INCOME)
+        self.add(datetime.date(2024, 11, 5), '30.00', Transaction.INCOME)
+        
+        with self.assertNumQueries(1):
+            granularity, buckets = comparison_series(
+                Transaction.objects.filter(user=self.user), datetime.date(2020, 1, 1), datetime.date(2024, 12, 31)
+            )
+        
+        self.assertEqual(granularity, 'quarter')
+        self.assertEqual(len(buckets), 20)
+        self.assertEqual(buckets[0]['label'], 'Q1 2020')
+        self.assertEqual((buckets[0]['expense'], buckets[0]['previous_expense']), (Decimal('10.00'), Decimal('7.00')))
+        self.assertEqual((buckets[-1]['income'], buckets[-1]['previous_income']), (Decimal('30.00'), Decimal('20.00')))
+        self.assertEqual(buckets[4]['previous_expense'], Decimal('10.00'))
+    
+    def test_comparison_series_weeks_align_on_weekdays(self):
+        self.add(datetime.date(2023, 3, 8), '4.00')
+        self.add(datetime.date(2024, 3, 6), '6.00')
+        
+        granularity, buckets = comparison_series(
+            Transaction.objects.filter(user=self.user), datetime.date(2024, 2, 1), datetime.date(2024, 4, 30)
+        )
+        
+        self.assertEqual(granularity, 'week')
+        week = next(bucket for bucket in buckets if bucket['date'] == datetime.date(2024, 3, 4))
+        self.assertEqual((week['expense'], week['previous_expense']), (Decimal('6.00'), Decimal('4.00')))
+    
+    def test_comparison_series_keeps_ranges_apart_in_edge_buckets(self):
+        self.add(datetime.date(2025, 7, 5), '100.00')
+        self.add(datetime.date(2025, 7, 20), '7.00')
+        
+        granularity, buckets = comparison_series(
+            Transaction.objects.filter(user=self.user), datetime.date(2025, 7, 15), datetime.date(2026, 7, 14)
+        )
+        
+        self.assertEqual(granularity, 'month')
+        self.assertEqual((buckets[0]['expense'], buckets[0]['previous_expense']), (Decimal('7.00'), Decimal('0')))
+        self.assertEqual((buckets[-1]['expense'], buckets[-1]['previous_expense']), (Decimal('0'), Decimal('100.00')))
+    
+    def test_comparison_series_counts_overlapping_days_in_both_ranges(self):
+        self.add(datetime.date(2024, 6, 1), '5.00')
+        
+        granularity, buckets = comparison_series(
+            Transaction.objects.filter(user=self.user), datetime.date(2024, 1, 1), datetime.date(2025, 12, 31), 'month'
+        )
+        
+        by_date = {bucket['date']: bucket for bucket in buckets}
+        self.assertEqual(by_date[datetime.date(2024, 6, 1)]['expense'], Decimal('5.00'))
+        self.assertEqual(by_date[datetime.date(2025, 6, 1)]['previous_expense'], Decimal('5.00'))
+
+
+class MonthlyRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('carol', password='secret')
+        self.food = ExpenseCategory.objects.create(user=self.user, name='Food', monthly_budget=100)
+        self.rent = ExpenseCategory.objects.create(user=self.user, name='Rent', monthly_budget=1000)
+    
+    def assertConsistent(self):
+        self.assertEqual(rollups.verify([self.user.id]), [])
+    
+    def test_incremental_maintenance(self):
+        txn = Transaction.objects.create(user=self.user, amount=Decimal('12.50'), date=datetime.date(2024, 1, 10), transaction_type=Transaction.EXPENSE, expense_category=self.food)
+        Transaction.objects.create(user=self.user, amount=Decimal('7.50'), date=datetime.date(2024, 1, 11), transaction_type=Transaction.EXPENSE, expense_category=self.food)
+        self.assertEqual(self.food.get_monthly_expenses(2024, 1), Decimal('20.00'))
+        self.assertConsistent()
+        
+        # Move the first transaction to another month and category
+        txn.amount = Decimal('30.00')
+        txn.date = datetime.date(2024, 2, 1)
+        txn.expense_category = self.rent
+        txn.save()
+        self.assertEqual(self.food.get_monthly_expenses(2024, 1), Decimal('7.50'))
+        self.assertEqual(self.rent.get_monthly_expenses(2024, 2), Decimal('30.00'))
+        self.assertConsistent()
+        
+        txn.delete()
+        self.assertEqual(self.rent.get_monthly_expenses(2024, 2), 0)
+        self.assertConsistent()
+    
+    def test_category_delete_keeps_totals(self):
+        Transaction.objects.create(user=self.user, amount=Decimal('5.00'), date=datetime.date(2024, 3, 1), transaction_type=Transaction.EXPENSE, expense_category=self.food)
+        self.food.delete()
+        self.assertConsistent()
+        summary = MonthlyRollup.objects.filter(user=self.user).summary()
+        self.assertEqual((summary.income_total, summary.expense_total), (0, Decimal('5.00')))
+    
+    def test_rebuild_command(self):
+        Transaction.objects.create(user=self.user, amount=Decimal('5.00'), date=datetime.date(2024, 3, 1), transaction_type=Transaction.EXPENSE, expense_category=self.food)
+        MonthlyRollup.objects.all().update(total=999)
+        self.assertNotEqual(rollups.verify([self.user.id]), [])
+        
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertConsistent()
+
+
+class QueryPlanTests(TestCase):
+    """
+    Run EXPLAIN on the hot queries of transaction_list, dashboard and
+    generate_report and fail if any of them falls back to a full table scan.
+    """
+    
+    FULL_SCAN_PATTERNS = {
+        'sqlite': re.compile(r'\bSCAN (?!CONSTANT ROW)'),
+        'postgresql': re.compile(r'\bSeq Scan\b'),
+    }
+    
+    def setUp(self):
+        self.user = User.objects.create_user('erin', password='secret')
+        self.salary = IncomeSource.objects.create(user=self.user, name='Salary')
+        self.food = ExpenseCategory.objects.create(user=self.user, name='Food', monthly_budget=100)
+        self.start = datetime.date(2024, 1, 1)
+        self.end = datetime.date(2024, 1, 31)
+        
+        if connection.vendor == 'postgresql':
+            # Tiny test tables make a sequential scan the cheapest plan. LOCAL
+            # confines it to the test's transaction, so later tests on the
+            # connection plan normally
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+    
+    def assertNoFullScan(self, queryset):
+        plan = queryset.explain()
+        pattern = self.FULL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            self.skipTest(f'No plan check for {connection.vendor}')
+        self.assertIsNone(pattern.search(plan), plan)
+    
+    def test_duplicate_lookups(self):
+        self.assertNoFullScan(Transaction.objects.filter(user=self.user, fingerprint='x'))
+        self.assertNoFullScan(Transaction.objects.filter(user=self.user, match_key='x'))
+    
+    def test_transaction_list_queries(self):
+        transactions = Transaction.objects.filter(user=self.user, date__gte=self.start)
+        self.assertNoFullScan(transactions)
+        self.assertNoFullScan(transactions.filter(transaction_type=Transaction.EXPENSE))
+        self.assertNoFullScan(transactions.filter(expense_category_id=self.food.id))
+        self.assertNoFullScan(transactions.filter(transaction_type=Transaction.INCOME, income_source_id=self.salary.id))
+    
+    def test_dashboard_queries(self):
+        transactions = Transaction.objects.filter(user=self.user)
+        self.assertNoFullScan(transactions.filter(date__gte=self.start, date__lte=self.end).order_by().values(
+            'date', 'transaction_type'
+        ).annotate(total=Sum('amount')))
+        self.assertNoFullScan(transactions.select_related('income_source', 'expense_category').order_by('-date')[:5])
+        self.assertNoFullScan(MonthlyRollup.objects.filter(user=self.user, month=self.start).values('expense_category__name').annotate(
+            total=Sum('total')
+        ))
+        self.assertNoFullScan(ExpenseCategory.objects.filter(user=self.user).with_budget_status(2024, 1))
+    
+    def test_generate_report_queries(self):
+        transactions = Transaction.objects.filter(user=self.user, date__gte=self.start, date__lte=self.end)
+        self.assertNoFullScan(breakdown_rows(transactions))
+        self.assertNoFullScan(Transaction.objects.filter(user=self.user).filter(
+            Q(date__gte=self.start, date__lte=self.end) | Q(date__gte=self.start.replace(year=2023), date__lte=self.end.replace(year=2023))
+        ).annotate(period=TruncMonth('date')).order_by().values('period', 'transaction_type').annotate(total=Sum('amount')))
+
+
+@override_settings(TRANSACTIONS_PAGE_SIZE=3)
+class TransactionPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('frank', password='secret')
+        self.client.force_login(self.user)
+        self.food = ExpenseCategory.objects.create(user=self.user, name='Food')
+        today = timezone.now().date().replace(day=1)
+        # Several rows share a date so the id tie-breaker matters
+        self.transactions = [
+            Transaction.objects.create(user=self.user, amount=i + 1, date=today + datetime.timedelta(days=i // 2), transaction_type=Transaction.EXPENSE, expense_category=self.food)
+            for i in range(8)
+        ]
+    
+    def test_cursor_walks_every_row_once(self):
+        paginator = KeysetPaginator(Transaction.objects.filter(user=self.user), 3)
+        seen = []
+        cursor = None
+        while True:
+            page = paginator.page(cursor)
+            seen.extend(txn.id for txn in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        
+        expected = [txn.id for txn in sorted(self.transactions, key=lambda txn: (txn.date, txn.id), reverse=True)]
+        self.assertEqual(seen, expected)
+    
+    def test_list_pages_and_keeps_full_totals(self):
+        response = self.client.get(reverse('transaction_list'), {'date_filter': 'all'})
+        self.assertEqual(len(response.context['transactions']), 3)
+        self.assertEqual(response.context['expense_total'], sum(range(1, 9)))
+        
+        rows = self.client.get(reverse('transaction_list_rows'), {'date_filter': 'all', 'cursor': response.context['next_cursor']})
+        self.assertEqual(len(rows.context['transactions']), 3)
+        self.assertIn('X-Next-Cursor', rows)
+    
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('transaction_list_rows'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class TransactionSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('grace', password='secret')
+        self.salary = IncomeSource.objects.create(user=self.user, name='Salary')
+        self.food = ExpenseCategory.objects.create(user=self.user, name='Food')
+        self.rent = ExpenseCategory.objects.create(user=self.user, name='Rent')
+        Transaction.objects.create(user=self.user, amount=Decimal('1000.00'), date=datetime.date(2024, 5, 1), transaction_type=Transaction.INCOME, income_source=self.salary)
+        Transaction.objects.create(user=self.user, amount=Decimal('20.00'), date=datetime.date(2024, 5, 2), transaction_type=Transaction.EXPENSE, expense_category=self.food)
+        Transaction.objects.create(user=self.user, amount=Decimal('30.00'), date=datetime.date(2024, 5, 9), transaction_type=Transaction.EXPENSE, expense_category=self.food)
+        Transaction.objects.create(user=self.user, amount=Decimal('500.00'), date=datetime.date(2024, 5, 31), transaction_type=Transaction.EXPENSE, expense_category=self.rent)
+    
+    def test_summary_in_one_query(self):
+        with self.assertNumQueries(1):
+            summary = summarize(Transaction.objects.filter(user=self.user), breakdown=True)
+        
+        self.assertEqual(summary.income_total, Decimal('1000.00'))
+        self.assertEqual(summary.expense_total, Decimal('550.00'))
+        self.assertEqual(summary.balance, Decimal('450.00'))
+        self.assertEqual(summary.count, 4)
+        self.assertEqual((summary.first_date, summary.last_date), (datetime.date(2024, 5, 1), datetime.date(2024, 5, 31)))
+        self.assertEqual(summary.expense_by_category, [{'name': 'Rent', 'total': Decimal('500.00')}, {'name': 'Food', 'total': Decimal('50.00')}])
+        self.assertEqual(summary.income_by_source, [{'name': 'Salary', 'total': Decimal('1000.00')}])
+    
+    def test_totals_without_breakdown(self):
+        with self.assertNumQueries(1):
+            summary = summarize(Transaction.objects.filter(user=self.user, transaction_type=Transaction.EXPENSE))
+        self.assertEqual((summary.income_total, summary.expense_total, summary.count), (0, Decimal('550.00'), 3))
+    
+    def test_rollup_summary_matches_raw(self):
+        raw = summarize(Transaction.objects.filter(user=self.user), breakdown=True)
+        rolled = MonthlyRollup.objects.filter(user=self.user).summary()
+        
+        self.assertEqual(
+            (rolled.income_total, rolled.expense_total, rolled.count, rolled.income_by_source, rolled.expense_by_category),
+            (raw.income_total, raw.expense_total, raw.count, raw.income_by_source, raw.expense_by_category)
+        )
+
+
+
+class TransactionExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('hank', password='secret')
+        self.client.force_login(self.user)
+        self.food = ExpenseCategory.objects.create(user=self.user, name='Food')
+        self.salary = IncomeSource.objects.create(user=self.user, name='Salary')
+        self.today = timezone.now().date()
+        Transaction.objects.create(user=self.user, amount='12.50', date=self.today, transaction_type=Transaction.EXPENSE, expense_category=self.food, description='Lunch, with "friends"')
+        Transaction.objects.create(user=self.user, amount='1000.00', date=self.today, transaction_type=Transaction.INCOME, income_source=self.salary)
+        Transaction.objects.create(user=self.user, amount='3.00', date=datetime.date(2000, 1, 1), transaction_type=Transaction.EXPENSE, expense_category=self.food)
+    
+    def export(self, **params):
+        response = self.client.get(reverse('transaction_export'), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+    
+    def test_csv_streams_filtered_rows(self):
+        response = self.export(format='csv', type=Transaction.EXPENSE)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], ['Date', 'Type', 'Amount', 'Category', 'Source', 'Description'])
+        self.assertEqual(rows[1:], [[self.today.isoformat(), 'expense', '12.50', 'Food', '', 'Lunch, with "friends"']])
+    
+    def test_jsonl_uses_list_filters(self):
+        response = self.export(format='jsonl', date_filter='all')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[-1]['date'], '2000-01-01')
+        self.assertEqual({record['income_source'] for record in records}, {None, 'Salary'})
+    
+    def test_xlsx(self):
+        from openpyxl import load_workbook
+        
+        response = self.export(format='xlsx', date_filter='all')
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True).active
+        rows = list(sheet.values)
+        
+        self.assertEqual(rows[0][0], 'Date')
+        self.assertEqual(len(rows), 4)
+    
+    def test_query_count_does_not_depend_on_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            list(self.export(format='csv', date_filter='all').streaming_content)
+        baseline = len(queries)
+        
+        for i in range(20):
+            Transaction.objects.create(user=self.user, amount=1, date=self.today, transaction_type=Transaction.EXPENSE, expense_category=self.food)
+        
+        with CaptureQueriesContext(connection) as queries:
+            list(self.export(format='csv', date_filter='all').streaming_content)
+        self.assertEqual(len(queries), baseline)
+    
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get(reverse('transaction_export'), {'format': 'pdf'}).status_code, 404)
+
+
+class TransactionImportTests(TestCase):
+    CSV = (
+        'Date,Type,Amount,Category,Source,Description\n'
+        '2024-01-03,expense,12.50,Food,,Lunch\n'
+        '2024-01-04,expense,twelve,Rent,,Bad amount\n'
+        '2024-01-05,income,1000.00,,Salary,\n'
+        'not a date,expense,3.00,Food,,\n'
+        '2024-01-06,expense,4.00,food,,Snack\n'
+        '2024-01-07,,-8.25,Travel,,Bus\n'
+    )
+    
+    OFX = (
+        'OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+        '<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20240210120000\n<TRNAMT>-42.10\n<NAME>Grocer\n</STMTTRN>\n'
+        '<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240211<TRNAMT>1500.00<NAME>Employer<MEMO>Payroll</STMTTRN>\n'
+        '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+    )
+    
+    def setUp(self):
+        self.user = User.objects.create_user('ivan', password='secret')
+        self.food = ExpenseCategory.objects.create(user=self.user, name='Food')
+    
+    def test_csv_import_reports_row_errors(self):
+        result = import_transactions(self.user, BytesIO(self.CSV.encode()), 'csv', batch_size=2)
+        
+        self.assertEqual(result.created, 4)
+        self.assertEqual([row for row, _ in result.errors], [3, 5])
+        self.assertEqual(sorted(result.categories_created), ['Travel'])
+        self.assertEqual(result.sources_created, ['Salary'])
+        self.assertEqual(Transaction.objects.filter(user=self.user, expense_category=self.food).count(), 2)
+        
+        bus = Transaction.objects.get(user=self.user, description='Bus')
+        self.assertEqual((bus.transaction_type, bus.amount), (Transaction.EXPENSE, Decimal('8.25')))
+        self.assertEqual(rollups.verify([self.user.id]), [])
+    
+    def test_rows_follow_transaction_clean(self):
+        csv_file = 'Date,Type,Amount,Category,Source\n2024-01-03,income,5.00,Food,\n2024-01-03,expense,5.00,,\n'
+        result = import_transactions(self.user, BytesIO(csv_file.encode()), 'csv')
+        
+        self.assertEqual(result.created, 0)
+        self.assertEqual(result.errors, [
+            (2, 'Income transactions must have an income source.'),
+            (3, 'Expense transactions must have an expense category.'),
+        ])
+    
+    def test_ofx_import(self):
+        result = import_transactions(self.user, BytesIO(self.OFX.encode()), 'ofx', default_category='Bank', default_source='Bank')
+        
+        self.assertEqual(result.created, 2)
+        self.assertEqual(
+            set(Transaction.objects.filter(user=self.user).values_list('date', 'transaction_type', 'amount', 'description')),
+            {
+                (datetime.date(2024, 2, 10), Transaction.EXPENSE, Decimal('42.10'), 'Grocer'),
+                (datetime.date(2024, 2, 11), Transaction.INCOME, Decimal('1500.00'), 'Employer - Payroll'),
+            }
+        )
+    
+    def test_ofx_characters_split_between_chunks(self):
+        rows = list(read_ofx(BytesIO(self.OFX.replace('Grocer', 'Épicerie Müller').encode()), chunk_size=7))
+        self.assertEqual([row['description'] for row in rows], ['Épicerie Müller', 'Employer - Payroll'])
+    
+    def test_ofx_header_charset(self):
+        statement = self.OFX.replace('DATA:OFXSGML\n', 'DATA:OFXSGML\nENCODING:USASCII\nCHARSET:1252\n').replace('Grocer', 'Café')
+        self.assertEqual(next(read_ofx(BytesIO(statement.encode('cp1252'))))['description'], 'Café')
+        
+        xml = '<?xml version="1.0" encoding="ISO-8859-1"?>\n<OFX><STMTTRN><DTPOSTED>20240210<TRNAMT>-1<NAME>Crème</NAME></STMTTRN></OFX>'
+        self.assertEqual(next(read_ofx(BytesIO(xml.encode('latin-1'))))['description'], 'Crème')
+    
+    def test_xlsx_import(self):
+        from openpyxl import Workbook
+        
+        workbook = Workbook()
+        workbook.active.append(['Date', 'Amount', 'Category', 'Memo'])
+        workbook.active.append([datetime.datetime(2024, 3, 1), -19.99, 'Food', 'Pizza'])
+        workbook.active.append([datetime.datetime(2024, 3, 2), -5, 'Food', None])
+        output = BytesIO()
+        workbook.save(output)
+        output.seek(0)
+        
+        result = import_transactions(self.user, output, 'xlsx')
+        self.assertEqual((result.created, result.error_count), (2, 0))
+        self.assertEqual(Transaction.objects.get(description='Pizza').amount, Decimal('19.99'))
+    
+    def test_missing_columns(self):
+        with self.assertRaises(ImportFormatError):
+            import_transactions(self.user, BytesIO(b'When,How much\n2024-01-01,3\n'), 'csv')
+    
+    def test_windows_1252_csv(self):
+        statement = 'Date,Amount,Category,Description\n2024-01-03,-4.20,Food,Café crème\n'.encode('cp1252')
+        result = import_transactions(self.user, BytesIO(statement), 'csv')
+        
+        self.assertEqual(result.created, 1)
+        self.assertEqual(Transaction.objects.get(user=self.user).description, 'Café crème')
+    
+    def test_undecodable_csv(self):
+        # 0x81 is undefined in Windows-1252 and invalid UTF-8
+        with self.assertRaises(ImportFormatError):
+            import_transactions(self.user, BytesIO(b'Date,Amount\n2024-01-03,\x81\n'), 'csv')
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+    
+    def test_import_view(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('statement.csv', self.CSV.encode(), content_type='text/csv')
+        response = self.client.post(reverse('transaction_import'), {'file': upload, 'date_format': '%Y-%m-%d'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].created, 4)
+        self.assertContains(response, 'Invalid date')
+        
+        # The bulk insert invalidates the cached dashboard
+        dashboard = self.client.get(reverse('dashboard'))
+        self.assertEqual(dashboard.context['monthly_expenses'], 0)
+    
+    @override_settings(TRANSACTIONS_IMPORT_MAX_UPLOAD_SIZE=100)
+    def test_import_view_rejects_large_files(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('statement.csv', self.CSV.encode(), content_type='text/csv')
+        response = self.client.post(reverse('transaction_import'), {'file': upload, 'date_format': '%Y-%m-%d'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'import_transactions command')
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+    
+    def test_import_view_reports_undecodable_csv(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('statement.csv', b'Date,Amount\n2024-01-03,\x81\n', content_type='text/csv')
+        response = self.client.post(reverse('transaction_import'), {'file': upload, 'date_format': '%Y-%m-%d'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'not UTF-8 or Windows-1252')
+
+
+class DuplicateDetectionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('judy', password='secret')
+        self.food = ExpenseCategory.objects.create(user=self.user, name='Food')
+        self.day = datetime.date(2024, 5, 2)
+        self.coffee = self.add('Coffee @ Blue Bottle!')
+    
+    def add(self, description, amount='4.50', **kwargs):
+        return Transaction.objects.create(
+            user=self.user, amount=amount, date=self.day, transaction_type=Transaction.EXPENSE,
+            expense_category=self.food, description=description, **kwargs
+        )
+    
+    def test_fingerprint_ignores_case_and_punctuation(self):
+        other = self.add('coffee  blue bottle')
+        self.assertEqual(other.fingerprint, self.coffee.fingerprint)
+        self.assertNotEqual(self.add('Tea').fingerprint, self.coffee.fingerprint)
+        self.assertEqual(self.add('Tea').match_key, self.coffee.match_key)
+    
+    def test_find_duplicates_uses_one_query(self):
+        near = self.add('Coffee at Blue Bottle')
+        self.add('Coffee at Blue Bottle', amount='9.00')
+        candidate = Transaction(user=self.user, amount=Decimal('4.5'), date=self.day, transaction_type=Transaction.EXPENSE,
+                                expense_category=self.food, description='COFFEE @ BLUE BOTTLE')
+        
+        with self.assertNumQueries(1):
+            exact, similar = find_duplicates(candidate)
+        self.assertEqual(exact, [self.coffee])
+        self.assertEqual(similar, [near])
+    
+    def test_reimport_skips_existing_rows(self):
+        statement = b'Date,Amount,Category,Description\n2024-05-02,-4.50,Food,Coffee @ Blue Bottle!\n2024-05-02,-4.50,Food,Coffee @ Blue Bottle!\n2024-05-02,-4.50,Food,Coffee Blue Bottle SF\n2024-05-03,-7.00,Food,Lunch\n'
+        result = import_transactions(self.user, BytesIO(statement), 'csv')
+        
+        self.assertEqual((result.created, result.duplicates_skipped), (2, 2))
+        self.assertEqual(result.near_duplicates, [(4, self.coffee.id)])
+        
+        result = import_transactions(self.user, BytesIO(statement), 'csv')
+        self.assertEqual((result.created, result.duplicates_skipped), (0, 4))
+    
+    def test_form_asks_before_saving_exact_duplicate(self):
+        self.client.force_login(self.user)
+        data = {'amount': '4.50', 'date': '2024-05-02', 'transaction_type': Transaction.EXPENSE,
+                'expense_category': self.food.id, 'description': 'coffee @ blue bottle'}
+        
+        response = self.client.post(reverse('transaction_create'), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Save anyway')
+        
+        response = self.client.post(reverse('transaction_create'), {**data, 'allow_duplicate': 'on'})
+        self.assertRedirects(response, reverse('transaction_list'))
+        self.assertEqual(Transaction.objects.filter(fingerprint=self.coffee.fingerprint).count(), 2)
+    
+    def test_dedupe_command(self):
+        self.add('Coffee @ Blue Bottle')
+        self.add('Coffee at Blue Bottle SF')
+        Transaction.objects.filter(pk=self.coffee.pk).update(fingerprint='', match_key='')
+        
+        out = StringIO()
+        call_command('dedupe_transactions', '--refresh', '--delete', '--chunk-size', '2', stdout=out)
+        
+        self.assertIn('1 exact duplicate(s), 1 deleted, 1 near duplicate(s)', out.getvalue())
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+        self.assertTrue(Transaction.objects.filter(pk=self.coffee.pk).exists())
+        self.assertEqual(rollups.verify([self.user.id]), [])
+
+@skipUnless(os.environ.get('FINANCE_BENCHMARKS'), 'Set FINANCE_BENCHMARKS=1 to run benchmarks')
+class TransactionSummaryBenchmark(TestCase):
+    ROWS = 100_000
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('bench', password='secret')
+        salary = IncomeSource.objects.create(user=cls.user, name='Salary')
+        categories = [ExpenseCategory.objects.create(user=cls.user, name=f'Category {i}') for i in range(10)]
+        start = datetime.date(2015, 1, 1)
+        Transaction.objects.bulk_create((
+            Transaction(
+                user=cls.user,
+                amount=Decimal(i % 500) + Decimal('0.99'),
+                date=start + datetime.timedelta(days=i % 3650),
+                transaction_type=Transaction.INCOME if i % 10 == 0 else Transaction.EXPENSE,
+                income_source=salary if i % 10 == 0 else None,
+                expense_category=None if i % 10 == 0 else categories[i % 10],
+            )
+            for i in range(cls.ROWS)
+        ), batch_size=5000)
+    
+    def measure(self, func):
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        return len(queries), time.perf_counter() - started
+    
+    def test_summary_vs_separate_aggregates(self):
+        transactions = Transaction.objects.filter(user=self.user)
+        
+        def separate():
+            transactions.filter(transaction_type=Transaction.INCOME).aggregate(total=Sum('amount'))
+            transactions.filter(transaction_type=Transaction.EXPENSE).aggregate(total=Sum('amount'))
+            list(transactions.filter(transaction_type=Transaction.INCOME).values('income_source__name').annotate(total=Sum('amount')))
+            list(transactions.filter(transaction_type=Transaction.EXPENSE).values('expense_category__name').annotate(total=Sum('amount')))
+        
+        before = self.measure(separate)
+        after = self.measure(lambda: summarize(transactions, breakdown=True))
+        print(f'\n{self.ROWS} rows: separate aggregates {before[0]} queries in {before[1]:.3f}s, '
+              f'summarize() {after[0]} query in {after[1]:.3f}s')
+        self.assertLess(after[0], before[0])
+
+
+def create_synthetic_transactions(user, rows, start=datetime.date(2015, 1, 1), days=3650):
+    salary = IncomeSource.objects.create(user=user, name='Salary')
+    categories = [ExpenseCategory.objects.create(user=user, name=f'Category {i}') for i in range(10)]
+    Transaction.objects.bulk_create((
+        Transaction(
+            user=user,
+            amount=Decimal(i * 7919 % 50000) / 100 + Decimal('0.01'),
+            date=start + datetime.timedelta(days=i * 37 % days),
+            transaction_type=Transaction.INCOME if i % 10 == 0 else Transaction.EXPENSE,
+            income_source=salary if i % 20 == 0 else None,
+            expense_category=None if i % 10 == 0 or i % 13 == 0 else categories[i % 10],
+        )
+        for i in range(rows)
+    ), batch_size=5000)
+
+
+class AnalyticsBackendTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('gina', password='secret')
+        create_synthetic_transactions(self.user, 2000, days=800)
+        self.transactions = Transaction.objects.filter(user=self.user)
+    
+    def assertParity(self, start_date=None, end_date=None):
+        orm = analyze(self.transactions, start_date, end_date, backend='orm')
+        vectorized = analyze(self.transactions, start_date, end_date, backend='pandas')
+        self.assertEqual(vectorized, orm)
+        return orm
+    
+    def test_backends_agree_on_full_range(self):
+        result = self.assertParity()
+        self.assertEqual(result.count, 2000)
+        self.assertEqual(result.running_balance[-1]['balance'], result.balance)
+        self.assertIn(None, [item['name'] for item in result.expense_by_category])
+    
+    def test_backends_agree_on_partial_range(self):
+        result = self.assertParity(datetime.date(2015, 3, 17), datetime.date(2016, 2, 9))
+        self.assertEqual(result.daily[0]['date'], datetime.date(2015, 3, 17))
+        self.assertEqual(result.weekly[0]['date'], datetime.date(2015, 3, 16))
+    
+    def test_backends_agree_on_empty_range(self):
+        result = self.assertParity(datetime.date(2030, 1, 1), datetime.date(2030, 1, 10))
+        self.assertEqual(len(result.daily), 10)
+        self.assertEqual(result.income_by_source, [])
+    
+    def test_backends_agree_without_data(self):
+        self.transactions = Transaction.objects.none()
+        self.assertEqual(self.assertParity().daily, [])
+    
+    @override_settings(FINANCE_ANALYTICS_BACKEND='pandas')
+    def test_custom_report_uses_configured_backend(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('generate_report'), {'type': 'custom', 'start_date': '2015-01-05', 'end_date': '2016-06-20'})
+        expected = analyze(self.transactions, datetime.date(2015, 1, 5), datetime.date(2016, 6, 20), backend='orm')
+        self.assertEqual(response.context['total_expenses'], expected.expense_total)
+        self.assertEqual(response.context['expense_by_category'], expected.expense_by_category)
+
+
+@skipUnless(os.environ.get('FINANCE_BENCHMARKS'), 'Set FINANCE_BENCHMARKS=1 to run benchmarks')
+class AnalyticsBackendBenchmark(TestCase):
+    ROWS = 1_000_000
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('bench', password='secret')
+        create_synthetic_transactions(cls.user, cls.ROWS)
+    
+    def test_orm_vs_pandas(self):
+        transactions = Transaction.objects.filter(user=self.user)
+        timings = {}
+        results = {}
+        for backend in ('orm', 'pandas'):
+            started = time.perf_counter()
+            results[backend] = analyze(transactions, backend=backend)
+            timings[backend] = time.perf_counter() - started
+        
+        print(f'\n{self.ROWS} rows: orm {timings["orm"]:.3f}s, pandas {timings["pandas"]:.3f}s')
+        self.assertEqual(results['pandas'], results['orm'])
+
+
+def photo(width=2400, height=1800, name='receipt.jpg'):
+    from PIL import Image
+    
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'white').save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ReceiptTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        
+        self.user = User.objects.create_user('rita', password='secret')
+        self.client.force_login(self.user)
+        self.food = ExpenseCategory.objects.create(user=self.user, name='Food')
+    
+    def create(self, receipt, user=None):
+        return Transaction.objects.create(
+            user=user or self.user, amount=5, transaction_type=Transaction.EXPENSE,
+            expense_category=self.food, receipt=receipt
+        )
+    
+    def test_identical_uploads_are_stored_once_in_sharded_paths(self):
+        first = self.create(photo(name='IMG_1.JPG'))
+        second = self.create(photo(name='IMG_2.jpg'))
+        self.assertEqual(first.receipt.name, second.receipt.name)
+        self.assertEqual(first.receipt_image, second.receipt_image)
+        self.assertRegex(first.receipt.name, r'^receipts/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.jpg$')
+        self.assertEqual(Receipt.objects.count(), 1)
+        
+        other = self.create(photo(width=100, height=100))
+        self.assertNotEqual(other.receipt_image, first.receipt_image)
+    
+    def test_thumbnails_are_generated_off_the_request_path(self):
+        transaction = self.create(photo())
+        page = self.client.get(reverse('transaction_list'))
+        self.assertNotContains(page, reverse('transaction_receipt_thumbnail', args=[transaction.pk]))
+        
+        # Receipts change no amounts, so the rollups are not rebuilt
+        with mock.patch('transactions.rollups.rebuild') as rebuild:
+            call_command('process_receipts', '--once', stdout=StringIO())
+        rebuild.assert_not_called()
+        receipt = Receipt.objects.get()
+        self.assertIsNotNone(receipt.processed_at)
+        self.assertTrue(receipt.thumbnail.name.endswith('.webp'))
+        self.assertLess(receipt.thumbnail.size, receipt.preview.size)
+        self.assertLess(receipt.preview.size, receipt.size)
+        
+        # Processing invalidates the cached pages, which now show the thumbnail only
+        page = self.client.get(reverse('transaction_list'))
+        self.assertContains(page, reverse('transaction_receipt_thumbnail', args=[transaction.pk]))
+        self.assertNotContains(page, f'{reverse("transaction_receipt", args=[transaction.pk])}"')
+        self.assertContains(self.client.get(reverse('dashboard')), reverse('transaction_receipt_thumbnail', args=[transaction.pk]))
+    
+    def test_non_images_are_processed_without_variants(self):
+        transaction = self.create(SimpleUploadedFile('scan.pdf', b'%PDF-1.4 not really', content_type='application/pdf'))
+        call_command('process_receipts', '--once', stdout=StringIO())
+        receipt = Receipt.objects.get()
+        self.assertIsNotNone(receipt.processed_at)
+        self.assertFalse(receipt.thumbnail)
+        
+        self.assertEqual(self.client.get(reverse('transaction_receipt_thumbnail', args=[transaction.pk])).status_code, 404)
+        response = self.client.get(reverse('transaction_receipt_preview', args=[transaction.pk]))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 not really')
+    
+    def test_download_supports_ranges_and_validators(self):
+        transaction = self.create(SimpleUploadedFile('scan.pdf', b'0123456789', content_type='application/pdf'))
+        url = reverse('transaction_receipt', args=[transaction.pk])
+        
+        response = self.client.get(url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        
+        response = self.client.get(url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=20-').status_code, 416)
+        
+        response = self.client.get(url)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+    
+    @override_settings(FINANCE_RECEIPTS={'SENDFILE': 'x-accel-redirect', 'ACCEL_PREFIX': '/protected/'})
+    def test_x_accel_redirect(self):
+        transaction = self.create(photo(width=10, height=10))
+        response = self.client.get(reverse('transaction_receipt', args=[transaction.pk]))
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected/{transaction.receipt.name}')
+        self.assertEqual(response.content, b'')
+    
+    def test_receipts_are_private(self):
+        transaction = self.create(photo(width=10, height=10))
+        other = User.objects.create_user('sam', password='secret')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('transaction_receipt', args=[transaction.pk])).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('transaction_receipt', args=[transaction.pk])).status_code, 302)
+
+
+class RecurringRuleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('uma', password='secret')
+        self.client.force_login(self.user)
+        self.rent = ExpenseCategory.objects.create(user=self.user, name='Rent')
+        self.salary = IncomeSource.objects.create(user=self.user, name='Salary')
+    
+    def rule(self, **kwargs):
+        defaults = {
+            'user': self.user, 'transaction_type': Transaction.EXPENSE, 'amount': Decimal('800'),
+            'expense_category': self.rent, 'description': 'Rent', 'start_date': datetime.date(2024, 1, 31),
+        }
+        return RecurringRule.objects.create(**{**defaults, **kwargs})
+    
+    def test_occurrences(self):
+        dates = lambda rule, end: list(occurrences(rule, rule.start_date, end))
+        monthly = self.rule()
+        self.assertEqual(dates(monthly, datetime.date(2024, 4, 30)), [
+            datetime.date(2024, 1, 31), datetime.date(2024, 2, 29), datetime.date(2024, 3, 31), datetime.date(2024, 4, 30),
+        ])
+        every_other = self.rule(interval=2, day_of_month=15, start_date=datetime.date(2024, 1, 20))
+        self.assertEqual(dates(every_other, datetime.date(2024, 7, 1)), [datetime.date(2024, 3, 15), datetime.date(2024, 5, 15)])
+        weekly = self.rule(frequency=RecurringRule.WEEKLY, start_date=datetime.date(2024, 1, 1), end_date=datetime.date(2024, 1, 20))
+        self.assertEqual(dates(weekly, datetime.date(2025, 1, 1)), [datetime.date(2024, 1, 1), datetime.date(2024, 1, 8), datetime.date(2024, 1, 15)])
+        yearly = self.rule(frequency=RecurringRule.YEARLY, start_date=datetime.date(2024, 2, 29))
+        self.assertEqual(dates(yearly, datetime.date(2026, 12, 31))[1:], [datetime.date(2025, 2, 28), datetime.date(2026, 2, 28)])
+        self.assertEqual(list(occurrences(monthly, datetime.date(2030, 6, 1), datetime.date(2030, 7, 31))), [
+            datetime.date(2030, 6, 30), datetime.date(2030, 7, 31),
+        ])
+    
+    def test_materialization_is_idempotent(self):
+        rule = self.rule()
+        result = materialize_due(datetime.date(2024, 6, 15))
+        self.assertEqual(result.occurrences, 5)
+        rule.refresh_from_db()
+        self.assertEqual(rule.next_date, datetime.date(2024, 6, 30))
+        
+        materialize_due(datetime.date(2024, 6, 15))
+        # A crash between the insert and the rule update replays occurrences
+        RecurringRule.objects.filter(pk=rule.pk).update(next_date=rule.start_date)
+        materialize_due(datetime.date(2024, 6, 15))
+        
+        transactions = Transaction.objects.filter(recurring_rule=rule)
+        self.assertEqual(transactions.count(), 5)
+        self.assertFalse(transactions.filter(fingerprint='').exists())
+        self.assertEqual(rollups.verify([self.user.id]), [])
+    
+    def test_materialization_walks_rules_in_chunks(self):
+        other = User.objects.create_user('vic', password='secret')
+        source = IncomeSource.objects.create(user=other, name='Salary')
+        for day in range(1, 6):
+            self.rule(start_date=datetime.date(2024, 1, day))
+        self.rule(user=other, transaction_type=Transaction.INCOME, expense_category=None, income_source=source, start_date=datetime.date(2024, 1, 1))
+        self.rule(start_date=datetime.date(2024, 1, 1), active=False)
+        
+        with CaptureQueriesContext(connection) as queries:
+            result = materialize_due(datetime.date(2024, 3, 10), chunk_size=2)
+        self.assertEqual((result.rules, result.occurrences, len(result.users)), (6, 18, 2))
+        self.assertEqual(len([query for query in queries if 'INTO "transactions_transaction" (' in query['sql']]), 3)
+        self.assertEqual(Transaction.objects.count(), 18)
+        self.assertEqual(rollups.verify([self.user.id, other.id]), [])
+    
+    def test_materialization_recomputes_only_the_months_it_wrote(self):
+        Transaction.objects.create(
+            user=self.user, amount=50, date=datetime.date(2023, 12, 5), transaction_type=Transaction.EXPENSE, expense_category=self.rent
+        )
+        self.rule(start_date=datetime.date(2024, 2, 10))
+        
+        with mock.patch('transactions.rollups.rebuild') as rebuild, CaptureQueriesContext(connection) as queries:
+            materialize_due(datetime.date(2024, 3, 15))
+        rebuild.assert_not_called()
+        aggregates = [query['sql'] for query in queries if 'SUM("transactions_transaction"."amount")' in query['sql']]
+        self.assertEqual(len(aggregates), 2)
+        self.assertEqual(rollups.verify([self.user.id]), [])
+    
+    def test_editing_a_schedule_keeps_materialized_occurrences(self):
+        rule = self.rule(start_date=datetime.date(2024, 1, 10))
+        materialize_due(datetime.date(2024, 2, 20))
+        rule.day_of_month = 1
+        rule.save()
+        self.assertEqual(rule.next_date, datetime.date(2024, 3, 1))
+        
+        rule.end_date = datetime.date(2024, 2, 28)
+        rule.save()
+        self.assertIsNone(rule.next_date)
+    
+    def test_upcoming_occurrences_are_projected_without_rows(self):
+        today = timezone.now().date()
+        self.rule(
+            transaction_type=Transaction.INCOME, expense_category=None, income_source=self.salary,
+            frequency=RecurringRule.WEEKLY, start_date=today + datetime.timedelta(days=1), description='Pay'
+        )
+        projected = project(RecurringRule.objects.all(), today, today + datetime.timedelta(days=14))
+        self.assertEqual([transaction.date for transaction in projected], [
+            today + datetime.timedelta(days=1), today + datetime.timedelta(days=8),
+        ])
+        self.assertTrue(all(transaction.pk is None for transaction in projected))
+        
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(len(response.context['upcoming_transactions']), 5)
+        self.assertContains(response, 'Upcoming Recurring Transactions')
+        self.assertFalse(Transaction.objects.exists())
+    
+    def test_crud_views(self):
+        response = self.client.post(reverse('recurring_rule_create'), {
+            'transaction_type': Transaction.INCOME, 'amount': '3000', 'description': 'Salary',
+            'income_source': self.salary.pk, 'frequency': RecurringRule.MONTHLY, 'interval': 1,
+            'day_of_month': 25, 'start_date': '2024-01-01', 'active': 'on',
+        })
+        self.assertRedirects(response, reverse('recurring_rule_list'))
+        rule = RecurringRule.objects.get()
+        self.assertEqual(rule.next_date, datetime.date(2024, 1, 25))
+        self.assertContains(self.client.get(reverse('recurring_rule_list')), 'Every monthly')
+        
+        response = self.client.post(reverse('recurring_rule_create'), {
+            'transaction_type': Transaction.INCOME, 'amount': '5', 'expense_category': self.rent.pk,
+            'frequency': RecurringRule.MONTHLY, 'interval': 1, 'start_date': '2024-01-01',
+        })
+        self.assertFormError(response.context['form'], 'income_source', 'Income transactions must have an income source.')
+        
+        materialize_due(datetime.date(2024, 2, 1))
+        self.client.post(reverse('recurring_rule_delete', args=[rule.pk]))
+        self.assertFalse(RecurringRule.objects.exists())
+        self.assertEqual(Transaction.objects.count(), 1)
+    
+    def test_command(self):
+        self.rule()
+        out = StringIO()
+        call_command('materialize_recurring', '--date', '2024-02-29', stdout=out)
+        self.assertIn('Materialized 2 occurrence(s) of 1 rule(s) for 1 user(s).', out.getvalue())
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'Full-text search needs SQLite or PostgreSQL')
+class TransactionSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('wes', password='secret')
+        self.client.force_login(self.user)
+        self.food = ExpenseCategory.objects.create(user=self.user, name='Groceries')
+        self.books = ExpenseCategory.objects.create(user=self.user, name='Books')
+        self.salary = IncomeSource.objects.create(user=self.user, name='Salary')
+        self.today = timezone.now().date()
+    
+    def add(self, description, category=None, days_ago=0, **kwargs):
+        return Transaction.objects.create(
+            user=self.user, description=description, amount=Decimal('10'), date=self.today - datetime.timedelta(days=days_ago),
+            transaction_type=Transaction.EXPENSE, expense_category=category or self.food, **kwargs
+        )
+    
+    def found(self, query, queryset=None):
+        return sorted((queryset or Transaction.objects.all()).search(query).values_list('description', flat=True))
+    
+    def test_index_follows_every_write(self):
+        order = self.add('Amazon order')
+        Transaction.objects.bulk_create([Transaction(
+            user=self.user, description='amazon prime', amount=5, date=self.today, transaction_type=Transaction.EXPENSE
+        )])
+        self.assertEqual(self.found('AMAZ'), ['Amazon order', 'amazon prime'])
+        
+        order.description = 'Corner shop'
+        order.save()
+        Transaction.objects.filter(description='amazon prime').update(description='Prime video')
+        self.assertEqual(self.found('amazon'), [])
+        self.assertEqual(self.found('prime'), ['Prime video'])
+        
+        # Category and source names are part of the document
+        self.assertEqual(self.found('groceries shop'), ['Corner shop'])
+        self.food.name = 'Food'
+        self.food.save()
+        self.assertEqual(self.found('groceries'), [])
+        self.assertEqual(self.found('food'), ['Corner shop'])
+        
+        order.delete()
+        self.assertEqual(self.found('corner'), [])
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE}')
+            self.assertEqual(cursor.fetchone()[0], 1)
+    
+    def test_results_are_ranked_and_combine_with_filters(self):
+        self.add('Book club', days_ago=400)
+        self.add('Book fair book sale book', category=self.books)
+        self.add('Cinema')
+        Transaction.objects.create(
+            user=self.user, description='Book royalties', amount=50, date=self.today,
+            transaction_type=Transaction.INCOME, income_source=self.salary
+        )
+        other = User.objects.create_user('xia')
+        Transaction.objects.create(user=other, description='Book', amount=1, date=self.today, transaction_type=Transaction.EXPENSE)
+        
+        ranked = Transaction.objects.filter(user=self.user).search('book').order_by('-rank', '-date', '-id')
+        self.assertEqual(ranked[0].description, 'Book fair book sale book')
+        self.assertEqual(len(ranked), 3)
+        self.assertEqual(self.found('book', Transaction.objects.filter(user=self.user, transaction_type=Transaction.EXPENSE, date__gte=self.today)), [
+            'Book fair book sale book',
+        ])
+        self.assertEqual(self.found('!!!'), [])
+        
+        response = self.client.get(reverse('transaction_list'), {'q': 'book'})
+        self.assertEqual(response.context['date_filter'], 'all')
+        self.assertEqual(response.context['transaction_count'], 3)
+        self.assertEqual(response.context['transactions'][0].description, 'Book fair book sale book')
+        response = self.client.get(reverse('transaction_list'), {'q': 'book', 'type': 'income'})
+        self.assertEqual([transaction.description for transaction in response.context['transactions']], ['Book royalties'])
+    
+    def test_ranked_results_page_by_cursor(self):
+        for number in range(7):
+            self.add(f'Coffee {"coffee " * (number % 3)}shop {number}', days_ago=number)
+        
+        seen = []
+        params = {'q': 'coffee', 'page_size': 3}
+        response = self.client.get(reverse('transaction_list'), params)
+        seen += [transaction.description for transaction in response.context['transactions']]
+        cursor = response.context['next_cursor']
+        while cursor:
+            response = self.client.get(reverse('transaction_list_rows'), {**params, 'cursor': cursor})
+            seen += re.findall(r'Coffee [a-z ]*shop \d', response.content.decode())
+            cursor = response.get('X-Next-Cursor')
+        self.assertEqual(sorted(seen), sorted(Transaction.objects.values_list('description', flat=True)))
+    
+    def test_admin_uses_the_index(self):
+        self.add('Amazon order')
+        self.add('Cinema')
+        admin = User.objects.create_superuser('root', password='secret')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:transactions_transaction_changelist'), {'q': 'amaz'})
+        self.assertEqual([transaction.description for transaction in response.context['cl'].result_list], ['Amazon order'])
+    
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite query plan')
+    def test_match_runs_before_the_user_filter(self):
+        plan = Transaction.objects.filter(user=self.user, date__gte=self.today).search('coffee').order_by().explain()
+        lines = plan.splitlines()
+        self.assertIn(f'SCAN {SEARCH_TABLE} VIRTUAL TABLE INDEX', lines[0], plan)
+        self.assertIn('USING INTEGER PRIMARY KEY', lines[1], plan)
+
+
+class TransactionAdminTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('yara', password='secret')
+        self.other = User.objects.create_user('zed', password='secret')
+        self.food = ExpenseCategory.objects.create(user=self.user, name='Food')
+        self.fun = ExpenseCategory.objects.create(user=self.user, name='Fun')
+        self.salary = IncomeSource.objects.create(user=self.user, name='Salary')
+        self.today = timezone.now().date()
+        admin = User.objects.create_superuser('root', password='secret')
+        self.client.force_login(admin)
+        self.url = reverse('admin:transactions_transaction_changelist')
+    
+    def add(self, user=None, category=None, date=None, **kwargs):
+        return Transaction.objects.create(
+            user=user or self.user, amount=Decimal('10'), date=date or self.today, description='Lunch',
+            transaction_type=Transaction.EXPENSE, expense_category=category or self.food, **kwargs
+        )
+    
+    @override_settings(FINANCE_ADMIN_EXACT_COUNT=10)
+    def test_changelist_counts_and_dates_are_bounded(self):
+        for number in range(12):
+            self.add(date=self.today.replace(day=1) - datetime.timedelta(days=number * 70))
+        self.add(date=self.today.replace(year=self.today.year - 3, day=1))
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        # Counting stops past the limit, and nothing scans distinct values
+        self.assertEqual(response.context['cl'].result_count, 11)
+        self.assertIsNone(response.context['cl'].full_result_count)
+        for query in queries:
+            self.assertNotIn('DISTINCT', query['sql'])
+            if 'COUNT(' in query['sql']:
+                self.assertIn('LIMIT', query['sql'])
+        # Every year between the first and last dates is linked, with or without rows
+        years = re.findall(r'\?date__year=(\d+)', response.content.decode())
+        self.assertEqual(years, [str(year) for year in range(self.today.year - 3, self.today.year + 1)])
+        
+        # The statistics of ANALYZE give the unfiltered total
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            self.assertEqual(self.client.get(self.url).context['cl'].result_count, 13)
+    
+    def test_user_filter_uses_autocomplete(self):
+        self.add()
+        self.add(user=self.other, category=ExpenseCategory.objects.create(user=self.other, name='Food'))
+        page = self.client.get(self.url).content.decode()
+        self.assertIn('data-field-name="user"', page)
+        self.assertNotIn('?user__id__exact=', page)
+        self.assertNotIn('_facets', page)
+        
+        response = self.client.get(self.url, {'user__id__exact': self.other.pk})
+        self.assertEqual([transaction.user_id for transaction in response.context['cl'].result_list], [self.other.pk])
+        self.assertIn(f'<option value="{self.other.pk}" selected>zed</option>', response.content.decode())
+        # Clearing the widget submits an empty value
+        self.assertEqual(len(self.client.get(self.url, {'user__id__exact': ''}).context['cl'].result_list), 2)
+        
+        autocomplete = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'transactions', 'model_name': 'transaction', 'field_name': 'user', 'term': 'ze',
+        })
+        self.assertEqual([result['text'] for result in autocomplete.json()['results']], ['zed'])
+    
+    def test_recategorize_is_one_update(self):
+        lunch = self.add()
+        twin = self.add(category=self.fun)
+        income = Transaction.objects.create(
+            user=self.user, amount=5, date=self.today, transaction_type=Transaction.INCOME, income_source=self.salary
+        )
+        theirs = self.add(user=self.other, category=ExpenseCategory.objects.create(user=self.other, name='Food'))
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, {
+                'action': 'recategorize', 'index': 0, 'category': self.fun.pk,
+                '_selected_action': [lunch.pk, income.pk, theirs.pk],
+            })
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "transactions_transaction" SET "expense_category_id"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            dict(Transaction.objects.values_list('pk', 'expense_category_id')),
+            {lunch.pk: self.fun.pk, twin.pk: self.fun.pk, income.pk: None, theirs.pk: theirs.expense_category_id}
+        )
+        # Now an exact duplicate of its twin, and counted in its new category
+        self.assertEqual(find_duplicates(Transaction.objects.get(pk=twin.pk))[0], [Transaction.objects.get(pk=lunch.pk)])
+        self.assertEqual(MonthlyRollup.objects.get(user=self.user, expense_category=self.fun).count, 2)
+        self.assertFalse(MonthlyRollup.objects.filter(user=self.user, expense_category=self.food).exists())
+    
+    def test_recategorize_rekeys_only_moved_rows(self):
+        lunch = self.add()
+        twin = self.add(category=self.fun)
+        Transaction.objects.filter(pk=twin.pk).update(fingerprint='stale')
+        
+        self.assertEqual(Transaction.objects.filter(pk__in=[lunch.pk, twin.pk]).recategorize(self.fun), 1)
+        self.assertEqual(Transaction.objects.get(pk=twin.pk).fingerprint, 'stale')
+        self.assertNotEqual(Transaction.objects.get(pk=lunch.pk).fingerprint, lunch.fingerprint)
+    
+    def test_delete_across_a_filter_is_one_statement(self):
+        for _ in range(3):
+            self.add()
+        theirs = self.add(user=self.other, category=ExpenseCategory.objects.create(user=self.other, name='Food'))
+        url = f'{self.url}?user__id__exact={self.user.pk}'
+        selection = {'action': 'delete_selected', 'select_across': 1, '_selected_action': [Transaction.objects.filter(user=self.user).first().pk]}
+        
+        confirmation = self.client.post(url, {**selection, 'index': 0})
+        self.assertContains(confirmation, 'delete all 3 transactions')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(url, {**selection, 'post': 'yes'})
+        deletes = [query['sql'] for query in queries if query['sql'].startswith('DELETE FROM "transactions_transaction"')]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(list(Transaction.objects.all()), [theirs])
+        self.assertFalse(MonthlyRollup.objects.filter(user=self.user).exists())
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE}')
+            self.assertEqual(cursor.fetchone()[0], 1)
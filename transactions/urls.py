@@ -16,9 +16,21 @@ urlpatterns = [
     
     # Transactions
     path('', views.transaction_list, name='transaction_list'),
+    path('rows/', views.transaction_list_rows, name='transaction_list_rows'),
+    path('export/', views.transaction_export, name='transaction_export'),
     path('create/', views.transaction_create, name='transaction_create'),
+    path('import/', views.transaction_import, name='transaction_import'),
     path('<int:pk>/edit/', views.transaction_edit, name='transaction_edit'),
     path('<int:pk>/delete/', views.transaction_delete, name='transaction_delete'),
+    path('<int:pk>/receipt/', views.transaction_receipt, name='transaction_receipt'),
+    path('<int:pk>/receipt/preview/', views.transaction_receipt, {'variant': 'preview'}, name='transaction_receipt_preview'),
+    path('<int:pk>/receipt/thumbnail/', views.transaction_receipt, {'variant': 'thumbnail'}, name='transaction_receipt_thumbnail'),
+    
+    # Recurring Rules
+    path('recurring/', views.recurring_rule_list, name='recurring_rule_list'),
+    path('recurring/create/', views.recurring_rule_create, name='recurring_rule_create'),
+    path('recurring/<int:pk>/edit/', views.recurring_rule_edit, name='recurring_rule_edit'),
+    path('recurring/<int:pk>/delete/', views.recurring_rule_delete, name='recurring_rule_delete'),
     
     # API
     path('api/categories/', views.get_transaction_categories, name='get_transaction_categories'),
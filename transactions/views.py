@@ -1,14 +1,23 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import IncomeSource, ExpenseCategory, Transaction
-from .forms import IncomeSourceForm, ExpenseCategoryForm, TransactionForm
-from django.db.models import Sum
+from .models import IncomeSource, ExpenseCategory, RecurringRule, Transaction
+from .forms import IncomeSourceForm, ExpenseCategoryForm, RecurringRuleForm, TransactionForm, TransactionImportForm
+from .aggregates import summarize
+from .pagination import KeysetPaginator, InvalidCursor
+from .exports import csv_stream, jsonl_stream, xlsx_file
+from .receipts import serve_receipt
+from .importers import import_transactions, ImportFormatError
+from dashboard.conditional import data_condition
+from monitoring.instrumentation import query_budget
 from django.utils import timezone
 from datetime import datetime, timedelta
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404, StreamingHttpResponse, FileResponse
+from django.conf import settings
 
 @login_required
+@data_condition
+@query_budget(6)
 def income_source_list(request):
     income_sources = IncomeSource.objects.filter(user=request.user)
     return render(request, 'transactions/income_source_list.html', {'income_sources': income_sources})
@@ -55,15 +64,16 @@ def income_source_delete(request, pk):
     return render(request, 'transactions/income_source_confirm_delete.html', {'income_source': income_source})
 
 @login_required
+@data_condition
+@query_budget(6)
 def expense_category_list(request):
-    expense_categories = ExpenseCategory.objects.filter(user=request.user)
-    
-    # Calculate current month's expenses for each category
+    # Calculate current month's expenses for all categories in one query
     today = timezone.now()
+    expense_categories = ExpenseCategory.objects.filter(user=request.user).with_budget_status(today.year, today.month)
     
     for category in expense_categories:
-        category.current_month_expenses = category.get_monthly_expenses(today.year, today.month)
-        category.budget_status = category.get_budget_status(today.year, today.month)
+        category.current_month_expenses = category.monthly_spent
+        category.budget_status = category.budget_status_for(category.monthly_spent)
     
     return render(request, 'transactions/expense_category_list.html', {'expense_categories': expense_categories})
 
@@ -108,12 +118,21 @@ def expense_category_delete(request, pk):
     
     return render(request, 'transactions/expense_category_confirm_delete.html', {'expense_category': expense_category})
 
-@login_required
-def transaction_list(request):
+def _filter_transactions(request):
+    """
+    Apply the transaction_list filters from the query string.
+    
+    Returns the filtered queryset and the filter values for the template.
+    """
     transactions = Transaction.objects.filter(user=request.user)
     
+    # Full-text search; searches cover all time unless a period is chosen
+    query = request.GET.get('q', '').strip()
+    if query:
+        transactions = transactions.search(query)
+    
     # Filter by date
-    date_filter = request.GET.get('date_filter', 'month')
+    date_filter = request.GET.get('date_filter', 'all' if query else 'month')
     today = timezone.now().date()
     
     if date_filter == 'week':
@@ -139,27 +158,109 @@ def transaction_list(request):
         else:
             transactions = transactions.filter(expense_category_id=category_id)
     
-    # Calculate totals
-    income_total = transactions.filter(transaction_type=Transaction.INCOME).aggregate(total=Sum('amount'))['total'] or 0
-    expense_total = transactions.filter(transaction_type=Transaction.EXPENSE).aggregate(total=Sum('amount'))['total'] or 0
-    balance = income_total - expense_total
+    return transactions, {
+        'query': query,
+        'date_filter': date_filter,
+        'transaction_type': transaction_type,
+        'category_id': category_id,
+    }
+
+def _paginate_transactions(request, transactions):
+    try:
+        page_size = int(request.GET.get('page_size', settings.TRANSACTIONS_PAGE_SIZE))
+    except ValueError:
+        page_size = settings.TRANSACTIONS_PAGE_SIZE
+    page_size = max(1, min(page_size, settings.TRANSACTIONS_MAX_PAGE_SIZE))
+    
+    # Search results come most relevant first
+    ordering = ('-rank', '-date', '-id') if 'rank' in transactions.query.annotations else ('-date', '-id')
+    paginator = KeysetPaginator(
+        transactions.select_related('income_source', 'expense_category', 'receipt_image'),
+        page_size,
+        ordering
+    )
+    try:
+        return paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404('Invalid page cursor.')
+
+@login_required
+@data_condition
+@query_budget(10)
+def transaction_list(request):
+    transactions, filters = _filter_transactions(request)
+    
+    # Calculate totals over the full filter, not just the current page
+    summary = summarize(transactions)
+    income_total = summary.income_total
+    expense_total = summary.expense_total
+    balance = summary.balance
+    
+    page = _paginate_transactions(request, transactions)
     
     # Get categories for filters
     income_sources = IncomeSource.objects.filter(user=request.user)
     expense_categories = ExpenseCategory.objects.filter(user=request.user)
     
     return render(request, 'transactions/transaction_list.html', {
-        'transactions': transactions,
+        'transactions': page.object_list,
+        'next_cursor': page.next_cursor,
         'income_total': income_total,
         'expense_total': expense_total,
         'balance': balance,
-        'date_filter': date_filter,
-        'transaction_type': transaction_type,
-        'category_id': category_id,
+        'transaction_count': summary.count,
         'income_sources': income_sources,
         'expense_categories': expense_categories,
+        **filters,
     })
 
+@login_required
+@data_condition
+@query_budget(6)
+def transaction_list_rows(request):
+    """
+    Render only the table rows of the next transaction_list page, for
+    infinite scrolling. The cursor of the following page is returned in the
+    X-Next-Cursor header.
+    """
+    transactions, _ = _filter_transactions(request)
+    page = _paginate_transactions(request, transactions)
+    
+    response = render(request, 'transactions/transaction_rows.html', {'transactions': page.object_list})
+    if page.next_cursor:
+        response['X-Next-Cursor'] = page.next_cursor
+    return response
+
+@login_required
+@query_budget(6)
+def transaction_export(request):
+    """Stream the transactions matching the transaction_list filters as CSV, JSON lines or XLSX."""
+    transactions, _ = _filter_transactions(request)
+    export_format = request.GET.get('format', 'csv')
+    filename = f"transactions-{timezone.now().date().isoformat()}"
+    
+    if export_format == 'csv':
+        response = StreamingHttpResponse(csv_stream(transactions), content_type='text/csv')
+        filename += '.csv'
+    elif export_format == 'jsonl':
+        response = StreamingHttpResponse(jsonl_stream(transactions), content_type='application/x-ndjson')
+        filename += '.jsonl'
+    elif export_format == 'xlsx':
+        response = FileResponse(
+            xlsx_file(transactions),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        filename += '.xlsx'
+    else:
+        raise Http404('Unknown export format.')
+    
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def _warn_near_duplicates(request, form):
+    for duplicate in form.near_duplicates[:3]:
+        messages.warning(request, f'This looks similar to an existing transaction: {duplicate} ({duplicate.description or "no description"}).')
+
 @login_required
 def transaction_create(request):
     if request.method == 'POST':
@@ -169,12 +270,40 @@ def transaction_create(request):
             transaction.user = request.user
             transaction.save()
             messages.success(request, 'Transaction created successfully!')
+            _warn_near_duplicates(request, form)
             return redirect('transaction_list')
     else:
         form = TransactionForm(user=request.user)
     
     return render(request, 'transactions/transaction_form.html', {'form': form})
 
+@login_required
+def transaction_import(request):
+    result = None
+    if request.method == 'POST':
+        form = TransactionImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                result = import_transactions(
+                    request.user,
+                    form.cleaned_data['file'].file,
+                    form.cleaned_data['format'],
+                    date_format=form.cleaned_data['date_format'],
+                    default_category=form.cleaned_data['default_category'],
+                    default_source=form.cleaned_data['default_source'],
+                )
+            except ImportFormatError as error:
+                form.add_error('file', str(error))
+            else:
+                if result.created:
+                    messages.success(request, f'Imported {result.created} transaction(s).')
+                if not (result.error_count or result.duplicates_skipped or result.near_duplicate_count):
+                    return redirect('transaction_list')
+    else:
+        form = TransactionImportForm()
+    
+    return render(request, 'transactions/transaction_import.html', {'form': form, 'result': result})
+
 @login_required
 def transaction_edit(request, pk):
     transaction = get_object_or_404(Transaction, pk=pk, user=request.user)
@@ -184,6 +313,7 @@ def transaction_edit(request, pk):
         if form.is_valid():
             form.save()
             messages.success(request, 'Transaction updated successfully!')
+            _warn_near_duplicates(request, form)
             return redirect('transaction_list')
     else:
         form = TransactionForm(instance=transaction, user=request.user)
@@ -202,6 +332,78 @@ def transaction_delete(request, pk):
     return render(request, 'transactions/transaction_confirm_delete.html', {'transaction': transaction})
 
 @login_required
+@data_condition
+@query_budget(6)
+def recurring_rule_list(request):
+    rules = RecurringRule.objects.filter(user=request.user).select_related('income_source', 'expense_category')
+    return render(request, 'transactions/recurring_rule_list.html', {'recurring_rules': rules})
+
+@login_required
+def recurring_rule_create(request):
+    if request.method == 'POST':
+        form = RecurringRuleForm(request.POST, user=request.user)
+        if form.is_valid():
+            rule = form.save(commit=False)
+            rule.user = request.user
+            rule.save()
+            messages.success(request, 'Recurring transaction created successfully!')
+            return redirect('recurring_rule_list')
+    else:
+        form = RecurringRuleForm(user=request.user)
+    
+    return render(request, 'transactions/recurring_rule_form.html', {'form': form})
+
+@login_required
+def recurring_rule_edit(request, pk):
+    rule = get_object_or_404(RecurringRule, pk=pk, user=request.user)
+    
+    if request.method == 'POST':
+        form = RecurringRuleForm(request.POST, instance=rule, user=request.user)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Recurring transaction updated successfully!')
+            return redirect('recurring_rule_list')
+    else:
+        form = RecurringRuleForm(instance=rule, user=request.user)
+    
+    return render(request, 'transactions/recurring_rule_form.html', {'form': form, 'recurring_rule': rule})
+
+@login_required
+def recurring_rule_delete(request, pk):
+    rule = get_object_or_404(RecurringRule, pk=pk, user=request.user)
+    
+    if request.method == 'POST':
+        # Transactions already created from the rule are kept
+        rule.delete()
+        messages.success(request, 'Recurring transaction deleted successfully!')
+        return redirect('recurring_rule_list')
+    
+    return render(request, 'transactions/recurring_rule_confirm_delete.html', {'recurring_rule': rule})
+
+@login_required
+@query_budget(4)
+def transaction_receipt(request, pk, variant='original'):
+    """
+    Send a transaction's receipt, its preview (the original when there is
+    none) or its thumbnail. Only the owner of the transaction can see it.
+    """
+    transaction = get_object_or_404(Transaction.objects.select_related('receipt_image'), pk=pk, user=request.user)
+    if not transaction.receipt:
+        raise Http404('No receipt.')
+    
+    field_file = transaction.receipt
+    receipt = transaction.receipt_image
+    if variant == 'thumbnail':
+        if not (receipt and receipt.thumbnail):
+            raise Http404('No thumbnail yet.')
+        field_file = receipt.thumbnail
+    elif variant == 'preview' and receipt and receipt.preview:
+        field_file = receipt.preview
+    
+    return serve_receipt(request, field_file, attachment='download' in request.GET)
+
+@login_required
+@query_budget(5)
 def get_transaction_categories(request):
     transaction_type = request.GET.get('type')
     